@@ -1,13 +1,33 @@
 import os
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
+from src.core.scanner import scan_paths
 try:
     from tkinterdnd2 import DND_FILES, TkinterDnD
     DRAG_DROP_AVAILABLE = True
 except ImportError:
     DRAG_DROP_AVAILABLE = False
 
+STATUS_INTERVAL = 0.1 # 状态更新的最小间隔（秒）
+
+
+def _throttled(callback, interval=STATUS_INTERVAL):
+    """
+    限制状态回调的频率。每个文件都刷新界面时，界面刷新本身会成为瓶颈；
+    force=True 的调用（如最后一次）总会执行。
+    """
+    last = [0.0]
+
+    def report(text, force=False):
+        now = time.monotonic()
+        if force or now - last[0] >= interval:
+            last[0] = now
+            callback(text)
+    return report
+
+
 def rename_images_in_folder(folder_path, allowed_extensions, update_status_callback):
     """
     Renames images in the folder.
@@ -20,10 +40,12 @@ def rename_images_in_folder(folder_path, allowed_extensions, update_status_callb
     if not folder_name:
         folder_name = os.path.basename(os.path.dirname(folder_path))
 
+    report = _throttled(update_status_callback)
     try:
         # Filter files based on allowed extensions
-        files = [f for f in os.listdir(folder_path) 
-                 if os.path.splitext(f)[1].lower() in allowed_extensions]
+        files = [os.path.basename(p)
+                 for chunk in scan_paths([folder_path], extensions=allowed_extensions)
+                 for p in chunk]
         files.sort()
 
         if not files:
@@ -46,12 +68,12 @@ def rename_images_in_folder(folder_path, allowed_extensions, update_status_callb
             os.rename(old_path, temp_path)
             temp_map.append((temp_path, os.path.join(folder_path, new_name)))
             
-            update_status_callback(f"处理中... {int((index/total)*50)}%")
+            report(f"处理中... {int((index/total)*50)}%")
 
         # Second pass
         for index, (temp_path, final_path) in enumerate(temp_map, start=1):
             os.rename(temp_path, final_path)
-            update_status_callback(f"处理中... {50 + int((index/total)*50)}%")
+            report(f"处理中... {50 + int((index/total)*50)}%", force=index == total)
 
         update_status_callback("准备就绪")
         messagebox.showinfo("成功", f"成功重命名了 '{folder_name}' 中的 {len(files)} 张图片！")
@@ -0,0 +1,239 @@
+"""
+性能基准：扫描、预览（各模式）、执行重命名（含/不含附属文件）与撤回，
+以及预览结果每条记录占用的内存（写入结果的 "memory" 部分，不参与 --compare）。
+
+    python benchmark.py                              # 1k / 10k / 100k，结果写入 benchmark.json
+    python benchmark.py --sizes 1000 10000 --out new.json
+    python benchmark.py --sizes 1000 --compare benchmark.json --threshold 0.2
+
+合成的测试图片（极小的 JPEG/PNG/WebP，EXIF 各不相同）缓存在 --workdir 中，重复运行时直接复用。
+--compare 模式下，任一项比基准慢超过 threshold 时以退出码 1 结束，可用于 CI。
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+from src.core.scanner import scan_paths
+from src.core.file_collection import FileCollection
+from src.core.renamer import RenamerEngine
+from src.core.file_ops import FileProcessor
+from src.core.preview_table import memory_per_entry
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# 每种模式的规则
+PREVIEW_MODES = {
+    'sequence': {'mode': 'sequence', 'prefix': 'Bench', 'padding': 6},
+    'sequence_by_date': {'mode': 'sequence', 'prefix': 'Bench', 'padding': 6, 'sort': 'date,natural'},
+    'regex': {'mode': 'regex', 'regex_pattern': r'img_(\d+)', 'regex_replacement': r'photo-\1'},
+    'template': {'mode': 'template', 'template': "{folder}_{name}_{seq:06}{ext}"},
+    'metadata_resolution': {'mode': 'metadata_resolution'},
+    'metadata_date': {'mode': 'metadata_date'},
+    'metadata_model': {'mode': 'metadata_model'},
+    'metadata_hash': {'mode': 'metadata_hash'},
+    'similar_groups': {'mode': 'template', 'template': "{group:04}_{seq:06}{ext}"},
+}
+
+FORMATS = (('JPEG', '.jpg'), ('PNG', '.png'), ('WEBP', '.webp'))
+MODELS = ("Canon EOS R5", "NIKON Z 6", "ILCE-7M3", "iPhone 13 Pro", None)
+VARIANTS = 24
+SIDECAR_EVERY = 4
+MARKER = ".corpus-complete"
+
+
+def _encode_variants():
+    """每种格式预先编码若干个 EXIF（拍摄时间、相机型号）与尺寸各不相同的小图"""
+    from PIL import Image
+
+    variants = []
+    for v in range(VARIANTS):
+        exif = Image.Exif()
+        model = MODELS[v % len(MODELS)]
+        if model is not None:
+            exif[272] = model
+        if v % 7 != 6: # 部分图片没有拍摄时间，回退到修改时间
+            exif[306] = f"2023:{v % 12 + 1:02}:{v % 28 + 1:02} 10:{v:02}:00"
+        size = (8 + v % 5, 6 + v % 3)
+        for fmt, ext in FORMATS:
+            buf = io.BytesIO()
+            Image.new('RGB', size, (v * 10 % 256, 80, 160)).save(buf, format=fmt, exif=exif.tobytes())
+            variants.append((ext, buf.getvalue()))
+    return variants
+
+
+def make_corpus(directory, count):
+    """
+    在 directory 下生成 count 个图片，每 SIDECAR_EVERY 个附带一个 .xmp。
+    已生成且完整的语料直接复用。
+    returns: directory
+    """
+    marker = os.path.join(directory, MARKER)
+    if os.path.exists(marker):
+        with open(marker) as fh:
+            if fh.read().strip() == str(count):
+                return directory
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+
+    variants = _encode_variants()
+    for i in range(count):
+        ext, data = variants[i % len(variants)]
+        name = f"img_{i:06}"
+        with open(os.path.join(directory, name + ext), 'wb') as fh:
+            fh.write(data)
+        if i % SIDECAR_EVERY == 0:
+            with open(os.path.join(directory, name + ".xmp"), 'w') as fh:
+                fh.write("<x:xmpmeta/>")
+    with open(marker, 'w') as fh:
+        fh.write(str(count))
+    return directory
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def _best(fn, repeat):
+    return min(_timed(fn)[0] for _ in range(repeat))
+
+
+def scan(directory):
+    files = FileCollection()
+    for chunk in scan_paths([directory]):
+        files.update(chunk)
+    return files
+
+
+def bench_corpus(directory, repeat=3, journal_dir=None):
+    """returns: dict, 测试项 -> 秒（取 repeat 次中的最小值）"""
+    results = {}
+    results['scan'] = _best(lambda: scan(directory), repeat)
+    files = scan(directory)
+
+    for name, rules in PREVIEW_MODES.items():
+        def cold():
+            engine = RenamerEngine()
+            engine.set_rules(rules)
+            return engine.generate_preview(files)
+        results[f'preview.{name}'] = _best(cold, repeat)
+
+    # 只修改规则（facts 已缓存）
+    engine = RenamerEngine()
+    engine.set_rules(PREVIEW_MODES['sequence'])
+    engine.generate_preview(files)
+    def rules_only():
+        engine.set_rules(dict(PREVIEW_MODES['sequence'], prefix=f"B{time.perf_counter_ns()}"))
+        return engine.generate_preview(files)
+    results['preview.rules_only'] = _best(rules_only, repeat)
+
+    # 执行与撤回会修改文件名，撤回后语料恢复原状，每种情况只运行一次
+    for label, sync_sidecar in (('execute', False), ('execute.sidecar', True)):
+        engine = RenamerEngine()
+        engine.set_rules(dict(PREVIEW_MODES['sequence'], sync_sidecar=sync_sidecar))
+        preview = engine.generate_preview(files)
+        processor = FileProcessor(journal_dir=journal_dir)
+        seconds, (count, error) = _timed(lambda: processor.execute_rename(preview, sync_sidecar=sync_sidecar))
+        if error:
+            raise RuntimeError(f"{label} 失败: {error}")
+        results[label] = seconds
+        seconds, (_, error) = _timed(processor.undo_last_operation)
+        if error:
+            raise RuntimeError(f"撤回失败: {error}")
+        results[label.replace('execute', 'undo')] = seconds
+    return results
+
+
+def bench_memory(directory):
+    """returns: dict, 规则 -> memory_per_entry 的结果（PreviewRecord 与等价的 dict 对比）"""
+    files = scan(directory)
+    results = {}
+    for label, sync_sidecar in (('preview', False), ('preview.sidecar', True)):
+        engine = RenamerEngine()
+        engine.set_rules(dict(PREVIEW_MODES['sequence'], sync_sidecar=sync_sidecar))
+        results[label] = memory_per_entry(engine.generate_preview(files))
+    return results
+
+
+def run(sizes, workdir, repeat=3):
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "sizes": list(sizes),
+            "repeat": repeat,
+        },
+        "results": {},
+        "memory": {},
+    }
+    journal_dir = os.path.join(workdir, "journal")
+    for size in sizes:
+        directory = os.path.join(workdir, f"corpus-{size}")
+        seconds, _ = _timed(lambda: make_corpus(directory, size))
+        print(f"[{size}] 语料就绪 ({seconds:.1f}s)", file=sys.stderr)
+        for name, value in bench_corpus(directory, repeat, journal_dir).items():
+            key = f"{size}/{name}"
+            report["results"][key] = round(value, 6)
+            print(f"  {key:<32} {value * 1000:10.1f} ms", file=sys.stderr)
+        for name, value in bench_memory(directory).items():
+            key = f"{size}/{name}"
+            report["memory"][key] = value
+            print(f"  {key:<32} {value['records']:8.1f} B/条 (dict: {value['dicts']:.1f} B/条)", file=sys.stderr)
+    return report
+
+
+def compare(baseline, current, threshold=0.2, min_seconds=0.005):
+    """
+    比较两次结果。只比较两边都有的项；两边都低于 min_seconds 的项噪声太大，忽略。
+    returns: list of (key, old, new, ratio)，为超过 threshold 的退化项
+    """
+    regressions = []
+    old_results, new_results = baseline["results"], current["results"]
+    for key in sorted(old_results.keys() & new_results.keys()):
+        old, new = old_results[key], new_results[key]
+        if max(old, new) < min_seconds or old <= 0:
+            continue
+        ratio = new / old
+        if ratio > 1 + threshold:
+            regressions.append((key, old, new, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量重命名性能基准")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), "batch_renamer_bench"))
+    parser.add_argument('--out', default="benchmark.json")
+    parser.add_argument('--compare', help="基准结果 JSON，有退化时以退出码 1 结束")
+    parser.add_argument('--threshold', type=float, default=0.2, help="允许的相对退化（默认 0.2 即 20%%）")
+    parser.add_argument('--min-seconds', type=float, default=0.005)
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.workdir, args.repeat)
+    with open(args.out, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = compare(baseline, report, args.threshold, args.min_seconds)
+        for key, old, new, ratio in regressions:
+            print(f"退化: {key}  {old * 1000:.1f} ms -> {new * 1000:.1f} ms (x{ratio:.2f})", file=sys.stderr)
+        if regressions:
+            return 1
+        print("没有超过阈值的退化", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,11 @@
 
 import tkinter as tk
-from tkinterdnd2 import TkinterDnD
 from src.gui.app import MainApp
 
 def main():
     # 检测是否支持拖拽库
     try:
+        from tkinterdnd2 import TkinterDnD
         root = TkinterDnD.Tk()
     except ImportError:
         root = tk.Tk()
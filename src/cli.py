@@ -0,0 +1,339 @@
+"""
+无界面命令行入口，适合 cron 任务和入库脚本：
+
+    python -m src.cli D:/Photos --prefix Trip_ --padding 3 --dry-run
+    python -m src.cli D:/Photos --rules rules.json --recursive
+    python -m src.cli D:/Inbox --watch --prefix Scan_ --padding 4
+
+进度与结果以 NDJSON（每行一个 JSON 对象）输出到 stdout。
+只导入核心模块；tkinter 不会被导入，PIL 只在元数据模式确实需要时才导入。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from src.core.renamer import RenamerEngine
+from src.core.file_ops import FileProcessor
+from src.core.file_collection import FileCollection
+from src.core.scanner import scan_paths
+from src.core.journal import RenameJournal
+from src.core.profiling import Profiler
+
+MODES = ('sequence', 'regex', 'template', 'metadata_resolution', 'metadata_date', 'metadata_model', 'metadata_hash')
+
+# 命令行参数 -> 规则键
+RULE_ARGS = {
+    'mode': 'mode',
+    'prefix': 'prefix',
+    'suffix': 'suffix',
+    'start_index': 'start_index',
+    'padding': 'padding',
+    'case': 'case',
+    'web_safe': 'web_safe',
+    'regex_pattern': 'regex_pattern',
+    'regex_replacement': 'regex_replacement',
+    'sync_sidecar': 'sync_sidecar',
+    'template': 'template',
+    'auto_resolve': 'auto_resolve',
+    'convert': 'convert_to',
+    'sort': 'sort',
+    'find_duplicates': 'find_duplicates',
+    'group_similar': 'group_similar',
+    'similar_hash': 'similar_hash',
+    'similar_threshold': 'similar_threshold',
+}
+
+
+def emit(event, **fields):
+    """输出一行 NDJSON"""
+    fields = dict(event=event, **fields)
+    sys.stdout.write(json.dumps(fields, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="批量图片重命名（命令行版）")
+    parser.add_argument('paths', nargs='*', help="文件夹或文件路径")
+    parser.add_argument('--rules', help="JSON 规则文件，键与 RenamerEngine 的规则一致；命令行参数优先")
+    parser.add_argument('--mode', choices=MODES)
+    parser.add_argument('--prefix')
+    parser.add_argument('--suffix')
+    parser.add_argument('--start-index', dest='start_index', type=int)
+    parser.add_argument('--padding', type=int)
+    parser.add_argument('--case', choices=('none', 'lower', 'upper'))
+    parser.add_argument('--web-safe', dest='web_safe', action='store_const', const=True)
+    parser.add_argument('--regex-pattern', dest='regex_pattern')
+    parser.add_argument('--regex-replacement', dest='regex_replacement')
+    parser.add_argument('--template', help="命名模板，如 {prefix}{date:%%Y%%m%%d}_{seq:03}{ext}（隐含 --mode template）")
+    parser.add_argument('--sort', help="编号顺序: path natural date mtime size，可组合，如 date,natural；前加 - 表示倒序")
+    parser.add_argument('--find-duplicates', dest='find_duplicates', action='store_const', const=True,
+                        help="标记内容完全相同的文件，只重命名每组第一个（metadata_hash 模式总是开启）")
+    parser.add_argument('--group-similar', dest='group_similar', action='store_const', const=True,
+                        help="按感知哈希把近似重复的图片分组（模板使用 {group} 时自动开启）")
+    parser.add_argument('--similar-hash', dest='similar_hash', choices=('dhash', 'phash'))
+    parser.add_argument('--similar-threshold', dest='similar_threshold', type=int,
+                        help="同组的最大汉明距离（64 位中不同的位数，默认 6）")
+    parser.add_argument('--sync-sidecar', dest='sync_sidecar', action='store_const', const=True)
+    parser.add_argument('--auto-resolve', dest='auto_resolve', action='store_const', const=True,
+                        help="新名称重名或目标已存在时自动追加 _1、_2（否则跳过冲突的文件）")
+    parser.add_argument('--convert', choices=('jpg', 'webp'),
+                        help="同时转换格式（WebP/PNG/BMP -> JPG，或 -> WebP），原文件在转换成功后删除")
+    parser.add_argument('--quality', type=int, default=90)
+    parser.add_argument('--convert-workers', type=int, help="格式转换的进程数（默认为 CPU 核数）")
+    parser.add_argument('--recursive', action='store_true', help="包含子文件夹")
+    parser.add_argument('--max-depth', type=int, help="递归的最大深度")
+    parser.add_argument('--dry-run', action='store_true', help="只输出预览，不执行重命名")
+    parser.add_argument('--executor', choices=('serial', 'thread', 'process'), default='thread',
+                        help="元数据读取方式")
+    parser.add_argument('--workers', type=int, default=8, help="元数据读取并发数")
+    parser.add_argument('--rename-workers', type=int, default=1, help="重命名并发数（网络文件系统可调大）")
+    parser.add_argument('--journal-dir', default=RenameJournal.default_dir())
+    parser.add_argument('--no-journal', action='store_true')
+    parser.add_argument('--cache', help="元数据缓存文件路径（默认与图形界面共用）")
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--trace', help="把各阶段耗时与计数导出为 JSON 跟踪文件（Chrome Trace 格式）")
+    parser.add_argument('--cprofile', action='store_true', help="同时用 cProfile 采样，与 --trace 一起写出 .prof")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="测量命令行与图形界面的启动耗时并退出")
+    parser.add_argument('--watch', action='store_true',
+                        help="持续监视文件夹，只重命名新到达的文件，序号接着上一批继续（Ctrl+C 结束）")
+    parser.add_argument('--watch-interval', dest='watch_interval', type=float, default=2.0,
+                        help="监视模式的轮询间隔（秒）")
+    parser.add_argument('--state', help="监视状态文件（默认按文件夹保存在 ~/.batch_image_renamer/watch）")
+    parser.add_argument('--include-existing', dest='include_existing', action='store_true',
+                        help="首次监视时把文件夹中已有的文件也当作新文件")
+    return parser
+
+
+def load_rules(args):
+    rules = {}
+    if args.rules:
+        with open(args.rules, 'r', encoding='utf-8') as fh:
+            rules.update(json.load(fh))
+    for arg, key in RULE_ARGS.items():
+        value = getattr(args, arg)
+        if value is not None:
+            rules[key] = value
+    if args.template is not None and args.mode is None:
+        rules['mode'] = 'template'
+    rules.setdefault('mode', 'sequence')
+    return rules
+
+
+def make_progress_callback(phase):
+    last = [0.0]
+
+    def callback(done, total):
+        now = time.monotonic()
+        if done == total or now - last[0] >= 0.1:
+            last[0] = now
+            emit("progress", phase=phase, done=done, total=total)
+    return callback
+
+
+def run(args):
+    profiler = Profiler(cprofile=args.cprofile)
+    try:
+        return _run(args, profiler)
+    finally:
+        if args.trace and profiler.history:
+            profiler.export(args.trace)
+
+
+def _timings(operation):
+    emit("timings", operation=operation.name, seconds=round(operation.seconds, 6), phases=operation.summary())
+
+
+def _run(args, profiler):
+    rules = load_rules(args)
+    if args.watch:
+        return run_watch_mode(args, rules, profiler)
+
+    files = FileCollection()
+    with profiler.operation("scan") as operation, profiler.span("scan") as span:
+        for chunk in scan_paths(args.paths, recursive=args.recursive, max_depth=args.max_depth):
+            files.update(chunk)
+            span.add("files", len(chunk))
+    emit("scan", files=len(files))
+    _timings(operation)
+    if not files:
+        emit("done", renamed=0, error="没有找到图片文件")
+        return 1
+
+    # 先编译规则：模板或正则无效时在扫描之后、读取元数据之前报告一次
+    engine = RenamerEngine(executor=args.executor, max_workers=args.workers, profiler=profiler)
+    engine.set_rules(rules)
+
+    metadata_cache = None
+    if engine.compiled_rules().needs_meta and not args.no_cache:
+        # sqlite3 只在需要时导入
+        from src.core.metadata_cache import MetadataCache
+        metadata_cache = MetadataCache(args.cache or MetadataCache.default_path())
+        engine.metadata_cache = metadata_cache
+    engine.progress_callback = make_progress_callback("metadata")
+    with profiler.operation("preview") as operation:
+        preview = engine.generate_preview(files)
+    _timings(operation)
+    if metadata_cache is not None:
+        emit("cache", **metadata_cache.stats())
+        metadata_cache.close()
+
+    changed = [item for item in preview if item['status'] == "OK"]
+    conflicts = [item for item in preview if item['status'] == "冲突"]
+    if conflicts:
+        emit("conflicts", count=len(conflicts),
+             items=[{"path": item['path'], "new": item['new'], "reason": item['conflict']} for item in conflicts])
+    duplicates = [item for item in preview if item['status'] == "重复"]
+    if duplicates:
+        emit("duplicates", count=len(duplicates),
+             items=[{"path": item['path'], "same_as": item['duplicate']} for item in duplicates])
+    if args.dry_run:
+        for item in preview:
+            emit("preview", path=item['path'], new=item['new'], status=item['status'],
+                 sidecars=[new for _, new in item.get('sidecars', ())], conflict=item.get('conflict'),
+                 duplicate=item.get('duplicate'), similar=item.get('similar'))
+        emit("done", renamed=0, planned=len(changed), dry_run=True, error=None)
+        return 0
+
+    converted = 0
+    if rules.get('convert_to'):
+        converted = run_conversions(preview, rules['convert_to'], args)
+
+    processor = FileProcessor(
+        journal_dir=None if args.no_journal else args.journal_dir,
+        max_workers=args.rename_workers,
+        profiler=profiler,
+    )
+    with profiler.operation("rename") as operation:
+        count, error = processor.execute_rename(preview, sync_sidecar=rules.get('sync_sidecar', False))
+    _timings(operation)
+    if converted:
+        converted = sum(1 for ops in processor.history_stack for op in ops if 'backup' in op)
+        # 命令行没有撤回，原文件的备份在批次结束后删除；保留日志时留给回滚使用
+        if not error or args.no_journal:
+            processor.discard_backups()
+    plan = processor.last_plan.summary() if processor.last_plan is not None else None
+    emit("done", renamed=count, converted=converted, plan=plan,
+         seconds=round(operation.seconds, 3), error=error)
+    return 1 if error else 0
+
+
+def run_watch_mode(args, rules, profiler):
+    """监视模式：每批新文件输出一行 watch_batch，Ctrl+C 结束"""
+    import threading
+    from src.core.watcher import FolderWatcher, run_watch
+
+    folders = [path for path in args.paths if os.path.isdir(path)]
+    if not folders:
+        emit("done", renamed=0, error="监视模式需要至少一个文件夹")
+        return 1
+    engine = RenamerEngine(executor=args.executor, max_workers=args.workers, profiler=profiler)
+    engine.set_rules(rules)
+    metadata_cache = None
+    if engine.compiled_rules().needs_meta and not args.no_cache:
+        from src.core.metadata_cache import MetadataCache
+        metadata_cache = MetadataCache(args.cache or MetadataCache.default_path())
+        engine.metadata_cache = metadata_cache
+    processor = FileProcessor(
+        journal_dir=None if args.no_journal else args.journal_dir,
+        max_workers=args.rename_workers,
+        profiler=profiler,
+    )
+    watcher = FolderWatcher(folders, state_path=args.state, recursive=args.recursive,
+                            include_existing=args.include_existing, start_index=rules.get('start_index', 1))
+    emit("watch", folders=folders, state=watcher.state_path, next_index=watcher.next_index)
+
+    renamed = [0]
+
+    def on_batch(result):
+        renamed[0] += result['renamed']
+        emit("watch_batch", **result)
+
+    stop = threading.Event()
+    try:
+        run_watch(watcher, engine, processor, rules, stop, interval=args.watch_interval, on_batch=on_batch)
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        if metadata_cache is not None:
+            metadata_cache.close()
+    emit("done", renamed=renamed[0], next_index=watcher.next_index, error=None)
+    return 0
+
+
+def run_conversions(preview, target, args):
+    """
+    执行格式转换（进程池）。结果先写到同目录下的暂存文件，原文件保持不变，
+    由 FileProcessor.execute_rename 与其他重命名一起移到新名称（见 rename_plan.apply_conversions）。
+    转换失败的项标记为 Error，其附属文件也不会被重命名。
+    returns: 成功转换的数量
+    """
+    from src.utils.image_tools import convert_batch, conversion_jobs, staging_path
+
+    jobs = conversion_jobs(preview)
+    if not jobs:
+        return 0
+    final = dict(jobs)
+    staged = {src: staging_path(dst) for src, dst in jobs}
+
+    def on_result(done, total, result):
+        emit("convert", src=result['src'], dst=final[result['src']], error=result['error'],
+             ms=round(result['seconds'] * 1000, 1), done=done, total=total)
+
+    report = convert_batch(list(staged.items()), target=target, quality=args.quality, delete_original=False,
+                           workers=args.convert_workers, progress_callback=on_result)
+    emit("convert_summary", files=len(jobs), errors=report['errors'],
+         seconds=round(report['seconds'], 3), files_per_sec=round(report['files_per_sec'], 1),
+         bytes_in=report['bytes_in'], bytes_out=report['bytes_out'])
+
+    failed = {r['src'] for r in report['results'] if r['error']}
+    for item in preview:
+        if item['path'] in failed:
+            item['status'] = "Error"
+        elif item['path'] in staged:
+            item['staged'] = staged[item['path']]
+    return len(jobs) - len(failed)
+
+
+def measure_startup(runs=5):
+    """
+    在子进程中分别测量命令行入口与图形界面入口的启动耗时（取多次的最小值）。
+    图形界面路径包括 tkinter 以及启动时绘制图标所需的 PIL 模块。
+    """
+    import subprocess
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    targets = {
+        "cli": "import src.cli",
+        "gui": "import src.gui.app; from PIL import Image, ImageDraw, ImageFont, ImageTk",
+    }
+    result = {}
+    for name, code in targets.items():
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        result[f"{name}_ms"] = round(best * 1000, 1)
+    return result
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.startup_report:
+        emit("startup", **measure_startup())
+        return 0
+    if not args.paths:
+        parser.error("至少需要一个文件夹或文件路径")
+    try:
+        return run(args)
+    except Exception as e:
+        emit("done", renamed=0, error=str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
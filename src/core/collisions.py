@@ -0,0 +1,155 @@
+import os
+import sys
+
+
+# 与 rename_plan 一致：大小写不敏感的文件系统上仅大小写不同的名称视为同一个
+_key = os.path.normcase
+
+
+class DirectoryIndex:
+    """
+    目录内容索引：每个目录只列举一次，用于 O(1) 判断某个名称是否已被占用。
+    """
+    def __init__(self):
+        self._names = {} # directory -> set of normcase(name)
+
+    def names(self, directory):
+        names = self._names.get(directory)
+        if names is None:
+            names = set()
+            try:
+                with os.scandir(directory or ".") as it:
+                    for entry in it:
+                        names.add(_key(entry.name))
+            except OSError:
+                pass
+            self._names[directory] = names
+        return names
+
+    def exists(self, directory, name):
+        return _key(name) in self.names(directory)
+
+
+def find_clashes(pairs, index=None):
+    """
+    执行前的检查：找出会覆盖批次外已有文件的目标。
+    源文件本身会被移走，因此目标指向另一个源文件（链、环路）不算冲突。
+    pairs: list of (src, dst)
+    returns: list of dst
+    """
+    index = index or DirectoryIndex()
+    vacated = {_key(src) for src, dst in pairs if src != dst}
+    clashes = []
+    for src, dst in pairs:
+        if src == dst or _key(dst) in vacated or _key(dst) == _key(src):
+            continue
+        directory, name = os.path.split(dst)
+        if index.exists(directory, name):
+            clashes.append(dst)
+    return clashes
+
+
+def resolve_collisions(items, index, sidecar_index=None, auto_resolve=False):
+    """
+    检查预览项的新名称：批次内重名，或与目录中批次外的已有文件重名。
+    使用按 (目录, 名称) 建立的哈希索引，整体 O(n)。
+    items: 预览项列表（就地修改），只检查 status 为 "OK" 的项
+    sidecar_index: 不为 None 时同时为每项生成 'sidecars'，并检查附属文件的新名称
+    auto_resolve: 为 True 时在主名后追加 _1、_2 … 直到不再冲突；
+                  否则把冲突项的 status 设为 "冲突"，并在 'conflict' 中说明原因
+    returns: 仍然冲突的项数
+    """
+    candidates = [item for item in items if item['status'] == "OK"]
+    planned = {id(item): item['new'] for item in candidates}
+    # 每项的目录只计算一次；相同的目录字符串共享同一个对象
+    # （PreviewRecord 的同一目录共享 head，每个 head 只计算一次）
+    dirs = {}
+    by_head = {}
+    for item in items:
+        head = getattr(item, 'head', None)
+        if head is None:
+            dirs[id(item)] = sys.intern(os.path.dirname(item['path']))
+            continue
+        directory = by_head.get(head)
+        if directory is None:
+            directory = by_head[head] = sys.intern(os.path.dirname(item['path']))
+        dirs[id(item)] = directory
+    occupied = {(dirs[id(item)], _key(item['original'])) for item in items}
+
+    moving = candidates
+    while True:
+        _assign(moving, planned, dirs, occupied, index, sidecar_index, auto_resolve)
+        still_moving = [item for item in moving if item['status'] == "OK"]
+        if len(still_moving) == len(moving):
+            return sum(1 for item in candidates if item['status'] == "冲突")
+        # 有项因冲突留在原处，它们的原名称不再空出，需要重新检查其余的项
+        moving = still_moving
+
+
+def _assign(moving, planned, dirs, occupied, index, sidecar_index, auto_resolve):
+    # 移动的项（及其附属文件）会空出原名称；其余的项（无变化、出错、冲突）继续占用
+    vacated = set()
+    side_lookup = {}
+    claimed = set()
+    for item in moving:
+        directory = dirs[id(item)]
+        vacated.add((directory, _key(item['original'])))
+        if sidecar_index is not None:
+            sides = []
+            for side, suffix, by_full_name in sidecar_index.lookup(item['path']):
+                if (directory, side) in claimed:
+                    continue
+                claimed.add((directory, side))
+                sides.append((side, suffix, by_full_name))
+                vacated.add((directory, _key(side)))
+            side_lookup[id(item)] = sides
+
+    def problem(directory, existing, candidate):
+        key = (directory, _key(candidate))
+        if key in taken:
+            return f"与 {taken[key]} 的新名称相同"
+        if (key[1] in existing or key in occupied) and key not in vacated:
+            return f"目标已存在: {candidate}"
+        return None
+
+    taken = {}
+    for item in moving:
+        directory = dirs[id(item)]
+        existing = index.names(directory)
+        sides = side_lookup.get(id(item))
+        name = planned[id(item)]
+        n = 0
+        while True:
+            side_names = ()
+            if sides:
+                new_stem = os.path.splitext(name)[0]
+                side_names = [(side, (name if by_full_name else new_stem) + suffix)
+                              for side, suffix, by_full_name in sides]
+            reason = problem(directory, existing, name)
+            for _, new in side_names:
+                if reason is not None:
+                    break
+                reason = problem(directory, existing, new)
+            if reason is None or not auto_resolve:
+                break
+            # 自动追加 _1、_2 …
+            n += 1
+            stem, ext = os.path.splitext(planned[id(item)])
+            name = f"{stem}_{n}{ext}"
+
+        if sidecar_index is not None:
+            item['sidecars'] = []
+        if reason is not None:
+            item['status'] = "冲突"
+            item['conflict'] = reason
+            continue
+
+        item['new'] = name
+        if name == item['original']:
+            item['status'] = "无变化"
+            continue
+        taken[(directory, _key(name))] = item['original']
+        for side, new in side_names:
+            taken[(directory, _key(new))] = side
+        if sidecar_index is not None:
+            item['sidecars'] = list(side_names)
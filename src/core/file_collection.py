@@ -0,0 +1,130 @@
+import os
+import sys
+
+
+class FileCollection:
+    """
+    待重命名文件的集合。
+    - 保持插入顺序，成员判断为 O(1)
+    - 按目录分组（目录字符串只保存一份）
+    - 支持批量删除、过滤和替换
+    每次修改都会递增 version，snapshot() 在同一 version 下返回同一个元组，
+    方便预览阶段以 O(1) 判断文件集合是否变化。
+    """
+    def __init__(self, paths=None):
+        self._paths = {} # path -> directory
+        self._dirs = {} # directory -> {path: None}，按插入顺序
+        self.version = 0
+        self._snapshot = None
+        self._snapshot_version = -1
+        if paths:
+            self.update(paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __bool__(self):
+        return bool(self._paths)
+
+    def __contains__(self, path):
+        return path in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def add(self, path):
+        """添加一个路径。returns: 是否为新路径"""
+        if path in self._paths:
+            return False
+        self._insert(path)
+        self.version += 1
+        return True
+
+    def update(self, paths):
+        """批量添加。returns: 新增的数量"""
+        added = 0
+        for path in paths:
+            if path not in self._paths:
+                self._insert(path)
+                added += 1
+        if added:
+            self.version += 1
+        return added
+
+    def remove(self, path):
+        """删除一个路径，不存在时抛出 KeyError"""
+        self._delete(path)
+        self.version += 1
+
+    def discard(self, path):
+        if path in self._paths:
+            self.remove(path)
+
+    def remove_many(self, paths):
+        """批量删除。returns: 实际删除的数量"""
+        removed = 0
+        for path in paths:
+            if path in self._paths:
+                self._delete(path)
+                removed += 1
+        if removed:
+            self.version += 1
+        return removed
+
+    def remove_directory(self, directory):
+        """删除某个目录下的全部文件。returns: 删除的数量"""
+        group = self._dirs.pop(directory, None)
+        if not group:
+            return 0
+        for path in group:
+            del self._paths[path]
+        self.version += 1
+        return len(group)
+
+    def filter(self, predicate):
+        """只保留 predicate(path) 为真的文件。returns: 删除的数量"""
+        return self.remove_many([p for p in self._paths if not predicate(p)])
+
+    def replace(self, paths):
+        """清空后替换为新的路径集合。returns: 新集合的大小"""
+        self._paths = {}
+        self._dirs = {}
+        for path in paths:
+            if path not in self._paths:
+                self._insert(path)
+        self.version += 1
+        return len(self._paths)
+
+    def clear(self):
+        self.replace(())
+
+    def directories(self):
+        """returns: 目录列表（按首次出现的顺序）"""
+        return list(self._dirs)
+
+    def by_directory(self):
+        """returns: dict, directory -> list of paths"""
+        return {d: list(group) for d, group in self._dirs.items()}
+
+    def snapshot(self):
+        """returns: 当前内容的只读元组，同一 version 下复用同一对象"""
+        if self._snapshot_version != self.version:
+            self._snapshot = tuple(self._paths)
+            self._snapshot_version = self.version
+        return self._snapshot
+
+    def _insert(self, path):
+        # 驻留目录字符串，同一目录下的所有文件共享同一个对象
+        directory = sys.intern(os.path.dirname(path))
+        group = self._dirs.get(directory)
+        if group is None:
+            group = self._dirs[directory] = {}
+        group[path] = None
+        self._paths[path] = directory
+
+    def _delete(self, path):
+        directory = self._paths.pop(path)
+        group = self._dirs[directory]
+        del group[path]
+        if not group:
+            del self._dirs[directory]
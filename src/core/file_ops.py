@@ -1,92 +1,275 @@
 
 import os
 import shutil
+import threading
+import uuid
+from src.core.rename_plan import plan_renames, apply_conversions
+from src.core.journal import RenameJournal
+from src.core.sidecar import SidecarIndex
+from src.core.collisions import find_clashes
+from src.core.profiling import Profiler
+
+# execute_rename 因 cancel() 提前结束时返回的错误信息
+CANCELLED = "操作已取消"
 
 class FileProcessor:
     """
     负责执行实际的文件操作，包括重命名、移动、格式转换等。
     维护操作历史以支持撤回。
     """
-    def __init__(self):
+    def __init__(self, journal_dir=None, max_workers=1, profiler=None):
         # 历史栈，每个元素是一个列表: [{'from': path, 'to': path}, ...]
+        # 格式转换的项另有 'staged'（转换结果的暂存路径）与 'backup'（原文件的备份路径）
         self.history_stack = []
+        # 最近一次执行的重命名计划 (RenamePlan)，便于检查
+        self.last_plan = None
+        # 崩溃恢复日志目录，为 None 时不写日志
+        self.journal_dir = journal_dir
+        # 并发执行的线程数。NFS/SMB 等高延迟文件系统上每次 rename 都是一次网络往返，
+        # 大于 1 时互不相关的重命名组会并发执行
+        self.max_workers = max_workers
+        # 分阶段计时（plan / journal / rename / undo），见 Profiler
+        self.profiler = profiler or Profiler()
+        # 进度回调 callback(done, total)，每完成一个步骤调用一次（可能来自多个线程）
+        self.progress_callback = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """
+        请求停止正在执行的重命名（可从其他线程调用）。
+        只在组（链或环路）之间停止，不会留下临时文件或半完成的链；
+        已完成的部分照常记入历史栈，可以撤回。
+        请求在下一次 execute_rename 结束时（或调用 reset_cancel() 时）清除，
+        因此在线程启动之后、执行开始之前发出的取消也不会丢失。
+        """
+        self._cancel.set()
+
+    def reset_cancel(self):
+        """清除之前的取消请求，在启动新的执行之前调用（见 RenameWorker.start）"""
+        self._cancel.clear()
+
+    def build_pairs(self, preview_data, sync_sidecar=False):
+        """
+        根据预览数据生成 (原路径, 新路径) 列表，包含需要同步的 sidecar 文件。
+        预览项中带有 'sidecars'（由 RenamerEngine 在 sync_sidecar 规则下生成）时直接使用，
+        保证执行的内容与预览一致；否则按默认扩展名现场建立索引。
+        需要格式转换的项只有在已转换到 'staged' 之后才参与重命名（见 execute_rename）。
+        """
+        # 筛选出需要重命名的项（跳过无变化、出错和重名冲突的项）
+        to_process = [item for item in preview_data if item['status'] == "OK"]
+
+        index = None
+        if sync_sidecar and any('sidecars' not in item for item in to_process):
+            index = SidecarIndex().build({os.path.dirname(item['path']) for item in to_process})
+
+        pairs = []
+        claimed = set()
+        for item in to_process:
+            old_path = item['path']
+            dir_name = os.path.dirname(old_path)
+            new_path = os.path.join(dir_name, item['new'])
+            # 需要格式转换的项尚未转换时跳过本身，只处理其附属文件
+            if not item.get('convert') or item.get('staged'):
+                pairs.append((old_path, new_path))
+
+            if not sync_sidecar:
+                continue
+            if 'sidecars' in item:
+                sidecars = item['sidecars']
+            else:
+                sidecars = index.rename_map(old_path, item['new'])
+            for old_side, new_side in sidecars:
+                side_old = os.path.join(dir_name, old_side)
+                if side_old in claimed:
+                    continue
+                claimed.add(side_old)
+                pairs.append((side_old, os.path.join(dir_name, new_side)))
+        return pairs
 
     def execute_rename(self, preview_data, sync_sidecar=False):
         """
         执行重命名操作。
         preview_data: RenamerEngine.generate_preview 返回的数据结构
         sync_sidecar: 是否同步重命名同名文件 (如 .txt, .json)
+        预览项带有 'staged'（已转换好的文件，见 cli.run_conversions）时，原文件移到同目录的备份位置，
+        staged 文件移到新名称；这两步与其他重命名一起排序、检查和写入日志。
+        staged 文件在执行后被使用或删除；备份保留到撤回或 discard_backups()。
         returns: (success_count, error_msg)
         """
+        try:
+            return self._execute_rename(preview_data, sync_sidecar)
+        finally:
+            # 取消请求只作用于一次执行
+            self._cancel.clear()
+
+    def _execute_rename(self, preview_data, sync_sidecar):
         operation_log = [] # 记录本次操作，用于撤回
         success_count = 0 
 
-        # 为了避免命名冲突（例如 1->2, 2->3），我们采用两步法：
-        # 1. 全部重命名为临时名称
-        # 2. 临时名称 -> 最终名称
-        # 但这比较耗时。如果直接重命名，需要反向排序或者拓扑排序？
-        # 系统原有的简单逻辑是两步法，这里保留两步法以确保安全。
-        
-        # 筛选出需要重命名的项
-        to_process = [item for item in preview_data if item['status'] not in ("无变化", "Error")]
-        
-        if not to_process:
+        profiler = self.profiler
+        conversions = {
+            item['path']: (item['staged'], _backup_path(item['path']))
+            for item in preview_data if item['status'] == "OK" and item.get('staged')
+        }
+        pairs = self.build_pairs(preview_data, sync_sidecar)
+        if not pairs:
             return 0, "没有需要执行的任务"
 
+        # 在执行任何重命名之前检查目标是否已存在（os.rename 在 Linux 上会直接覆盖）
+        with profiler.span("preflight", files=len(pairs)):
+            clashes = find_clashes(pairs)
+        if clashes:
+            _remove_staged(conversions)
+            more = f" 等 {len(clashes)} 个文件" if len(clashes) > 1 else ""
+            return 0, f"目标文件已存在: {clashes[0]}{more}"
+
+        # 由计划器决定执行顺序：无冲突的项直接重命名，
+        # 链按依赖顺序执行，只有真正的环路 (a->b->a) 才经过一次临时文件中转
         try:
-            temp_map = []
-            
-            # 第一步：原名 -> 临时名
-            for item in to_process:
-                old_path = item['path']
-                dir_name = os.path.dirname(old_path)
-                new_filename = item['new']
-                
-                # 生成临时文件名
-                temp_filename = f"__tmp_{os.path.basename(old_path)}"
-                temp_path = os.path.join(dir_name, temp_filename)
-                
-                os.rename(old_path, temp_path)
-                temp_map.append({
-                    "temp": temp_path,
-                    "final": os.path.join(dir_name, new_filename),
-                    "original": old_path # 记录原始路径用于撤回
-                })
-                
-                # Sidecar 处理 (仅支持简单的一对一同名文件)
-                if sync_sidecar:
-                    base_old = os.path.splitext(old_path)[0]
-                    # 查找该目录下以 base_old 开头的文件（除去自身）
-                    # 简化处理：假设只处理 .txt, .json, .xml
-                    for ext in ['.txt', '.json', '.xml']:
-                        side_old = base_old + ext
-                        if os.path.exists(side_old):
-                            side_new_base = os.path.splitext(os.path.join(dir_name, new_filename))[0]
-                            side_tmp = os.path.join(dir_name, f"__tmp_{os.path.basename(side_old)}")
-                            
-                            os.rename(side_old, side_tmp)
-                            temp_map.append({
-                                "temp": side_tmp,
-                                "final": side_new_base + ext,
-                                "original": side_old
-                            })
-
-            # 第二步：临时名 -> 最终名
-            for item in temp_map:
-                os.rename(item['temp'], item['final'])
-                operation_log.append({
-                    "from": item['original'],
-                    "to": item['final']
-                })
+            with profiler.span("plan", files=len(pairs)):
+                plan = apply_conversions(plan_renames(pairs), conversions)
+        except ValueError as e:
+            _remove_staged(conversions)
+            return 0, str(e)
+        self.last_plan = plan
+
+        journal = None
+        try:
+            if self.journal_dir is not None:
+                with profiler.span("journal", steps=len(plan.steps)):
+                    journal = RenameJournal.create(self.journal_dir, plan.steps, groups=plan.group_ids(),
+                                                   conversions=conversions)
+            with profiler.span("rename", files=len(pairs)) as span:
+                completed, error = self._run_plan(plan, journal)
+                span.add("syscalls", sum(completed))
+        except Exception as e:
+            completed, error = [False] * len(plan.steps), str(e)
+        cancelled = error is None and not all(completed)
+        if cancelled:
+            error = CANCELLED
+
+        # 按计划顺序整理撤回记录（并发执行时完成顺序不确定）
+        for i, (src, dst, origin) in enumerate(plan.steps):
+            if completed[i] and origin is not None:
+                op = {
+                    "from": origin,
+                    "to": dst
+                }
+                if origin in conversions:
+                    op["staged"], op["backup"] = conversions[origin]
+                operation_log.append(op)
                 success_count += 1
-            
-            # 记录到历史栈
+
+        # 记录到历史栈（出错时也记录已完成的部分，以便撤回）
+        if operation_log:
             self.history_stack.append(operation_log)
-            return success_count, None
 
-        except Exception as e:
-            # 尝试回滚已经在本次操作中完成的部分（可选，这里暂不做自动回滚，依靠手动撤回）
-            return success_count, str(e)
+        keep_journal = journal is not None and error is not None and not cancelled
+        if journal is not None:
+            with profiler.span("journal_close") as span:
+                if not keep_journal:
+                    # 取消时停在组之间，磁盘状态一致，已完成部分已记入历史栈
+                    journal.commit()
+                else:
+                    # 保留日志：下次启动时可以选择继续或回滚
+                    journal.close()
+                span.add("fsyncs", journal.fsyncs)
+        if conversions and not keep_journal:
+            # 保留日志时 staged 与备份留给 resume_batch / rollback_batch
+            done = {op["from"] for op in operation_log}
+            _restore_unfinished(conversions, done)
+        return success_count, error
+
+    def _run_plan(self, plan, journal):
+        """
+        执行计划中的步骤。max_workers > 1 时把互不相关的组分配到线程池，
+        组内仍按顺序执行；任一步骤失败后其余任务在下一步之前停止。
+        调用 cancel() 后，每个任务在开始下一组之前停止。
+        returns: (completed, error_msg)，completed[i] 表示第 i 步是否已完成
+        """
+        completed = [False] * len(plan.steps)
+        errors = []
+        stop = threading.Event()
+        cancel = self._cancel
+        total = len(plan.steps)
+        progress = self.progress_callback
+        lock = threading.Lock()
+        done = [0]
+
+        def run(groups):
+            for indices in groups:
+                if stop.is_set() or cancel.is_set():
+                    return
+                for i in indices:
+                    if stop.is_set():
+                        return
+                    src, dst, _ = plan.steps[i]
+                    try:
+                        os.rename(src, dst)
+                        completed[i] = True
+                        if journal is not None:
+                            journal.mark_done(i)
+                    except Exception as e:
+                        errors.append(str(e))
+                        stop.set()
+                        return
+                    if progress is not None:
+                        with lock:
+                            done[0] += 1
+                            progress(done[0], total)
+
+        if self.max_workers <= 1 or len(plan.groups) < 2:
+            run(plan.groups)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                list(pool.map(run, self._batch_groups(plan)))
+
+        return completed, (errors[0] if errors else None)
+
+    def _batch_groups(self, plan):
+        # 把小组合并成大小相近的任务，减少线程调度开销
+        target = max(1, len(plan.steps) // (self.max_workers * 8))
+        batch, size = [], 0
+        for indices in plan.groups:
+            batch.append(indices)
+            size += len(indices)
+            if size >= target:
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+
+    def incomplete_batches(self):
+        """returns: 未完成（例如程序中途崩溃）的批次日志路径列表"""
+        if self.journal_dir is None:
+            return []
+        return RenameJournal.find_incomplete(self.journal_dir)
+
+    def resume_batch(self, journal_path):
+        """
+        继续执行一个未完成的批次。完成后整个批次记入历史栈，可以撤回。
+        returns: (success_count, error_msg)
+        """
+        journal = RenameJournal.load(journal_path)
+        count, error = journal.resume()
+        operation_log = []
+        for i, (src, dst, origin) in enumerate(journal.steps):
+            if origin is not None and i in journal.done:
+                op = {"from": origin, "to": dst}
+                if origin in journal.conversions:
+                    op["staged"], op["backup"] = journal.conversions[origin]
+                operation_log.append(op)
+        if operation_log:
+            self.history_stack.append(operation_log)
+        return count, error
+
+    def rollback_batch(self, journal_path):
+        """
+        回滚一个未完成的批次，恢复到执行前的文件名。
+        returns: (success_count, error_msg)
+        """
+        return RenameJournal.load(journal_path).rollback()
 
     def undo_last_operation(self):
         """
@@ -101,13 +284,76 @@ class FileProcessor:
         
         try:
             # 反向执行：将 'to' 重命名回 'from'
-            # 同样可能通过中转文件更安全，但作为撤回，暂时直接重命名
-            # 注意：如果文件被移动或覆盖，可能会失败
+            # 同样交给计划器排序，避免链式操作在撤回时互相覆盖
+            # 注意：如果文件被移动或删除，则跳过
+            # 格式转换的项：转换结果移回 staged 后删除，原文件从备份移回原位置
+            pairs = []
+            backups = set()
+            for op in last_ops:
+                if not os.path.exists(op['to']):
+                    continue
+                if 'backup' in op:
+                    pairs.append((op['to'], op['staged']))
+                    pairs.append((op['backup'], op['from']))
+                    backups.add(op['backup'])
+                else:
+                    pairs.append((op['to'], op['from']))
+            plan = plan_renames(pairs)
+            with self.profiler.span("undo", files=len(pairs) - len(backups)) as span:
+                for src, dst, origin in plan.steps:
+                    os.rename(src, dst)
+                    span.add("syscalls")
+                    if origin is not None and origin not in backups:
+                        success_count += 1
             for op in last_ops:
-                if os.path.exists(op['to']):
-                    os.rename(op['to'], op['from'])
-                    success_count += 1
+                if 'staged' in op and os.path.exists(op['staged']):
+                    os.remove(op['staged'])
             
             return success_count, None
         except Exception as e:
             return success_count, str(e)
+
+    def discard_backups(self):
+        """
+        删除格式转换留下的原文件备份。之后这些转换不能再撤回，对应的记录从历史栈中移除。
+        returns: 删除的备份数
+        """
+        count = 0
+        for ops in self.history_stack:
+            for op in ops:
+                if 'backup' not in op:
+                    continue
+                try:
+                    os.remove(op['backup'])
+                    count += 1
+                except OSError:
+                    pass
+            ops[:] = [op for op in ops if 'backup' not in op]
+        self.history_stack = [ops for ops in self.history_stack if ops]
+        return count
+
+
+def _backup_path(path):
+    # 原文件在重命名期间的备份位置：同目录下的隐藏文件
+    dir_name, base = os.path.split(path)
+    return os.path.join(dir_name, f".{base}.{uuid.uuid4().hex[:8]}.orig")
+
+
+def _remove_staged(conversions):
+    for staged, _ in conversions.values():
+        if os.path.exists(staged):
+            os.remove(staged)
+
+
+def _restore_unfinished(conversions, done):
+    """
+    处理未完成的转换：原文件已移到备份但转换结果未就位时（中途出错）把原文件移回，
+    并删除未使用的 staged 文件。
+    """
+    for src, (staged, backup) in conversions.items():
+        if src in done:
+            continue
+        if os.path.exists(backup) and not os.path.exists(src):
+            os.rename(backup, src)
+        if os.path.exists(staged):
+            os.remove(staged)
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import threading
+
+
+class RenameJournal:
+    """
+    重命名批次的预写日志 (NDJSON)。
+    第一行记录完整的计划步骤，之后追加 {"done": [索引...]} 记录已完成的步骤。
+    为了速度，fsync 每 sync_every 个操作成组进行（每个涉及的目录同步一次），而不是每个文件一次；
+    未来得及写入日志的步骤在恢复时通过检查文件系统来判定（见 _reconcile）。
+    批次成功后调用 commit() 删除日志；残留的日志即表示未完成的批次。
+    带有格式转换时，第一行还记录 conversions（源路径 -> (staged, backup)，见 rename_plan.apply_conversions），
+    回滚时删除尚未使用或被移回的 staged 文件，原文件从 backup 移回原位置。
+    """
+    SUFFIX = ".journal"
+
+    def __init__(self, path, steps, done=None, sync_every=500, groups=None, conversions=None):
+        self.path = path
+        self.steps = steps # list of (src, dst, origin)
+        self.conversions = conversions or {}
+        self.done = set(done or ())
+        self.sync_every = sync_every
+        # 每个步骤所属的组（见 RenamePlan.groups），组内按顺序执行；为 None 时按目录分组
+        self.groups = groups
+
+        # 已执行的 fsync 次数（日志文件与目录），供性能统计
+        self.fsyncs = 0
+
+        self._fh = None
+        self._pending = [] # 已完成但尚未写入日志的步骤索引
+        self._dirty_dirs = set() # 自上次同步后有变动的目录
+        # 并发执行时 mark_done 会从多个线程调用
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_dir():
+        """默认日志目录: ~/.batch_image_renamer/journal"""
+        return os.path.join(os.path.expanduser("~"), ".batch_image_renamer", "journal")
+
+    @classmethod
+    def create(cls, journal_dir, steps, sync_every=500, groups=None, conversions=None):
+        """创建新批次的日志文件，并在执行任何重命名之前落盘"""
+        os.makedirs(journal_dir, exist_ok=True)
+        name = f"batch-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(steps):x}{cls.SUFFIX}"
+        journal = cls(os.path.join(journal_dir, name), [tuple(s) for s in steps],
+                      sync_every=sync_every, groups=groups, conversions=conversions)
+        journal._fh = open(journal.path, 'w', encoding='utf-8')
+        header = {"steps": journal.steps, "sync_every": sync_every, "groups": groups}
+        if conversions:
+            header["conversions"] = conversions
+        journal._fh.write(json.dumps(header) + "\n")
+        journal._fh.flush()
+        os.fsync(journal._fh.fileno())
+        _fsync_dir(journal_dir)
+        journal.fsyncs = 2
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        """读取日志，并结合文件系统状态判定哪些步骤已经完成"""
+        with open(path, 'r', encoding='utf-8') as fh:
+            header = json.loads(fh.readline())
+            steps = [tuple(s) for s in header["steps"]]
+            sync_every = header.get("sync_every", 500)
+            groups = header.get("groups")
+            conversions = {src: tuple(paths) for src, paths in header.get("conversions", {}).items()}
+            done = set()
+            for line in fh:
+                try:
+                    done.update(json.loads(line)["done"])
+                except (ValueError, KeyError):
+                    break # 崩溃时写了一半的最后一行
+        journal = cls(path, steps, done, sync_every=sync_every, groups=groups, conversions=conversions)
+        journal._reconcile()
+        return journal
+
+    @classmethod
+    def find_incomplete(cls, journal_dir):
+        """returns: 未完成批次的日志路径列表（按时间排序）"""
+        if not os.path.isdir(journal_dir):
+            return []
+        return sorted(
+            os.path.join(journal_dir, f) for f in os.listdir(journal_dir) if f.endswith(cls.SUFFIX)
+        )
+
+    def mark_done(self, index):
+        """记录第 index 步已完成。按组写入并 fsync"""
+        with self._lock:
+            self._dirty_dirs.add(os.path.dirname(self.steps[index][0]))
+            self.done.add(index)
+            self._pending.append(index)
+            # 临时中转之后立即同步，恢复时才能区分环路执行到了哪一步
+            if len(self._pending) >= self.sync_every or self.steps[index][2] is None:
+                self._sync()
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        # 先持久化目录中的 rename（每个目录一次），再把对应的完成记录写入日志
+        if not self._pending:
+            return
+        for directory in self._dirty_dirs:
+            _fsync_dir(directory)
+        self.fsyncs += len(self._dirty_dirs) + 1
+        self._dirty_dirs.clear()
+        fh = self._open()
+        fh.write(json.dumps({"done": self._pending}) + "\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+        self._pending = []
+
+    def commit(self):
+        """批次完成，删除日志"""
+        self.close()
+        os.remove(self.path)
+
+    def close(self):
+        if self._fh is not None or self._pending:
+            self.sync()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def remaining(self):
+        """returns: 尚未完成的步骤索引（按原顺序）"""
+        return [i for i in range(len(self.steps)) if i not in self.done]
+
+    def resume(self):
+        """
+        继续执行未完成的步骤，成功后删除日志。
+        returns: (success_count, error_msg)
+        """
+        count = 0
+        try:
+            for i in self.remaining():
+                src, dst, _ = self.steps[i]
+                os.rename(src, dst)
+                self.mark_done(i)
+                count += 1
+            self.commit()
+            return count, None
+        except Exception as e:
+            self.close()
+            return count, str(e)
+
+    def rollback(self):
+        """
+        按相反顺序撤销已完成的步骤，恢复到批次开始前的状态，成功后删除日志。
+        returns: (success_count, error_msg)
+        """
+        count = 0
+        try:
+            for i in sorted(self.done, reverse=True):
+                src, dst, _ = self.steps[i]
+                if os.path.exists(dst) and not os.path.exists(src):
+                    os.rename(dst, src)
+                    count += 1
+            # 转换结果不再需要（原文件已从 backup 移回）
+            for staged, _ in self.conversions.values():
+                if os.path.exists(staged):
+                    os.remove(staged)
+            self._pending = []
+            self.close()
+            os.remove(self.path)
+            return count, None
+        except Exception as e:
+            # 保留日志，之后可以再次尝试回滚
+            self._pending = []
+            self.close()
+            return count, str(e)
+
+    def _open(self):
+        if self._fh is None:
+            self._fh = open(self.path, 'a', encoding='utf-8')
+        return self._fh
+
+    def _reconcile(self):
+        """
+        推断未写入日志的步骤中哪些已经执行。
+        同一组（无分组信息时为同一目录）内的步骤按顺序执行，因此未记录的步骤中已执行的是一个前缀。
+        对每个可能的前缀长度 t，检查“前 t 步已执行、其余未执行”是否与磁盘上的
+        文件存在情况一致（反向撤销前 t 步、正向执行其余步骤都必须合法）。
+        临时中转后会立即同步日志，保证窗口内不包含完整的环路，从而结果唯一。
+        """
+        windows = {}
+        for i, (src, dst, _) in enumerate(self.steps):
+            if i not in self.done:
+                key = self.groups[i] if self.groups is not None else os.path.dirname(src)
+                windows.setdefault(key, []).append(i)
+
+        for indices in windows.values():
+            # 未同步的步骤最多 sync_every 个，只需检查这个窗口
+            indices = indices[:self.sync_every + 1]
+            steps = [self.steps[i] for i in indices]
+            observed = {}
+            for src, dst, _ in steps:
+                for path in (src, dst):
+                    if path not in observed:
+                        observed[path] = os.path.exists(path)
+
+            executed = 0
+            for t in range(len(steps), -1, -1):
+                if _consistent(steps, t, observed):
+                    executed = t
+                    break
+            self.done.update(indices[:executed])
+
+def _fsync_dir(directory):
+    # 持久化目录项的变化 (rename)。Windows 不支持对目录 fsync，直接跳过
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _consistent(steps, t, observed):
+    # 从观察到的状态反向撤销前 t 步
+    state = dict(observed)
+    for src, dst, _ in reversed(steps[:t]):
+        if not state[dst] or state[src]:
+            return False
+        state[dst], state[src] = False, True
+    # 从观察到的状态正向执行剩余步骤
+    state = dict(observed)
+    for src, dst, _ in steps[t:]:
+        if not state[src] or state[dst]:
+            return False
+        state[src], state[dst] = False, True
+    return True
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class MetadataCache:
+    """
+    图片元数据的持久化缓存 (SQLite)。
+    以 (path, size, mtime_ns, inode) 作为有效性判断，文件发生变化时自动失效。
+    超过 max_entries 时按最近使用时间淘汰最旧的记录。
+    同一个数据库中还缓存文件内容的哈希（见 get_hash），按 (设备, inode, 大小, mtime) 索引，
+    与路径无关，文件重命名后仍然有效。
+    """
+    def __init__(self, db_path=None, max_entries=200000):
+        # db_path 为 None 时使用内存数据库（仅在本次运行内有效）
+        self.db_path = db_path or ":memory:"
+        self.max_entries = max_entries
+
+        # 统计计数器
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hash_hits = 0
+        self.hash_misses = 0
+
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        # 预览时可能从线程池访问，统一由锁串行化
+        self._lock = threading.Lock()
+        self._touched = {}  # path -> last_used，延迟写回
+        self._touched_hashes = {}  # (dev, inode, size, mtime_ns, algorithm) -> last_used
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " data TEXT, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON metadata(last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " dev INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, algorithm TEXT,"
+            " digest TEXT, last_used REAL,"
+            " PRIMARY KEY (dev, inode, size, mtime_ns, algorithm))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_hash_last_used ON hashes(last_used)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        self._hash_count = self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+    @staticmethod
+    def default_path():
+        """默认缓存文件位置: ~/.batch_image_renamer/metadata_cache.sqlite"""
+        return os.path.join(os.path.expanduser("~"), ".batch_image_renamer", "metadata_cache.sqlite")
+
+    def get(self, path, st=None):
+        """
+        读取缓存。st 为 os.stat 结果（可由调用方传入以避免重复 stat）。
+        returns: dict or None (未命中或已失效)
+        """
+        if st is None:
+            st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, data FROM metadata WHERE path=?", (path,)
+            ).fetchone()
+            if row is None or tuple(row[:3]) != (st.st_size, st.st_mtime_ns, st.st_ino):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[path] = time.time()
+        return json.loads(row[3])
+
+    def put(self, path, meta, st=None):
+        """写入（或覆盖）一条缓存记录"""
+        if st is None:
+            st = os.stat(path)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (path, size, mtime_ns, inode, data, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, st.st_ino, json.dumps(meta), time.time())
+            )
+            # INSERT OR REPLACE 对已存在的行同样返回 rowcount=1，这里只做近似计数，淘汰时再校正
+            self._count += cur.rowcount
+            if self._count > self.max_entries:
+                self._evict()
+
+    @staticmethod
+    def _hash_key(st, algorithm):
+        # inode 为 0 的文件系统无法可靠识别文件，不缓存
+        if not st.st_ino:
+            return None
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algorithm)
+
+    def get_hash(self, st, algorithm='sha1'):
+        """
+        读取文件内容哈希的缓存。st 为文件的 os.stat 结果。
+        returns: 十六进制摘要 or None
+        """
+        key = self._hash_key(st, algorithm)
+        if key is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM hashes WHERE dev=? AND inode=? AND size=? AND mtime_ns=? AND algorithm=?", key
+            ).fetchone()
+            if row is None:
+                self.hash_misses += 1
+                return None
+            self.hash_hits += 1
+            self._touched_hashes[key] = time.time()
+        return row[0]
+
+    def put_hash(self, st, digest, algorithm='sha1'):
+        """写入一条内容哈希缓存"""
+        key = self._hash_key(st, algorithm)
+        if key is None:
+            return
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR REPLACE INTO hashes (dev, inode, size, mtime_ns, algorithm, digest, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (digest, time.time())
+            )
+            self._hash_count += cur.rowcount
+            if self._hash_count > self.max_entries:
+                self._evict_hashes()
+
+    def invalidate(self, path):
+        """删除指定路径的缓存"""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM metadata WHERE path=?", (path,))
+            self._count -= cur.rowcount
+            self._touched.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM metadata")
+            self._conn.execute("DELETE FROM hashes")
+            self._conn.commit()
+            self._count = 0
+            self._hash_count = 0
+            self._touched.clear()
+            self._touched_hashes.clear()
+
+    def flush(self):
+        """提交挂起的写入，并批量回写命中记录的使用时间"""
+        with self._lock:
+            if self._touched:
+                self._conn.executemany(
+                    "UPDATE metadata SET last_used=? WHERE path=?",
+                    [(ts, p) for p, ts in self._touched.items()]
+                )
+                self._touched.clear()
+            if self._touched_hashes:
+                self._conn.executemany(
+                    "UPDATE hashes SET last_used=?"
+                    " WHERE dev=? AND inode=? AND size=? AND mtime_ns=? AND algorithm=?",
+                    [(ts,) + key for key, ts in self._touched_hashes.items()]
+                )
+                self._touched_hashes.clear()
+            self._conn.commit()
+
+    def stats(self):
+        """returns: dict, 包含 hits / misses / evictions / entries 及内容哈希的 hash_hits / hash_misses / hash_entries"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": self._count,
+            "hash_hits": self.hash_hits,
+            "hash_misses": self.hash_misses,
+            "hash_entries": self._hash_count,
+        }
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        # 调用方已持有锁。一次淘汰到上限的 90%，避免每次写入都触发
+        self._count = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        cur = self._conn.execute(
+            "DELETE FROM metadata WHERE path IN ("
+            " SELECT path FROM metadata ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self._count -= cur.rowcount
+        self.evictions += cur.rowcount
+
+    def _evict_hashes(self):
+        # 调用方已持有锁，与 _evict 相同
+        self._hash_count = self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        excess = self._hash_count - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        cur = self._conn.execute(
+            "DELETE FROM hashes WHERE rowid IN ("
+            " SELECT rowid FROM hashes ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self._hash_count -= cur.rowcount
+        self.evictions += cur.rowcount
@@ -0,0 +1,300 @@
+import re
+from datetime import datetime
+from src.utils.image_tools import CONVERT_TARGETS
+from src.core.sort_order import parse_sort, DEFAULT_SORT, META_SORT_KEYS
+from src.utils.perceptual_hash import ALGORITHMS as SIMILAR_ALGORITHMS, DEFAULT_ALGORITHM as DEFAULT_SIMILAR_ALGORITHM, \
+    DEFAULT_THRESHOLD as DEFAULT_SIMILAR_THRESHOLD
+
+# 字段: {name} 或 {name:format}，{{ 与 }} 表示字面的花括号
+_FIELD_RE = re.compile(r'\{\{|\}\}|\{([^{}:]*)(?::([^{}]*))?\}|[{}]')
+
+# 需要元数据的字段
+META_FIELDS = frozenset({'date', 'width', 'height', 'resolution', 'model'})
+
+# 内置模式对应的模板
+MODE_TEMPLATES = {
+    'sequence': "{prefix}{suffix}_{seq}{ext}",
+    'metadata_resolution': "{prefix}{resolution}{suffix}_{seq}{ext}",
+    'metadata_date': "{prefix}{date}{suffix}_{seq}{ext}",
+    'metadata_model': "{prefix}{model}{suffix}_{seq}{ext}",
+    'metadata_hash': "{prefix}{hash}{suffix}{ext}",
+}
+
+DEFAULT_DATE_FORMAT = '%Y%m%d_%H%M%S'
+
+# {hash} 默认使用的摘要长度（十六进制字符数）
+DEFAULT_HASH_LENGTH = 10
+
+
+class TemplateError(ValueError):
+    """模板或正则表达式无效。在规则变化时抛出一次，而不是在每一行上报错"""
+    pass
+
+
+class MetadataUnavailable(Exception):
+    """该文件的元数据无法读取或缺少模板所需的字段"""
+    pass
+
+
+class NamingTemplate:
+    """
+    编译后的模板：一组按顺序拼接的 token。
+    每个 token 是 callable(fact, seq, ext) -> str，其中 ext 为（可能已转换的）扩展名。
+    """
+    def __init__(self, source, tokens, fields):
+        self.source = source
+        self.tokens = tokens
+        self.fields = frozenset(fields)
+        self.needs_meta = bool(self.fields & META_FIELDS)
+        self.needs_hash = 'hash' in self.fields
+        self.needs_groups = 'group' in self.fields
+        self.uses_seq = 'seq' in self.fields
+
+    def render(self, fact, seq, ext):
+        return "".join([token(fact, seq, ext) for token in self.tokens])
+
+
+def compile_template(source, rules=None):
+    """
+    解析并编译模板，例如 "{prefix}{date:%Y%m%d}{suffix}_{seq:03}{ext}"。
+    可用字段：
+        prefix / suffix          规则中的前缀、后缀（作为普通文本，不再解析）
+        folder                   所在文件夹名
+        name / original          原文件名（不含 / 含扩展名）
+        ext                      扩展名（小写，格式转换时为目标扩展名）
+        seq[:格式]               序号，格式同 format()，默认按 rules['padding'] 补零
+        date[:strftime格式]      拍摄时间（EXIF），没有时使用修改时间
+        width / height / resolution / model   图片元数据
+        hash[:长度]              文件内容的 SHA-1（十六进制），默认取前 10 位
+        group[:格式]             近似重复（连拍、重新导出）的分组编号，格式同 seq
+    returns: NamingTemplate
+    raises: TemplateError
+    """
+    rules = rules or {}
+    tokens = []
+    fields = []
+    pos = 0
+    for m in _FIELD_RE.finditer(source):
+        if m.start() > pos:
+            tokens.append(_literal(source[pos:m.start()]))
+        pos = m.end()
+        text = m.group(0)
+        if text in ('{{', '}}'):
+            tokens.append(_literal(text[0]))
+            continue
+        if text in ('{', '}'):
+            raise TemplateError(f"模板中的花括号不成对: {source}")
+        name, spec = m.group(1).strip(), m.group(2)
+        tokens.append(_field_token(name, spec, rules))
+        fields.append(name)
+    if pos < len(source):
+        tokens.append(_literal(source[pos:]))
+    return NamingTemplate(source, _merge_literals(tokens), fields)
+
+
+def _literal(text):
+    def token(fact, seq, ext):
+        return text
+    token.literal = text
+    return token
+
+
+def _merge_literals(tokens):
+    # 相邻的字面量合并为一个 token
+    merged = []
+    for token in tokens:
+        if merged and hasattr(token, 'literal') and hasattr(merged[-1], 'literal'):
+            merged[-1] = _literal(merged[-1].literal + token.literal)
+        else:
+            merged.append(token)
+    return merged
+
+
+def _field_token(name, spec, rules):
+    if name in ('prefix', 'suffix'):
+        if spec:
+            raise TemplateError(f"字段 {{{name}}} 不支持格式")
+        return _literal(str(rules.get(name, '')))
+
+    if name in ('folder', 'original', 'ext', 'name'):
+        if spec:
+            raise TemplateError(f"字段 {{{name}}} 不支持格式")
+        if name == 'ext':
+            return lambda fact, seq, ext: ext
+        if name == 'name':
+            return lambda fact, seq, ext: fact['original'][:len(fact['original']) - len(fact['ext'])]
+        return lambda fact, seq, ext: fact[name]
+
+    if name in ('seq', 'group'):
+        if spec is None:
+            padding = int(rules.get('padding', 0))
+            spec = f"0{padding}d" if padding else "d"
+        try:
+            format(1, spec)
+        except ValueError:
+            raise TemplateError(f"无效的序号格式: {{{name}:{spec}}}")
+        if name == 'group':
+            return _group_token(spec)
+        return lambda fact, seq, ext: format(seq, spec)
+
+    if name == 'date':
+        date_format = spec or DEFAULT_DATE_FORMAT
+        return _meta_token(lambda meta: _meta_datetime(meta).strftime(date_format), exif=True)
+
+    if name in ('width', 'height'):
+        if spec:
+            try:
+                format(1, spec)
+            except ValueError:
+                raise TemplateError(f"无效的格式: {{{name}:{spec}}}")
+            return _meta_token(lambda meta: format(meta[name], spec))
+        return _meta_token(lambda meta: str(meta[name]))
+
+    if name == 'hash':
+        length = DEFAULT_HASH_LENGTH
+        if spec:
+            if not spec.isdigit() or not 1 <= int(spec) <= 40:
+                raise TemplateError(f"无效的哈希长度: {{hash:{spec}}}（应为 1-40）")
+            length = int(spec)
+        return _hash_token(length)
+
+    if name == 'resolution':
+        return _meta_token(lambda meta: f"{meta['width']}x{meta['height']}")
+
+    if name == 'model':
+        return _meta_token(_meta_model, exif=True)
+
+    raise TemplateError(f"未知的模板字段: {{{name}}}")
+
+
+def _meta_token(getter, exif=False):
+    # exif=True：字段来自 EXIF，不支持 EXIF 的格式（GIF、BMP）视为无法读取，不占用序号
+    def token(fact, seq, ext):
+        meta = fact['meta']
+        if meta is None or 'error' in meta:
+            raise MetadataUnavailable(meta.get('error') if meta else "未读取元数据")
+        if exif and meta.get('exif') is False:
+            raise MetadataUnavailable("该格式不支持 EXIF")
+        try:
+            return getter(meta)
+        except Exception as e:
+            raise MetadataUnavailable(str(e))
+    return token
+
+
+def _hash_token(length):
+    def token(fact, seq, ext):
+        digest = fact.get('hash')
+        if digest is None:
+            raise MetadataUnavailable("无法计算文件哈希")
+        return digest[:length]
+    return token
+
+
+def _group_token(spec):
+    def token(fact, seq, ext):
+        group = fact.get('group')
+        if group is None:
+            raise MetadataUnavailable("未计算相似分组")
+        return format(group, spec)
+    return token
+
+
+def _meta_datetime(meta):
+    date_str = meta.get('date')
+    if date_str:
+        return datetime.strptime(date_str, '%Y:%m:%d %H:%M:%S')
+    return datetime.fromtimestamp(meta['mtime'])
+
+
+def _meta_model(meta):
+    model = meta.get('model') or "UnknownCamera"
+    return re.sub(r'[^\w\-]', '', model.replace(' ', '_'))
+
+
+class CompiledRules:
+    """
+    规则编译后的结果，供 RenamerEngine.apply_rules 逐文件使用，
+    循环中不再查询规则字典或按模式分支。
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        self.mode = rules.get('mode', 'sequence')
+        self.start_index = int(rules.get('start_index', 1))
+        self.sync_sidecar = rules.get('sync_sidecar', False)
+        # 重名时自动追加 _1、_2 …（否则标记为冲突，不执行）
+        self.auto_resolve = rules.get('auto_resolve', False)
+
+        self.template = None
+        self.regex = None
+        self.regex_replacement = rules.get('regex_replacement', '')
+        if self.mode == 'regex':
+            pattern = rules.get('regex_pattern', '')
+            if pattern:
+                try:
+                    self.regex = re.compile(pattern)
+                except re.error as e:
+                    raise TemplateError(f"正则表达式无效: {e}")
+        elif self.mode == 'template':
+            source = rules.get('template', '')
+            if not source:
+                raise TemplateError("命名模板为空")
+            self.template = compile_template(source, rules)
+        elif self.mode in MODE_TEMPLATES:
+            source = MODE_TEMPLATES[self.mode]
+            if self.mode == 'sequence' and not rules.get('prefix', ''):
+                # 没有前缀时使用文件夹名
+                source = source.replace('{prefix}', '{folder}', 1)
+            self.template = compile_template(source, rules)
+
+        # 编号顺序，见 sort_order.parse_sort
+        try:
+            self.sort = parse_sort(rules.get('sort', DEFAULT_SORT))
+        except ValueError as e:
+            raise TemplateError(str(e))
+
+        self.needs_meta = ((self.template is not None and self.template.needs_meta)
+                           or any(key in META_SORT_KEYS for key, _ in self.sort))
+        self.needs_hash = self.template is not None and self.template.needs_hash
+        # 标记内容完全相同的文件（只保留第一个参与重命名）；按内容哈希命名时总是开启
+        self.find_duplicates = bool(rules.get('find_duplicates', False)) or self.needs_hash
+
+        # 近似重复分组：模板使用 {group} 或 rules['group_similar'] 为 True 时计算
+        self.group_similar = (bool(rules.get('group_similar', False))
+                              or (self.template is not None and self.template.needs_groups))
+        self.similar_algorithm = rules.get('similar_hash', DEFAULT_SIMILAR_ALGORITHM)
+        if self.similar_algorithm not in SIMILAR_ALGORITHMS:
+            raise TemplateError(f"未知的感知哈希算法: {self.similar_algorithm}")
+        try:
+            self.similar_threshold = int(rules.get('similar_threshold', DEFAULT_SIMILAR_THRESHOLD))
+        except (TypeError, ValueError):
+            raise TemplateError("相似阈值应为整数")
+        if not 0 <= self.similar_threshold <= 32:
+            raise TemplateError("相似阈值应在 0-32 之间")
+
+        self.convert_to = rules.get('convert_to')
+        self.convert_ext, self.convert_sources = None, frozenset()
+        if self.convert_to:
+            if self.convert_to not in CONVERT_TARGETS:
+                raise TemplateError(f"不支持的转换格式: {self.convert_to}")
+            _, self.convert_ext, self.convert_sources = CONVERT_TARGETS[self.convert_to]
+
+        # 公共后处理：大小写转换、Web 安全（空格转下划线）
+        steps = []
+        case_mode = rules.get('case', 'none')
+        if case_mode == 'lower':
+            steps.append(str.lower)
+        elif case_mode == 'upper':
+            steps.append(str.upper)
+        if rules.get('web_safe', False):
+            steps.append(lambda name: name.replace(" ", "_"))
+        self.post_steps = tuple(steps)
+
+    def regex_name(self, original_name):
+        if self.regex is None:
+            return original_name
+        try:
+            return self.regex.sub(self.regex_replacement, original_name)
+        except re.error as e:
+            # 替换串错误（如引用了不存在的分组）对所有文件都一样，直接报告一次
+            raise TemplateError(f"正则替换无效: {e}")
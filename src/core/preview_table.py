@@ -0,0 +1,189 @@
+import tracemalloc
+
+
+class PreviewRecord:
+    """
+    一条预览结果。使用 __slots__ 代替 dict 以减少内存：
+    完整路径不单独保存，由目录部分 head（同一目录的所有记录共享一个字符串）与原文件名拼接得到；
+    同步附属文件时每条记录都有 sidecars，单独占一个槽位（以元组保存，空元组共享）；
+    conflict / convert 等少数记录才有的字段放在按需创建的 extra 中。
+
+    支持与原来的 dict 相同的读写方式（item['new']、item.get('sidecars')、'conflict' in item），
+    现有代码（FileProcessor.execute_rename、CLI、界面）无需修改。
+    """
+    __slots__ = ('head', 'original', 'new', 'status', 'sidecars', 'extra')
+
+    FIELDS = ('original', 'new', 'path', 'status')
+
+    def __init__(self, head, original, new, status, extra=None):
+        self.head = head         # 路径中文件名之前的部分（含末尾分隔符），可能为空
+        self.original = original
+        self.new = new
+        self.status = status
+        self.sidecars = None     # None 表示未计算
+        self.extra = extra
+
+    @property
+    def path(self):
+        return self.head + self.original
+
+    def __getitem__(self, key):
+        if key in ('original', 'new', 'status'):
+            return getattr(self, key)
+        if key == 'path':
+            return self.head + self.original
+        if key == 'sidecars' and self.sidecars is not None:
+            return list(self.sidecars)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in ('original', 'new', 'status'):
+            setattr(self, key, value)
+        elif key == 'path':
+            raise KeyError("path 由目录与原文件名组成，不能单独修改")
+        elif key == 'sidecars':
+            self.sidecars = tuple(value) if value else ()
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key == 'sidecars' and self.sidecars is not None:
+            self.sidecars = None
+            return
+        if self.extra is None or key not in self.extra:
+            raise KeyError(key)
+        del self.extra[key]
+        if not self.extra:
+            self.extra = None
+
+    def __contains__(self, key):
+        if key == 'sidecars' and self.sidecars is not None:
+            return True
+        return key in self.FIELDS or (self.extra is not None and key in self.extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        keys = list(self.FIELDS)
+        if self.sidecars is not None:
+            keys.append('sidecars')
+        if self.extra is not None:
+            keys.extend(self.extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (PreviewRecord, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"PreviewRecord({self.to_dict()!r})"
+
+
+class PreviewTable(list):
+    """
+    预览结果：PreviewRecord 的列表，相同的目录部分只保存一份。
+    用法与原来的 list of dict 相同；as_dicts() 返回等价的 list of dict，
+    供需要真正的 dict 的调用方（如 JSON 序列化）使用。
+    """
+    def __init__(self, records=()):
+        super().__init__(records)
+        self._heads = {}
+
+    def add(self, path, original, new, status, **extra):
+        """
+        追加一条记录。path 必须以 original 结尾（即 basename(path) == original）。
+        returns: 新记录
+        """
+        head = path[:len(path) - len(original)]
+        head = self._heads.setdefault(head, head)
+        record = PreviewRecord(head, original, new, status, extra or None)
+        self.append(record)
+        return record
+
+    def directories(self):
+        """returns: 记录中出现的不同目录部分的数量"""
+        return len(self._heads)
+
+    def as_dicts(self):
+        return [record.to_dict() for record in self]
+
+
+def _allocated(build):
+    # 分配的净字节数（调用前已开启 tracemalloc 时不关闭）
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        if started:
+            tracemalloc.stop()
+    del result
+    return after - before
+
+
+def memory_per_entry(table):
+    """
+    测量每条预览结果占用的内存（字节），与等价的 list of dict 对比。
+    两种表示共享同样的字符串（dict 形式的 path 也与 facts 共享），
+    只统计各自额外分配的容器：记录对象或 dict、extra 以及列表槽位。
+    returns: dict, {"records": 每条字节数, "dicts": 每条字节数, "entries": 条数}
+    """
+    n = len(table)
+    if not n:
+        return {"records": 0, "dicts": 0, "entries": 0}
+
+    def copy_records():
+        copy = PreviewTable()
+        heads = copy._heads
+        for record in table:
+            head = heads.setdefault(record.head, record.head)
+            copy_record = PreviewRecord(head, record.original, record.new, record.status,
+                                        dict(record.extra) if record.extra else None)
+            sidecars = record.sidecars
+            copy_record.sidecars = tuple(list(sidecars)) if sidecars else sidecars
+            copy.append(copy_record)
+        return copy
+
+    paths = [record.path for record in table]
+
+    def copy_dicts():
+        # 与旧版 generate_preview 相同：每项一个 dict
+        copy = []
+        for record, path in zip(table, paths):
+            item = {"original": record.original, "new": record.new, "path": path, "status": record.status}
+            if record.sidecars is not None:
+                item["sidecars"] = list(record.sidecars)
+            if record.extra:
+                item.update(record.extra)
+            copy.append(item)
+        return copy
+
+    return {
+        "records": round(_allocated(copy_records) / n, 1),
+        "dicts": round(_allocated(copy_dicts) / n, 1),
+        "entries": n,
+    }
+
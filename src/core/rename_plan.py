@@ -0,0 +1,173 @@
+import os
+
+
+class RenamePlanError(ValueError):
+    """重命名计划无法生成（例如多个文件指向同一个目标）"""
+    pass
+
+
+class RenamePlan:
+    """
+    重命名计划。
+    steps: list of (src, dst, origin)，按顺序执行 os.rename(src, dst)。
+           origin 为该步骤完成的原始源路径；中转到临时文件的步骤 origin 为 None。
+    cycles: 发现的环路列表，每个环路为源路径列表（如 a->b->a 为 [a, b]）
+    temp_hops: 使用临时文件中转的次数（每个环路一次）
+    groups: list of list of step 索引。每组为一条链或一个环路，组内必须按顺序执行，
+            不同组之间没有共享的路径，可以并发执行。
+    backups: 格式转换时把原文件移到备份位置的步骤数（见 apply_conversions）
+    """
+    def __init__(self):
+        self.steps = []
+        self.cycles = []
+        self.temp_hops = 0
+        self.groups = []
+        self.backups = 0
+
+    @property
+    def syscalls(self):
+        """计划需要的 rename 调用次数"""
+        return len(self.steps)
+
+    def summary(self):
+        return {
+            "files": len(self.steps) - self.temp_hops - self.backups,
+            "syscalls": self.syscalls,
+            "cycles": len(self.cycles),
+            "temp_hops": self.temp_hops,
+            "groups": len(self.groups),
+        }
+
+    def group_ids(self):
+        """returns: 每个步骤所属的组编号"""
+        ids = [0] * len(self.steps)
+        for g, indices in enumerate(self.groups):
+            for i in indices:
+                ids[i] = g
+        return ids
+
+
+def _key(path):
+    # 在大小写不敏感的文件系统 (Windows) 上，仅大小写不同的路径视为同一个文件
+    return os.path.normcase(os.path.normpath(path))
+
+
+def plan_renames(pairs):
+    """
+    根据 (src, dst) 列表生成重命名计划。
+    - 目标不是其他源文件的项直接重命名
+    - 链 (a->b, b->c) 通过调整顺序解决：先 b->c 再 a->b，不需要临时文件
+    - 真正的环路 (a->b, b->a) 只对其中一个文件做一次临时中转
+    raises: RenamePlanError 当多个源文件指向同一目标时
+    """
+    plan = RenamePlan()
+    pairs = [(src, dst) for src, dst in pairs if src != dst]
+
+    index = {}
+    for i, (src, _) in enumerate(pairs):
+        index[_key(src)] = i
+
+    # next_of[i]: 目标位置当前被哪个源文件占用；pred[j]: 谁要搬到 j 的位置
+    next_of = [None] * len(pairs)
+    pred = {}
+    seen_targets = {}
+    for i, (src, dst) in enumerate(pairs):
+        dst_key = _key(dst)
+        if dst_key in seen_targets:
+            raise RenamePlanError(f"多个文件指向同一目标: {dst}")
+        seen_targets[dst_key] = i
+
+        j = index.get(dst_key)
+        if j is not None and j != i: # j == i 表示仅大小写变化，直接重命名即可
+            next_of[i] = j
+            pred[j] = i
+
+    done = [False] * len(pairs)
+
+    def emit_chain(end):
+        # 从链尾（目标空闲的项）开始，沿 pred 反向执行
+        start = len(plan.steps)
+        node = end
+        while node is not None and not done[node]:
+            src, dst = pairs[node]
+            plan.steps.append((src, dst, src))
+            done[node] = True
+            node = pred.get(node)
+        plan.groups.append(list(range(start, len(plan.steps))))
+
+    for i in range(len(pairs)):
+        if next_of[i] is None:
+            emit_chain(i)
+
+    # 剩下的节点都在环路中
+    for i in range(len(pairs)):
+        if done[i]:
+            continue
+        cycle = []
+        node = i
+        while True:
+            cycle.append(pairs[node][0])
+            node = next_of[node]
+            if node == i:
+                break
+        plan.cycles.append(cycle)
+
+        # 把 i 移到临时文件，环路变为以 i 原位置为终点的链
+        start = len(plan.steps)
+        src, dst = pairs[i]
+        tmp = _temp_path(src)
+        plan.steps.append((src, tmp, None))
+        plan.temp_hops += 1
+        done[i] = True
+        node = pred.get(i)
+        while node is not None and not done[node]:
+            n_src, n_dst = pairs[node]
+            plan.steps.append((n_src, n_dst, n_src))
+            done[node] = True
+            node = pred.get(node)
+        plan.steps.append((tmp, dst, src))
+        plan.groups.append(list(range(start, len(plan.steps))))
+
+    return plan
+
+
+def apply_conversions(plan, conversions):
+    """
+    把格式转换合并进重命名计划。
+    conversions: dict, 源路径 -> (staged, backup)。staged 为已转换好的临时文件，backup 为原文件的备份位置
+    计划中 src -> dst 的一步展开为同一组内相邻的两步：src -> backup（origin 为 None）、staged -> dst；
+    环路中 src 的临时中转直接改为移到 backup，最后一步改为 staged -> dst。
+    两步都是普通的 rename，因此执行顺序、预写日志、回滚与取消（只在组之间）都照常适用。
+    returns: 新的 RenamePlan
+    """
+    if not conversions:
+        return plan
+    result = RenamePlan()
+    result.cycles = plan.cycles
+    result.temp_hops = plan.temp_hops
+    for indices in plan.groups:
+        start = len(result.steps)
+        for i in indices:
+            src, dst, origin = plan.steps[i]
+            if origin is None and src in conversions:
+                result.steps.append((src, conversions[src][1], None))
+            elif origin is not None and origin in conversions:
+                staged, backup = conversions[origin]
+                if src == origin:
+                    result.steps.append((src, backup, None))
+                    result.backups += 1
+                result.steps.append((staged, dst, origin))
+            else:
+                result.steps.append((src, dst, origin))
+        result.groups.append(list(range(start, len(result.steps))))
+    return result
+
+
+def _temp_path(path):
+    dir_name, base = os.path.split(path)
+    tmp = os.path.join(dir_name, f"__tmp_{base}")
+    n = 1
+    while os.path.exists(tmp):
+        tmp = os.path.join(dir_name, f"__tmp{n}_{base}")
+        n += 1
+    return tmp
@@ -1,140 +1,546 @@
 
 import os
-import re
-from datetime import datetime
-from PIL import Image
+from src.utils.image_meta import read_header_meta, bytes_read
+from src.utils.file_hash import FileHasher, bytes_hashed
+from src.utils.perceptual_hash import perceptual_hashes, group_similar
+from src.core.file_collection import FileCollection
+from src.core.sidecar import SidecarIndex, DEFAULT_SIDECAR_EXTENSIONS
+from src.core.collisions import DirectoryIndex, resolve_collisions
+from src.core.profiling import Profiler
+from src.core.preview_table import PreviewTable
+from src.core.sort_order import SortCache
+from src.core.naming_template import CompiledRules, TemplateError, MetadataUnavailable
+
+
+def decode_metadata(file_path):
+    """
+    解码单个文件的元数据（不经过缓存）。
+    定义为模块级函数，以便进程池可以序列化调用。
+    returns: dict, 读取失败时包含 'error' 键
+    """
+    # 优先只解析文件头；未知格式或解析失败时回退到 PIL
+    meta = read_header_meta(file_path)
+    if meta is not None:
+        return meta
+
+    try:
+        # PIL 导入较慢，只在确实需要回退时才导入（序列/正则模式完全不需要）
+        from PIL import Image
+        with Image.open(file_path) as img:
+            width, height = img.size
+            # Exif.DateTimeOriginal (36867) 或 DateTime (306)，Model (272)
+            # 没有 _getexif 的格式（GIF、BMP）或 EXIF 损坏时 has_exif 为 False，
+            # 日期/型号模式把这些文件标记为无法读取，与旧版一致
+            exif = {}
+            has_exif = hasattr(img, '_getexif')
+            if has_exif:
+                try:
+                    exif = img._getexif() or {}
+                except Exception:
+                    has_exif = False
+            model = exif.get(272)
+            return {
+                'width': width,
+                'height': height,
+                'date': exif.get(36867) or exif.get(306),
+                'model': str(model) if model is not None else None,
+                'exif': has_exif,
+            }
+    except Exception as e:
+        return {'error': str(e)}
+
 
 class RenamerEngine:
     """
     负责计算文件的新名称，不进行实际的重命名操作。
-    支持：序列重命名、正则、大小写转换、元数据提取。
+    支持：序列重命名、正则、大小写转换、元数据提取、内容哈希与重复文件检测、近似重复分组。
     """
-    def __init__(self):
+    def __init__(self, metadata_cache=None, executor='thread', max_workers=8, profiler=None):
         self.rules = {}
+        self._compiled = None
+        # 可选的持久化元数据缓存 (MetadataCache)，为 None 时每次都重新读取图片
+        self.metadata_cache = metadata_cache
+        # 元数据并发读取方式: 'serial'（参考实现） / 'thread' / 'process'
+        self.executor = executor
+        self.max_workers = max_workers
+        # 进度回调 callback(done, total)，在读取元数据时调用
+        self.progress_callback = None
+        # 上一次预览之后下一个未使用的序号
+        self.next_index = None
+        # 分阶段计时（facts / metadata / naming / collisions），见 Profiler
+        self.profiler = profiler or Profiler()
+        # facts 缓存（见 get_facts）
+        self._facts = None
+        self._facts_source = None
+        self._facts_have_meta = False
+        self._sidecar_index = None
+        self._sidecar_extensions = None
+        self._directory_index = None
+        self._sort_cache = None
+        self._facts_have_hash = False
+        self._duplicates = None
+        self._hasher = None
+        self._perceptual = {}   # 算法 -> {path: 感知哈希}
+        self._similar = {}      # (算法, 阈值) -> {path: 组}
 
     def set_rules(self, rules):
         """
-        设置重命名规则。
-        rules: dict, 包含如 'mode', 'prefix', 'suffix', 'start_index', 'regex_pattern' 等。
+        设置重命名规则，并立即编译（模板解析、正则编译只在这里进行一次）。
+        rules: dict, 包含如 'mode', 'prefix', 'suffix', 'start_index', 'regex_pattern', 'template' 等。
+        raises: TemplateError 模板或正则表达式无效
         """
+        self._compiled = CompiledRules(rules)
         self.rules = rules
 
+    def compiled_rules(self):
+        """returns: 当前规则编译后的 CompiledRules（规则对象被整体替换时重新编译）"""
+        if self._compiled is None or self._compiled.rules is not self.rules:
+            self._compiled = CompiledRules(self.rules)
+        return self._compiled
+
     def generate_preview(self, file_list):
         """
         生成预览列表。
-        file_list: list of full file paths
-        returns: list of (original_name, new_name, status)
+        file_list: list of full file paths，或 FileCollection
+        returns: PreviewTable，每项可按 dict 方式读取 original / new / path / status
+
+        分两个阶段：
+        1. facts: 排序、拆分文件名、读取元数据。只在文件集合变化时重建。
+        2. naming: 按当前规则计算新名称。仅修改规则时只重跑这一步，不访问文件系统。
+        编号顺序由 rules['sort'] 指定（见 sort_order），排序键随 facts 缓存。
+        """
+        compiled = self.compiled_rules()
+        # 只有模板或排序方式用到元数据时才读取元数据；只有模板用到 {hash} 时才计算全部文件的哈希
+        facts = self.get_facts(file_list, need_meta=compiled.needs_meta, need_hash=compiled.needs_hash)
+        if compiled.find_duplicates:
+            self.get_duplicates(facts)
+        similar = None
+        if compiled.group_similar:
+            similar = self.get_similar_groups(facts, compiled.similar_algorithm, compiled.similar_threshold)
+        facts = self.get_order(facts, compiled.sort)
+        if similar is not None:
+            self._number_groups(facts, similar)
+        if compiled.sync_sidecar:
+            self.get_sidecar_index(facts)
+        return self.apply_rules(facts)
+
+    def get_order(self, facts, sort):
+        """
+        returns: 按 sort（parse_sort 的结果）排序的 facts。
+        排序键对同一组 facts 只计算一次，切换排序方式时只在内存中重新排序。
+        """
+        cache = self._sort_cache
+        if cache is None or cache.facts is not facts:
+            cache = self._sort_cache = SortCache(facts)
+        with self.profiler.span("sort", files=len(facts)):
+            return cache.order(sort)
+
+    def hasher(self):
+        """returns: 计算内容哈希的 FileHasher，与元数据共用 metadata_cache"""
+        if self._hasher is None:
+            workers = 1 if self.executor == 'serial' else self.max_workers
+            self._hasher = FileHasher(cache=self.metadata_cache, max_workers=workers)
+        return self._hasher
+
+    def get_duplicates(self, facts):
+        """
+        查找内容完全相同的文件，随 facts 一起缓存。
+        大小唯一的文件不计算哈希；facts 已包含哈希时直接使用。
+        returns: dict, 重复文件的 path -> 同组中第一个文件的 path
+        """
+        if self._duplicates is None:
+            hasher = self.hasher()
+            digests = None
+            if self._facts_have_hash:
+                digests = {fact['path']: fact['hash'] for fact in facts}
+            before = hasher.hashed, hasher.cache_hits
+            bytes_before = bytes_hashed()
+            with self.profiler.span("duplicates", files=len(facts)) as span:
+                groups = hasher.find_duplicates([fact['path'] for fact in facts],
+                                                self._report_progress, digests)
+                span.add("hashed", hasher.hashed - before[0])
+                span.add("cache_hits", hasher.cache_hits - before[1])
+                span.add("bytes_read", bytes_hashed() - bytes_before)
+            duplicates = {}
+            for group in groups:
+                for path in group[1:]:
+                    duplicates[path] = group[0]
+            self._duplicates = duplicates
+        return self._duplicates
+
+    def get_perceptual_hashes(self, facts, algorithm):
+        """
+        returns: dict, path -> 64 位感知哈希（无法解码为 None），随 facts 一起缓存。
+        配置了 metadata_cache 时按 (设备, inode, 大小, mtime) 持久化，未变化的图片不再解码。
+        """
+        hashes = self._perceptual.get(algorithm)
+        if hashes is not None:
+            return hashes
+        hashes = {}
+        pending = []
+        stats = {}
+        cache = self.metadata_cache
+        with self.profiler.span("perceptual_hash", files=len(facts)) as span:
+            for fact in facts:
+                path = fact['path']
+                if cache is not None:
+                    try:
+                        st = stats[path] = os.stat(path)
+                    except OSError:
+                        hashes[path] = None
+                        continue
+                    digest = cache.get_hash(st, algorithm)
+                    if digest is not None:
+                        hashes[path] = int(digest, 16)
+                        continue
+                pending.append(path)
+            span.add("cache_hits", len(hashes))
+            span.add("decoded", len(pending))
+            workers = 1 if self.executor == 'serial' else self.max_workers
+            computed = perceptual_hashes(pending, algorithm, workers, progress_callback=self._report_progress)
+            for path, value in computed.items():
+                hashes[path] = value
+                if cache is not None and value is not None:
+                    cache.put_hash(stats[path], format(value, '016x'), algorithm)
+            if cache is not None:
+                cache.flush()
+        self._perceptual[algorithm] = hashes
+        return hashes
+
+    def get_similar_groups(self, facts, algorithm, threshold):
+        """
+        按感知哈希的汉明距离把近似重复的图片分组，随 facts 一起缓存；只修改阈值时不再解码图片。
+        returns: dict, path -> 组的标识（同组相同）
+        """
+        key = (algorithm, threshold)
+        similar = self._similar.get(key)
+        if similar is None:
+            hashes = self.get_perceptual_hashes(facts, algorithm)
+            with self.profiler.span("grouping", files=len(facts)):
+                groups = group_similar([hashes[fact['path']] for fact in facts], threshold)
+            similar = self._similar[key] = {fact['path']: group for fact, group in zip(facts, groups)}
+        return similar
+
+    def _number_groups(self, facts, similar):
+        # 组号按当前编号顺序中首次出现的位置分配，{group} 与 {seq} 的顺序一致
+        numbers = {}
+        for fact in facts:
+            fact['group'] = numbers.setdefault(similar[fact['path']], len(numbers) + 1)
+
+    def get_sidecar_index(self, facts):
+        """
+        返回当前文件集合的附属文件索引，每个目录只列举一次，随 facts 一起缓存。
+        扩展名集合由 rules['sidecar_extensions'] 指定。
+        """
+        extensions = tuple(self.rules.get('sidecar_extensions', DEFAULT_SIDECAR_EXTENSIONS))
+        if self._sidecar_index is None or self._sidecar_extensions != extensions:
+            directories = {os.path.dirname(f['path']) for f in facts}
+            with self.profiler.span("sidecar_index", directories=len(directories)):
+                self._sidecar_index = SidecarIndex(extensions).build(directories)
+            self._sidecar_extensions = extensions
+        return self._sidecar_index
+
+    def get_directory_index(self):
+        """返回当前文件集合所在目录的内容索引（每个目录只列举一次），随 facts 一起缓存"""
+        if self._directory_index is None:
+            self._directory_index = DirectoryIndex()
+        return self._directory_index
+
+    def get_facts(self, file_list, need_meta=False, need_hash=False):
+        """
+        返回文件集合对应的 facts 列表（已排序）。
+        file_list 与上次相同时直接复用；需要元数据或内容哈希而尚未读取时才补读一次。
+        """
+        if isinstance(file_list, FileCollection):
+            file_list = file_list.snapshot()
+        # 对元组 tuple() 不会复制；同一快照对象可直接按身份判断未变化
+        files = tuple(file_list)
+        if self._facts is None or (self._facts_source is not files and self._facts_source != files):
+            with self.profiler.span("facts", files=len(files)):
+                self._facts = self.build_facts(files)
+            self._facts_source = files
+            self._facts_have_meta = False
+            self._sidecar_index = None
+            self._directory_index = None
+            self._sort_cache = None
+            self._facts_have_hash = False
+            self._duplicates = None
+            self._perceptual = {}
+            self._similar = {}
+
+        if need_meta and not self._facts_have_meta:
+            cache = self.metadata_cache
+            before = cache.stats() if cache is not None else None
+            bytes_before = bytes_read()
+            with self.profiler.span("metadata", files=len(self._facts)) as span:
+                metas = self.collect_metadata([f['path'] for f in self._facts])
+                span.add("bytes_read", bytes_read() - bytes_before)
+                if cache is not None:
+                    after = cache.stats()
+                    span.add("cache_hits", after['hits'] - before['hits'])
+                    span.add("cache_misses", after['misses'] - before['misses'])
+            for fact in self._facts:
+                fact['meta'] = metas[fact['path']]
+            self._facts_have_meta = True
+            # 拍摄时间排序键依赖 meta
+            self._sort_cache = None
+            if self.metadata_cache is not None:
+                self.metadata_cache.flush()
+
+        if need_hash and not self._facts_have_hash:
+            hasher = self.hasher()
+            before = hasher.hashed, hasher.cache_hits
+            bytes_before = bytes_hashed()
+            with self.profiler.span("hash", files=len(self._facts)) as span:
+                digests = hasher.hash_files([f['path'] for f in self._facts], self._report_progress)
+                span.add("hashed", hasher.hashed - before[0])
+                span.add("cache_hits", hasher.cache_hits - before[1])
+                span.add("bytes_read", bytes_hashed() - bytes_before)
+            for fact in self._facts:
+                fact['hash'] = digests[fact['path']]
+            self._facts_have_hash = True
+            if self.metadata_cache is not None:
+                self.metadata_cache.flush()
+
+        return self._facts
+
+    def invalidate_facts(self):
+        """丢弃已缓存的 facts（例如磁盘上的文件已被修改或重命名）"""
+        self._facts = None
+        self._facts_source = None
+        self._facts_have_meta = False
+        self._sidecar_index = None
+        self._directory_index = None
+        self._sort_cache = None
+        self._facts_have_hash = False
+        self._duplicates = None
+        self._perceptual = {}
+        self._similar = {}
+
+    def build_facts(self, file_list):
+        """
+        构建每个文件的静态信息，与重命名规则无关。
+        returns: list of dict, 包含 path / original / folder / ext / meta（计算哈希后另有 hash）
+        """
+        facts = []
+        for file_path in sorted(file_list): # 默认排序
+            original_name = os.path.basename(file_path)
+            directory = os.path.dirname(file_path)
+            _, ext = os.path.splitext(original_name)
+            facts.append({
+                "path": file_path,
+                "original": original_name,
+                "folder": os.path.basename(directory),
+                "ext": ext.lower(), # 默认统一小写扩展名，或者根据规则
+                "meta": None,
+            })
+        return facts
+
+    def apply_rules(self, facts):
         """
-        preview_data = []
-        files = sorted(file_list) # 默认排序
-        
+        命名阶段：根据编译后的规则为 facts 计算新名称。
+        模板引用元数据字段时要求 facts 已包含 meta（见 get_facts）。
+        重名检查所需的目录列表随 facts 缓存，仅修改规则时不会再次访问文件系统。
+        """
+        with self.profiler.span("naming", files=len(facts)):
+            preview_data = self._name_facts(facts)
+
+        # 重名检查：批次内重名或与目录中已有的文件重名。同时生成附属文件的新名称
+        # （同一个附属文件只跟随第一个匹配的图片，如 a.jpg 与 a.png 共用 a.txt）
+        compiled = self.compiled_rules()
+        if compiled.group_similar:
+            # 在预览中标出有多张图片的组（'similar' 为组号）
+            sizes = {}
+            for fact in facts:
+                group = fact.get('group')
+                sizes[group] = sizes.get(group, 0) + 1
+            for fact, item in zip(facts, preview_data):
+                group = fact.get('group')
+                if group is not None and sizes[group] > 1:
+                    item['similar'] = group
+
+        if compiled.find_duplicates and self._duplicates:
+            # 内容重复的文件不参与重命名（只保留每组第一个）
+            duplicates = self._duplicates
+            for item in preview_data:
+                first = duplicates.get(item['path'])
+                if first is not None:
+                    item['status'] = "重复"
+                    item['duplicate'] = os.path.basename(first)
+
+        sidecar_index = self._sidecar_index if compiled.sync_sidecar else None
+        with self.profiler.span("collisions", files=len(preview_data)):
+            if sidecar_index is not None:
+                for item in preview_data:
+                    item["sidecars"] = []
+            resolve_collisions(preview_data, self.get_directory_index(), sidecar_index,
+                               auto_resolve=compiled.auto_resolve)
+        return preview_data
+
+    def _name_facts(self, facts):
+        preview_data = PreviewTable()
+        add = preview_data.add
+        compiled = self.compiled_rules()
+        template = compiled.template
+        regex_mode = compiled.mode == 'regex'
+        post_steps = compiled.post_steps
+        convert_to, convert_ext, convert_sources = compiled.convert_to, compiled.convert_ext, compiled.convert_sources
+
         # 序列计数器初始化
-        counter = int(self.rules.get('start_index', 1))
-        padding = int(self.rules.get('padding', 0))
+        counter = compiled.start_index
 
-        for idx, file_path in enumerate(files):
+        for fact in facts:
+            file_path = fact['path']
             try:
-                original_name = os.path.basename(file_path)
-                directory = os.path.dirname(file_path)
-                name_part, ext = os.path.splitext(original_name)
-                ext = ext.lower() # 默认统一小写扩展名，或者根据规则
-
-                new_name = original_name # 默认不变
-
-                mode = self.rules.get('mode', 'sequence')
-
-                if mode == 'sequence':
-                    prefix = self.rules.get('prefix', '')
-                    if not prefix: # 如果没有前缀，尝试使用文件夹名
-                         prefix = os.path.basename(directory)
-                    
-                    suffix = self.rules.get('suffix', '')
-                    
-                    # 格式化数字
-                    num_str = str(counter).zfill(padding)
-                    new_name = f"{prefix}{suffix}_{num_str}{ext}"
-                    counter += 1
-
-                elif mode == 'regex':
-                    pattern = self.rules.get('regex_pattern', '')
-                    repl = self.rules.get('regex_replacement', '')
-                    if pattern:
-                        try:
-                            # 仅对文件名部分进行正则替换，保留扩展名? 或者整个文件名
-                            # 这里假设是对整个文件名进行替换
-                            new_name = re.sub(pattern, repl, original_name)
-                        except re.error:
-                            new_name = "[正则错误]"
-
-                elif mode.startswith('metadata_'):
+                original_name = fact['original']
+                ext = fact['ext']
+                # 格式转换：需要转换的文件在新名称中直接使用目标扩展名
+                convert = ext in convert_sources
+                if convert:
+                    ext = convert_ext
+
+                if template is not None:
                     try:
-                        prefix = self.rules.get('prefix', '')
-                        suffix = self.rules.get('suffix', '')
-
-                        with Image.open(file_path) as img:
-                            num_str = str(counter).zfill(padding)
-                            
-                            meta_part = ""
-                            if mode == 'metadata_resolution':
-                                width, height = img.size
-                                meta_part = f"{width}x{height}"
-                            
-                            elif mode == 'metadata_date':
-                                # 尝试获取拍摄日期 Exif.DateTimeOriginal (36867) 或 DateTime (306)
-                                exif = img._getexif() or {}
-                                date_str = exif.get(36867) or exif.get(306)
-                                if date_str:
-                                    dt = datetime.strptime(date_str, '%Y:%m:%d %H:%M:%S')
-                                    meta_part = dt.strftime('%Y%m%d_%H%M%S')
-                                else:
-                                    mtime = os.path.getmtime(file_path)
-                                    dt = datetime.fromtimestamp(mtime)
-                                    meta_part = dt.strftime('%Y%m%d_%H%M%S')
-
-                            elif mode == 'metadata_model':
-                                exif = img._getexif() or {}
-                                model = exif.get(272, "UnknownCamera")
-                                meta_part = re.sub(r'[^\w\-]', '', model.replace(' ', '_'))
-                            
-                            # 拼接: Prefix + Meta + Suffix + _Sequence.ext
-                            # 如果用户不想要中间的下划线，必须自己控制后缀或者前缀
-                            # 这里默认连接符处理：
-                            # 如果有后缀，sequence 前面的下划线通常是需要的，除非 suffix 结尾已有
-                            new_name = f"{prefix}{meta_part}{suffix}_{num_str}{ext}"
-
-                            counter += 1
-                    except Exception:
+                        new_name = template.render(fact, counter, ext)
+                        counter += 1
+                    except MetadataUnavailable:
                         new_name = f"[无法读取图片]{ext}"
-                
-                # 公共后处理：大小写转换
-                case_mode = self.rules.get('case', 'none')
-                if case_mode == 'lower':
-                    new_name = new_name.lower()
-                elif case_mode == 'upper':
-                    new_name = new_name.upper()
+                elif regex_mode:
+                    # 对整个文件名进行替换
+                    new_name = compiled.regex_name(original_name)
+                else:
+                    new_name = original_name # 默认不变
+
+                if convert and not new_name.lower().endswith(convert_ext):
+                    # 正则模式等未使用 ext 的情况，替换扩展名
+                    new_name = os.path.splitext(new_name)[0] + convert_ext
 
-                # 公共后处理：Web 安全 (空格转下划线)
-                if self.rules.get('web_safe', False):
-                    new_name = new_name.replace(" ", "_")
+                # 公共后处理：大小写转换、Web 安全
+                for step in post_steps:
+                    new_name = step(new_name)
 
                 status = "OK"
                 if new_name == original_name:
                     status = "无变化"
                 
-                preview_data.append({
-                    "original": original_name,
-                    "new": new_name,
-                    "path": file_path,
-                    "status": status
-                })
+                if convert:
+                    add(file_path, original_name, new_name, status, convert=convert_to)
+                else:
+                    add(file_path, original_name, new_name, status)
 
+            except TemplateError:
+                raise
             except Exception as e:
-                preview_data.append({
-                    "original": os.path.basename(file_path),
-                    "new": "Error",
-                    "path": file_path,
-                    "status": str(e)
-                })
-        
+                add(file_path, fact['original'], "Error", str(e))
+
+        # 下一个未使用的序号（监视模式中下一批从这里继续）
+        self.next_index = counter
         return preview_data
 
+    def collect_metadata(self, files):
+        """
+        读取一组文件的元数据。根据 self.executor 选择串行、线程池或进程池。
+        结果与串行读取完全一致，仅执行顺序不同。
+        每完成一个文件调用一次 self.progress_callback(done, total)；
+        回调抛出的异常会中止读取（用于取消），未开始的任务随之取消。
+        returns: dict, path -> meta
+        """
+        files = list(files)
+        total = len(files)
+        metas = {}
+        if self.executor == 'serial' or self.max_workers <= 1 or total < 2:
+            for done, p in enumerate(files, 1):
+                metas[p] = self._safe_read_metadata(p)
+                self._report_progress(done, total)
+            return metas
+
+        if self.executor == 'process':
+            return self._collect_metadata_process(files)
+
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            results = pool.map(self._safe_read_metadata, files)
+            for done, (p, meta) in enumerate(zip(files, results), 1):
+                metas[p] = meta
+                self._report_progress(done, total)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return metas
+
+    def _collect_metadata_process(self, files):
+        # 缓存查询和写入留在主进程，子进程只负责解码未命中的文件
+        total = len(files)
+        metas = {}
+        pending = []
+        cache = self.metadata_cache
+        for p in files:
+            try:
+                st = os.stat(p)
+            except OSError as e:
+                metas[p] = {'error': str(e)}
+                continue
+            meta = _cached_metadata(cache, p, st)
+            if meta is not None:
+                metas[p] = meta
+            else:
+                pending.append((p, st))
+        self._report_progress(len(metas), total)
+
+        if pending:
+            paths = [p for p, _ in pending]
+            chunksize = max(1, len(paths) // (self.max_workers * 4))
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            try:
+                decoded = pool.map(decode_metadata, paths, chunksize=chunksize)
+                for (p, st), meta in zip(pending, decoded):
+                    meta['mtime'] = st.st_mtime
+                    if cache is not None:
+                        cache.put(p, meta, st)
+                    metas[p] = meta
+                    self._report_progress(len(metas), total)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+        return metas
+
+    def _report_progress(self, done, total):
+        if self.progress_callback is not None:
+            self.progress_callback(done, total)
+
+    def _safe_read_metadata(self, file_path):
+        try:
+            return self.read_metadata(file_path)
+        except Exception as e:
+            return {'error': str(e)}
+
+    def read_metadata(self, file_path):
+        """
+        读取单个文件的元数据（宽高、拍摄时间、相机型号、mtime）。
+        若配置了 metadata_cache 且文件未变化，则直接返回缓存，不解码图片。
+        returns: dict, 读取失败时包含 'error' 键
+        """
+        st = os.stat(file_path)
+        cache = self.metadata_cache
+        meta = _cached_metadata(cache, file_path, st)
+        if meta is not None:
+            return meta
+
+        meta = decode_metadata(file_path)
+        meta['mtime'] = st.st_mtime
+        if cache is not None:
+            cache.put(file_path, meta, st)
+        return meta
+
+
+def _cached_metadata(cache, file_path, st):
+    """
+    returns: 缓存中可用的元数据，未命中时返回 None。
+    旧版本写入的记录没有 exif 键，视为未命中并重新读取
+    """
+    if cache is None:
+        return None
+    meta = cache.get(file_path, st)
+    if meta is not None and ('exif' in meta or 'error' in meta):
+        return meta
+    return None
@@ -0,0 +1,78 @@
+import os
+
+# 默认识别的图片扩展名（小写）
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif'})
+
+
+def scan_paths(paths, extensions=IMAGE_EXTENSIONS, recursive=False, max_depth=None,
+               follow_symlinks=False, chunk_size=500):
+    """
+    基于 os.scandir 的流式扫描器，按块产出匹配的文件路径。
+    paths: 文件夹或文件路径的列表。直接给出的文件不做扩展名过滤（与拖入单个文件的行为一致）。
+    extensions: 需要的扩展名集合（小写，带点）；为 None 时不过滤
+    recursive: 是否进入子文件夹
+    max_depth: 递归的最大深度，0 表示只扫描给定文件夹本身；None 为不限制
+    follow_symlinks: 是否跟随符号链接（文件与文件夹）。跟随时会检测目录环路。
+    chunk_size: 每次产出的路径数量，便于界面先显示前面的结果
+    yields: list of normalized full paths
+    """
+    chunk = []
+    visited = set() # (st_dev, st_ino)，防止符号链接导致的循环
+    stack = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            stack.append((os.path.normpath(path), 0))
+        elif os.path.isfile(path):
+            chunk.append(os.path.normpath(path))
+
+    # 保持给定顺序：栈为后进先出
+    stack.reverse()
+    while stack:
+        folder, depth = stack.pop()
+        if follow_symlinks:
+            try:
+                st = os.stat(folder)
+            except OSError:
+                continue
+            key = (st.st_dev, st.st_ino)
+            if key in visited:
+                continue
+            visited.add(key)
+
+        subdirs = []
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        # DirEntry 缓存了文件类型，多数平台上无需额外的 stat 调用
+                        if entry.is_file(follow_symlinks=follow_symlinks):
+                            if extensions is not None and _ext_of(entry.name) not in extensions:
+                                continue
+                            chunk.append(entry.path)
+                            if len(chunk) >= chunk_size:
+                                yield chunk
+                                chunk = []
+                        elif recursive and entry.is_dir(follow_symlinks=follow_symlinks):
+                            subdirs.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            # 无权限或已被删除的目录直接跳过
+            continue
+
+        if max_depth is None or depth < max_depth:
+            for sub in reversed(subdirs):
+                stack.append((sub, depth + 1))
+
+    if chunk:
+        yield chunk
+
+
+def _ext_of(name):
+    # 等价于 os.path.splitext(name)[1].lower()，但不创建中间元组；
+    # 与 splitext 一样，以点开头的文件名（如 .jpg）视为没有扩展名
+    dot = name.rfind('.')
+    if dot <= 0 or not name[:dot].strip('.'):
+        return ''
+    return name[dot:].lower()
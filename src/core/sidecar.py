@@ -0,0 +1,66 @@
+import os
+
+# 默认随图片一起重命名的附属文件 (sidecar) 扩展名
+DEFAULT_SIDECAR_EXTENSIONS = ('.txt', '.json', '.xml', '.xmp', '.aae', '.dop', '.pp3')
+
+
+class SidecarIndex:
+    """
+    附属文件索引：每个目录只列举一次，建立 主文件名 -> 附属文件 的映射。
+    同时支持两种命名习惯，匹配不区分大小写：
+    - IMG_0001.xmp      （去掉图片扩展名后的主名 + 附属扩展名）
+    - IMG_0001.jpg.xmp  （完整图片文件名 + 附属扩展名，如 darktable / DxO / RawTherapee）
+    """
+    def __init__(self, extensions=DEFAULT_SIDECAR_EXTENSIONS):
+        self.extensions = frozenset(e.lower() for e in extensions)
+        self._index = {} # (directory, base.casefold()) -> [sidecar names]
+        self._listed = set()
+
+    def build(self, directories):
+        """为一组目录建立索引（已列举过的目录会跳过）"""
+        for directory in directories:
+            self.add_directory(directory)
+        return self
+
+    def add_directory(self, directory):
+        if directory in self._listed:
+            return
+        self._listed.add(directory)
+        try:
+            with os.scandir(directory or ".") as it:
+                for entry in it:
+                    base, ext = os.path.splitext(entry.name)
+                    if ext.lower() not in self.extensions or not base:
+                        continue
+                    if not entry.is_file():
+                        continue
+                    self._index.setdefault((directory, base.casefold()), []).append(entry.name)
+        except OSError:
+            pass
+
+    def lookup(self, image_path):
+        """
+        returns: list of (sidecar_name, suffix, by_full_name)
+        suffix 为附属文件名中主名之后的部分（如 '.xmp'），
+        by_full_name 表示是否按完整图片文件名匹配。
+        """
+        directory, name = os.path.split(image_path)
+        self.add_directory(directory)
+        stem = os.path.splitext(name)[0]
+        found = []
+        for base, by_full_name in ((stem, False), (name, True)):
+            for side in self._index.get((directory, base.casefold()), ()):
+                # 索引键为附属文件自身主名的 casefold，后缀即其扩展名。
+                # 不能按 len(base) 截取：casefold 可能改变长度（如 ß -> ss）
+                found.append((side, os.path.splitext(side)[1], by_full_name))
+        return found
+
+    def rename_map(self, image_path, new_name):
+        """
+        returns: list of (old_sidecar_name, new_sidecar_name)，均为文件名（不含目录）
+        """
+        new_stem = os.path.splitext(new_name)[0]
+        result = []
+        for side, suffix, by_full_name in self.lookup(image_path):
+            result.append((side, (new_name if by_full_name else new_stem) + suffix))
+        return result
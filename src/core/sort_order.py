@@ -0,0 +1,126 @@
+import os
+import re
+import time
+
+# 可用的排序键：
+#   path     完整路径（默认，与旧版相同）
+#   natural  自然排序，文件名中的数字按数值比较（img2 排在 img10 之前），不区分大小写
+#   date     拍摄时间（EXIF），没有时使用修改时间
+#   mtime    修改时间
+#   size     文件大小
+SORT_KEYS = ('path', 'natural', 'date', 'mtime', 'size')
+DEFAULT_SORT = 'path'
+
+# 需要元数据的排序键
+META_SORT_KEYS = frozenset({'date'})
+
+_DIGITS_RE = re.compile(r'(\d+)')
+_EXIF_DATE_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+
+def parse_sort(spec):
+    """
+    解析排序方式，如 "date,natural" 或 ["-size", "natural"]，键前加 - 表示倒序。
+    前面的键优先，相同时按后面的键，全部相同时保持路径顺序。
+    returns: tuple of (key, reverse)
+    raises: ValueError 未知的排序键
+    """
+    if isinstance(spec, str):
+        spec = spec.split(',')
+    parsed = []
+    for part in spec:
+        part = part.strip()
+        if not part:
+            continue
+        reverse = part.startswith('-')
+        key = part.lstrip('-')
+        if key not in SORT_KEYS:
+            raise ValueError(f"未知的排序方式: {key}（可用: {', '.join(SORT_KEYS)}）")
+        parsed.append((key, reverse))
+    return tuple(parsed) or ((DEFAULT_SORT, False),)
+
+
+def natural_key(text):
+    """文件名中的数字按数值比较，其余部分不区分大小写"""
+    parts = _DIGITS_RE.split(text.casefold())
+    parts[1::2] = map(int, parts[1::2])
+    return parts
+
+
+class SortCache:
+    """
+    一组 facts（已按路径排序）的排序键与排序结果缓存。
+    每种排序键对每个文件只计算一次（mtime 与 size 共用一次 stat），
+    排序结果按排序方式缓存；切换排序方式或修改其他规则时只在内存中排序，不访问文件系统。
+    date 键使用 facts 中的 meta，调用前应已读取元数据。
+    """
+    def __init__(self, facts):
+        self.facts = facts
+        self._values = {}
+        self._orders = {}
+        self._stats = None
+
+    def order(self, spec):
+        """returns: 按 spec（parse_sort 的结果）排好序的 facts 列表"""
+        order = self._orders.get(spec)
+        if order is None:
+            if spec == ((DEFAULT_SORT, False),):
+                order = self.facts
+            else:
+                indices = list(range(len(self.facts)))
+                # 从次要的键到主要的键依次做稳定排序
+                for key, reverse in reversed(spec):
+                    indices.sort(key=self.values(key).__getitem__, reverse=reverse)
+                facts = self.facts
+                order = [facts[i] for i in indices]
+            self._orders[spec] = order
+        return order
+
+    def values(self, key):
+        """returns: 与 facts 一一对应的排序键列表"""
+        values = self._values.get(key)
+        if values is None:
+            values = self._values[key] = getattr(self, f'_{key}_values')()
+        return values
+
+    def _path_values(self):
+        return [fact['path'] for fact in self.facts]
+
+    def _natural_values(self):
+        return [natural_key(fact['path']) for fact in self.facts]
+
+    def _mtime_values(self):
+        return [mtime for mtime, _ in self._stat_all()]
+
+    def _size_values(self):
+        return [size for _, size in self._stat_all()]
+
+    def _date_values(self):
+        # EXIF 时间字符串 (YYYY:MM:DD HH:MM:SS) 按字典序比较即为时间顺序，
+        # 没有拍摄时间的文件把修改时间格式化为同样的字符串，避免逐个解析日期
+        values = []
+        stats = None
+        for i, fact in enumerate(self.facts):
+            meta = fact['meta'] or {}
+            date = meta.get('date')
+            if not (isinstance(date, str) and len(date) == 19):
+                mtime = meta.get('mtime')
+                if mtime is None:
+                    if stats is None:
+                        stats = self._stat_all()
+                    mtime = stats[i][0]
+                date = time.strftime(_EXIF_DATE_FORMAT, time.localtime(mtime))
+            values.append(date)
+        return values
+
+    def _stat_all(self):
+        if self._stats is None:
+            stats = []
+            for fact in self.facts:
+                try:
+                    st = os.stat(fact['path'])
+                    stats.append((st.st_mtime, st.st_size))
+                except OSError:
+                    stats.append((0.0, 0))
+            self._stats = stats
+        return self._stats
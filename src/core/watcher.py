@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import hashlib
+
+from src.core.scanner import IMAGE_EXTENSIONS, _ext_of
+
+# 目录 mtime 距列举时间小于该值（秒）时不信任：同一时间片内之后新增的文件不会改变 mtime
+RACY_SECONDS = 2.0
+
+STATE_VERSION = 1
+
+
+class FolderWatcher:
+    """
+    监视文件夹中新到达的图片，并在 state_path 中持久化每个目录的扫描状态。
+
+    每次 poll() 只 stat 已知的目录：mtime 未变化的目录直接使用上次的文件列表，不再列举；
+    变化的目录重新列举，与上次的列表比较得到新文件。新文件在大小与修改时间稳定
+    （距今至少 settle 秒，且与上次 poll 时相同）后才返回，避免重命名仍在写入的文件。
+    Linux 上可用 inotify 时，wait() 在有文件到达时立即返回，否则按间隔轮询。
+
+    folders: 要监视的文件夹列表
+    state_path: 状态文件（JSON）；为 None 时使用 default_state_path(folders, recursive)
+    include_existing: 首次运行（没有状态文件）时，已有的文件是否也视为新文件
+    """
+    def __init__(self, folders, state_path=None, recursive=False, extensions=IMAGE_EXTENSIONS,
+                 settle=2.0, include_existing=False, start_index=1):
+        self.folders = [os.path.normpath(f) for f in folders]
+        self.recursive = recursive
+        self.extensions = extensions
+        self.settle = settle
+        self.state_path = state_path or self.default_state_path(self.folders, recursive)
+        # 统计计数器（本对象）
+        self.listed = 0    # 重新列举的目录数
+        self.skipped = 0   # mtime 未变化、跳过列举的目录数
+
+        state = self._load()
+        if state is None:
+            state = {"version": STATE_VERSION, "next_index": start_index, "dirs": {}, "pending": {}}
+            self._baseline = not include_existing
+        else:
+            self._baseline = False
+        self.state = state
+        self._inotify = None
+        self._inotify_tried = False
+
+    @staticmethod
+    def default_state_path(folders, recursive=False):
+        """默认状态文件: ~/.batch_image_renamer/watch/<文件夹集合的哈希>.json"""
+        key = json.dumps([sorted(os.path.abspath(f) for f in folders), bool(recursive)])
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + ".json"
+        return os.path.join(os.path.expanduser("~"), ".batch_image_renamer", "watch", name)
+
+    @property
+    def next_index(self):
+        """下一批使用的起始序号（跨运行持久化）"""
+        return self.state["next_index"]
+
+    @next_index.setter
+    def next_index(self, value):
+        self.state["next_index"] = value
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if state.get("version") != STATE_VERSION:
+            return None
+        return state
+
+    def save(self):
+        """原子地写回状态文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(self.state, fh, ensure_ascii=False)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.state_path)
+
+    def poll(self):
+        """
+        检查一次新文件。
+        returns: 已稳定、尚未处理的新文件路径列表（已排序）
+        """
+        dirs = self.state["dirs"]
+        pending = self.state["pending"]
+        now = time.time()
+        seen = set()
+        stack = list(reversed(self.folders))
+        while stack:
+            directory = stack.pop()
+            if directory in seen:
+                continue
+            seen.add(directory)
+            try:
+                st = os.stat(directory)
+            except OSError:
+                continue
+            entry = dirs.get(directory)
+            if entry is not None and entry["mtime_ns"] == st.st_mtime_ns:
+                self.skipped += 1
+            else:
+                entry = self._list(directory, st, entry, pending, now)
+                if entry is None:
+                    continue
+                dirs[directory] = entry
+            if self.recursive:
+                for name in reversed(entry["subdirs"]):
+                    stack.append(os.path.join(directory, name))
+        # 已删除的目录
+        for directory in [d for d in dirs if d not in seen]:
+            del dirs[directory]
+        self._baseline = False
+        self._watch_directories(seen)
+        return self._settled(pending, now)
+
+    def _list(self, directory, st, entry, pending, now):
+        files, subdirs = [], []
+        try:
+            with os.scandir(directory) as it:
+                for item in it:
+                    try:
+                        if item.is_file():
+                            if self.extensions is None or _ext_of(item.name) in self.extensions:
+                                files.append(item.name)
+                        elif self.recursive and item.is_dir():
+                            subdirs.append(item.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        self.listed += 1
+        known = set(entry["files"]) if entry is not None else set()
+        if not self._baseline:
+            # 新出现的目录（例如监视期间新建的子文件夹）中的文件全部视为新文件
+            for name in files:
+                if name not in known:
+                    pending.setdefault(os.path.join(directory, name), None)
+        # mtime 过于接近当前时间时不记录，下一次 poll 重新列举
+        mtime_ns = st.st_mtime_ns if now - st.st_mtime >= RACY_SECONDS else None
+        return {"mtime_ns": mtime_ns, "files": sorted(files), "subdirs": sorted(subdirs)}
+
+    def _settled(self, pending, now):
+        ready = []
+        for path in list(pending):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del pending[path] # 已被移走或删除
+                continue
+            signature = [st.st_size, st.st_mtime_ns]
+            if pending[path] == signature and now - st.st_mtime >= self.settle:
+                ready.append(path)
+            else:
+                pending[path] = signature
+        return sorted(ready)
+
+    def mark_processed(self, paths, renames=()):
+        """
+        记录一批文件已处理（无论是否重命名成功，都不会再次返回）。
+        renames: list of (old_path, new_path)，把目录列表中的旧名称替换为新名称，
+                 已重命名的文件不会被当作新文件；目录 mtime 因重命名而变化，下一次 poll 重新列举该目录。
+        """
+        pending = self.state["pending"]
+        for path in paths:
+            pending.pop(path, None)
+        dirs = self.state["dirs"]
+        changed = {}
+        for old, new in renames:
+            for path, add in ((old, False), (new, True)):
+                directory, name = os.path.split(path)
+                entry = dirs.get(directory)
+                if entry is None:
+                    continue
+                names = changed.setdefault(directory, set(entry["files"]))
+                if add:
+                    if self.extensions is None or _ext_of(name) in self.extensions:
+                        names.add(name)
+                else:
+                    names.discard(name)
+        for directory, names in changed.items():
+            dirs[directory]["files"] = sorted(names)
+            dirs[directory]["mtime_ns"] = None
+
+    def wait(self, timeout, stop_event=None):
+        """
+        等待下一次 poll：inotify 可用时有文件到达即返回，否则等待 timeout 秒。
+        stop_event 被设置时立即返回。
+        """
+        if self._inotify is not None:
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (stop_event is not None and stop_event.is_set()):
+                    return
+                if self._inotify.wait(min(remaining, 0.5)):
+                    return
+        elif stop_event is not None:
+            stop_event.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _watch_directories(self, directories):
+        if not self._inotify_tried:
+            self._inotify_tried = True
+            self._inotify = _Inotify.create()
+        if self._inotify is not None:
+            for directory in directories:
+                if not self._inotify.add(directory):
+                    # 超出系统的监视数量限制等，退回轮询
+                    self._inotify.close()
+                    self._inotify = None
+                    return
+
+
+class _Inotify:
+    """通过 ctypes 调用 Linux inotify，只用于尽早唤醒轮询；不可用时 create() 返回 None"""
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, libc, fd):
+        self._libc = libc
+        self._fd = fd
+        self._watched = set()
+
+    @classmethod
+    def create(cls):
+        if not hasattr(os, 'O_NONBLOCK'):
+            return None
+        try:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def add(self, directory):
+        if directory in self._watched:
+            return True
+        if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK) < 0:
+            return False
+        self._watched.add(directory)
+        return True
+
+    def wait(self, timeout):
+        """returns: 是否收到了事件（收到的事件全部读出丢弃）"""
+        import select
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self._fd)
+
+
+def run_watch(watcher, engine, processor, rules, stop_event, interval=2.0, on_batch=None):
+    """
+    监视循环：每批新文件按 rules 重命名，序号从上一批结束处继续，状态在每批之后写回。
+    运行到 stop_event 被设置为止。
+    on_batch(result): 每批之后调用，result 为 dict:
+        files / renamed / error / next_index / skipped_dirs / listed_dirs
+    """
+    sync_sidecar = rules.get('sync_sidecar', False)
+    try:
+        while not stop_event.is_set():
+            batch = watcher.poll()
+            if batch:
+                result = rename_batch(watcher, engine, processor, rules, batch, sync_sidecar)
+                if on_batch is not None:
+                    on_batch(result)
+            watcher.save()
+            watcher.wait(interval, stop_event)
+    finally:
+        watcher.save()
+        watcher.close()
+
+
+def rename_batch(watcher, engine, processor, rules, batch, sync_sidecar=False):
+    """重命名一批新文件并更新监视状态。returns: 见 run_watch"""
+    engine.set_rules(dict(rules, start_index=watcher.next_index))
+    before = len(processor.history_stack)
+    try:
+        preview = engine.generate_preview(batch)
+        count, error = processor.execute_rename(preview, sync_sidecar=sync_sidecar)
+        if engine.next_index is not None:
+            watcher.next_index = engine.next_index
+    except Exception as e:
+        count, error = 0, str(e)
+    finally:
+        # 中途被打断（Ctrl+C）时也记录已完成的重命名，下次运行不会把它们当作新文件
+        renames = []
+        if len(processor.history_stack) > before:
+            renames = [(op["from"], op["to"]) for op in processor.history_stack[-1]]
+        watcher.mark_processed(batch, renames)
+    return {
+        "files": len(batch),
+        "renamed": count,
+        "error": error,
+        "next_index": watcher.next_index,
+        "skipped_dirs": watcher.skipped,
+        "listed_dirs": watcher.listed,
+    }
@@ -1,5 +1,8 @@
 
 import os
+import time
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 try:
@@ -9,26 +12,87 @@ except ImportError:
     DRAG_DROP_AVAILABLE = False
     
 from src.core.renamer import RenamerEngine
+from src.core.metadata_cache import MetadataCache
 from src.core.file_ops import FileProcessor
+from src.core.journal import RenameJournal
+from src.core.file_collection import FileCollection
+from src.core.scanner import scan_paths
+from src.core.profiling import Profiler
+from src.utils.thumbnails import LRUCache, ThumbnailStore, THUMB_SIZE, thumbnail_cost
+from src.gui.preview_worker import PreviewWorker
+from src.gui.rename_worker import RenameWorker
+from src.gui.watch_worker import WatchWorker
+from src.gui.thumbnail_worker import ThumbnailWorker
+from src.gui.virtual_list import VirtualTreeview
+
+# 编号顺序选项：显示名称 -> rules['sort']
+SORT_OPTIONS = (
+    ("路径", "path"),
+    ("文件名（自然排序）", "natural"),
+    ("拍摄时间", "date,natural"),
+    ("修改时间", "mtime,natural"),
+    ("文件大小（从小到大）", "size,natural"),
+    ("文件大小（从大到小）", "-size,natural"),
+)
+
 
 class MainApp:
-    def __init__(self, root):
+    # 预览防抖延迟与结果轮询间隔 (ms)
+    PREVIEW_DEBOUNCE_MS = 150
+    PREVIEW_POLL_MS = 50
+    # 缩略图内存预算 (MB)，可在构造时通过 thumbnail_budget_mb 修改
+    THUMBNAIL_BUDGET_MB = 32
+    # 每次轮询最多转换的缩略图数，避免一次占用界面线程太久
+    THUMBNAIL_BATCH = 32
+    ROW_HEIGHT = THUMB_SIZE[1] + 4
+
+    def __init__(self, root, thumbnail_budget_mb=None):
         self.root = root
         self.root.title("全能批量图片重命名工具 v1.0")
         self.root.geometry("800x600")
         
         # Core Components
-        self.renamer = RenamerEngine()
-        self.processor = FileProcessor()
+        try:
+            metadata_cache = MetadataCache(MetadataCache.default_path())
+        except Exception as e:
+            print(f"Metadata cache disabled: {e}")
+            metadata_cache = None
+        # 各阶段的耗时与计数，显示在状态栏，可导出为 JSON 跟踪
+        self.profiler = Profiler()
+        self.metadata_cache = metadata_cache
+        self.renamer = RenamerEngine(metadata_cache=metadata_cache, profiler=self.profiler)
+        self.processor = FileProcessor(journal_dir=RenameJournal.default_dir(), max_workers=4,
+                                       profiler=self.profiler)
+        # 预览在后台线程中生成，引擎此后只由该线程使用
+        self.preview_worker = PreviewWorker(self.renamer)
+        self.rename_worker = None # 执行中的重命名
+        # 缩略图：后台线程解码（带磁盘缓存），界面线程中按内存预算保留最近显示过的
+        budget_mb = self.THUMBNAIL_BUDGET_MB if thumbnail_budget_mb is None else thumbnail_budget_mb
+        self.thumbnails = LRUCache(int(budget_mb * 1024 * 1024))
+        self.thumbnail_worker = ThumbnailWorker(ThumbnailStore(ThumbnailStore.default_dir()))
+        self._thumbnails_requested = None
+        self.watch_worker = None  # 监视中的文件夹
         
         # State
-        self.current_files = [] # List of full paths
+        self.current_files = FileCollection() # 有序、O(1) 查重的路径集合
+        self.preview_data = []
+        self._preview_after_id = None
+        self._preview_generation_shown = 0
+        self._preview_progress_shown = False
+        self._scan_queue = queue.Queue()
+        self._scan_epoch = 0
+        self._scans_running = 0
+        self._scan_added = 0
         
         # UI Setup
         self._setup_icon()
         self._setup_style()
         self._create_layout()
         self._bind_events()
+        self._poll_preview_results()
+        self._poll_scan_results()
+        self._poll_thumbnails()
+        self.root.after(200, self._check_incomplete_batches)
 
     def _setup_icon(self):
         """生成并设置程序图标"""
@@ -127,7 +191,7 @@ class MainApp:
             fieldbackground=COLOR_BG_WHITE, 
             foreground=COLOR_TEXT,
             font=("Microsoft YaHei UI", 10), 
-            rowheight=30
+            rowheight=self.ROW_HEIGHT
         )
         style.configure("Treeview.Heading", font=bold_font, background="#e1f5fe", foreground="#0277bd") # 浅蓝表头
         style.map("Treeview", background=[("selected", COLOR_PRIMARY)], foreground=[("selected", COLOR_BG_WHITE)])
@@ -148,6 +212,12 @@ class MainApp:
         
         ttk.Button(toolbar, text="添加文件夹", command=self.load_folder).pack(side=tk.LEFT, padx=5)
         ttk.Button(toolbar, text="清空列表", command=self.clear_list).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="导出性能数据", command=self.export_trace).pack(side=tk.LEFT, padx=5)
+        self.watch_btn = ttk.Button(toolbar, text="监视文件夹", command=self.start_watch)
+        self.watch_btn.pack(side=tk.LEFT, padx=5)
+        self.cprofile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(toolbar, text="cProfile", variable=self.cprofile_var,
+                        command=lambda: setattr(self.profiler, 'cprofile', self.cprofile_var.get())).pack(side=tk.LEFT, padx=5)
         self.undo_btn = ttk.Button(toolbar, text="撤回上一步", command=self.undo_action, state=tk.DISABLED)
         self.undo_btn.pack(side=tk.RIGHT, padx=5)
 
@@ -220,6 +290,12 @@ class MainApp:
         ttk.Radiobutton(frame_meta, text="分辨率 (宽x高)", variable=self.meta_mode_var, value="resolution").pack(anchor='w', pady=2)
         ttk.Radiobutton(frame_meta, text="拍摄时间 (EXIF)", variable=self.meta_mode_var, value="date").pack(anchor='w', pady=2)
         ttk.Radiobutton(frame_meta, text="相机型号", variable=self.meta_mode_var, value="model").pack(anchor='w', pady=2)
+        ttk.Radiobutton(frame_meta, text="内容哈希 (SHA-1 前 10 位)", variable=self.meta_mode_var, value="hash").pack(anchor='w', pady=2)
+        ttk.Radiobutton(frame_meta, text="自定义模板", variable=self.meta_mode_var, value="template").pack(anchor='w', pady=2)
+        self.template_var = tk.StringVar(value="{prefix}{date:%Y%m%d}{suffix}_{seq:03}{ext}")
+        ttk.Entry(frame_meta, textvariable=self.template_var, width=36).pack(anchor='w', fill=tk.X, pady=2)
+        ttk.Label(frame_meta, text="字段: prefix suffix folder name seq group date width height resolution model hash ext",
+                  foreground="gray").pack(anchor='w')
         
         # 3. 配置网格权重
         parent.columnconfigure(1, weight=1)
@@ -229,37 +305,116 @@ class MainApp:
         
         self.case_var = tk.StringVar(value="全大写")
         ttk.OptionMenu(opt_frame, self.case_var, "全大写", "不改变", "全小写", "全大写").pack(anchor='w')
+
+        # 编号顺序（排序键随文件集合缓存，切换时不重新读取文件）
+        sort_frame = ttk.Frame(opt_frame)
+        sort_frame.pack(anchor='w', pady=2)
+        ttk.Label(sort_frame, text="编号顺序:").pack(side=tk.LEFT)
+        self.sort_var = tk.StringVar(value=SORT_OPTIONS[0][0])
+        ttk.Combobox(sort_frame, textvariable=self.sort_var, values=[label for label, _ in SORT_OPTIONS],
+                     state='readonly', width=22).pack(side=tk.LEFT, padx=5)
         
         self.websafe_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(opt_frame, text="Web安全 (空格转下划线)", variable=self.websafe_var).pack(anchor='w')
         
+        self.recursive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opt_frame, text="包含子文件夹", variable=self.recursive_var).pack(anchor='w')
+        
         self.sidecar_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(opt_frame, text="同步重命名同名文件 (.txt/.json)", variable=self.sidecar_var).pack(anchor='w')
+        ttk.Checkbutton(opt_frame, text="同步重命名附属文件 (.txt/.json/.xmp/.aae 等)", variable=self.sidecar_var).pack(anchor='w')
+
+        self.auto_resolve_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opt_frame, text="重名时自动追加 _1、_2", variable=self.auto_resolve_var).pack(anchor='w')
+
+        self.duplicates_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opt_frame, text="标记内容重复的文件（只重命名每组第一个）", variable=self.duplicates_var).pack(anchor='w')
+
+        self.group_similar_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opt_frame, text="近似照片分组（连拍、重新导出，模板中可用 {group}）",
+                        variable=self.group_similar_var).pack(anchor='w')
 
         # Action Button
         # 刷新按钮已移除，功能改为实时触发
-        ttk.Button(parent, text="执行重命名", command=self.run_rename, style="Action.TButton").grid(row=7, column=0, columnspan=3, sticky='ew', pady=(10, 10))
+        self.rename_btn = ttk.Button(parent, text="执行重命名", command=self.run_rename, style="Action.TButton")
+        self.rename_btn.grid(row=7, column=0, columnspan=3, sticky='ew', pady=(10, 10))
 
     def _create_preview_ui(self, parent):
-        cols = ("原文件名", "新文件名", "状态")
-        self.tree = ttk.Treeview(parent, columns=cols, show='headings')
-        
-        self.tree.heading("原文件名", text="原文件名")
-        self.tree.column("原文件名", width=200)
-        
-        self.tree.heading("新文件名", text="新文件名")
-        self.tree.column("新文件名", width=200)
-        
-        self.tree.heading("状态", text="状态")
-        self.tree.column("状态", width=80)
-        
-        scroll = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scroll.set)
-        
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        cols = (("原文件名", 200), ("新文件名", 200), ("附属文件", 120), ("状态", 80))
+        # 虚拟化列表：只渲染可见行，适用于大量文件
+        self.preview_list = VirtualTreeview(parent, cols, self._preview_row, rowheight=self.ROW_HEIGHT,
+                                            image_width=THUMB_SIZE[0] + 12)
+        self.preview_list.tag_configure('error', foreground='red')
+        # 只为可见的行加载缩略图
+        self.preview_list.on_range_changed(self._request_thumbnails)
+        self.preview_list.pack(fill=tk.BOTH, expand=True)
+        self.tree = self.preview_list.tree
+
+    def _preview_row(self, item):
+        sidecars = ", ".join(new for _, new in item.get('sidecars', ()))
+        status = item['status']
+        if 'conflict' in item:
+            status = f"冲突: {item['conflict']}"
+        elif 'duplicate' in item:
+            status = f"重复: 与 {item['duplicate']} 相同"
+        elif 'similar' in item:
+            status = f"{status} · 相似组 {item['similar']}"
+        values = (item['original'], item['new'], sidecars, status)
+        tag = 'error' if 'Error' in item['status'] or 'conflict' in item or 'duplicate' in item else 'ok'
+        return values, tag, self.thumbnails.get(item['path'])
+
+    def _request_thumbnails(self, start, end):
+        items = self.preview_list.items
+        missing = tuple(path for path in (items[i]['path'] for i in range(start, end))
+                        if path not in self.thumbnails)
+        # 刷新时可见区间回调会反复触发，相同的请求不重复提交
+        if missing and missing != self._thumbnails_requested:
+            self._thumbnails_requested = missing
+            self.thumbnail_worker.request(missing)
+
+    def _poll_thumbnails(self):
+        added = 0
+        while added < self.THUMBNAIL_BATCH:
+            try:
+                generation, path, thumb = self.thumbnail_worker.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.thumbnail_worker.generation:
+                # 失效之前开始加载的结果，可能是改名前的另一个文件
+                continue
+            image = None
+            if thumb is not None:
+                from PIL import Image, ImageTk
+                mode, size, data = thumb
+                image = ImageTk.PhotoImage(Image.frombytes(mode, size, data), master=self.root)
+            self.thumbnails.put(path, image, thumbnail_cost(thumb))
+            added += 1
+        if added:
+            self.preview_list.refresh()
+        self.root.after(self.PREVIEW_POLL_MS, self._poll_thumbnails)
+
+    def _invalidate_thumbnails(self):
+        """文件被重命名后，同一路径可能已是另一个文件"""
+        self.thumbnail_worker.invalidate()
+        self.thumbnails.clear()
+        self._thumbnails_requested = None
+
+    def on_close(self):
+        """关闭窗口：停止后台线程，提交元数据缓存的写入"""
+        self.preview_worker.cancel()
+        self.preview_worker.stop()
+        self.thumbnail_worker.stop()
+        if self.watch_worker is not None:
+            self.watch_worker.stop()
+        self.preview_worker.join(2)
+        if self.metadata_cache is not None:
+            try:
+                self.metadata_cache.close()
+            except Exception as e:
+                print(f"Metadata cache close failed: {e}")
+        self.root.destroy()
 
     def _bind_events(self):
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         if DRAG_DROP_AVAILABLE:
             self.root.drop_target_register(DND_FILES)
             self.root.dnd_bind('<<Drop>>', self.on_drop)
@@ -268,8 +423,9 @@ class MainApp:
         # 定义需要监听的变量列表
         vars_to_trace = [
             self.prefix_var, self.suffix_var, self.start_idx_var, self.padding_var,
-            self.meta_mode_var,
-            self.case_var, self.websafe_var
+            self.meta_mode_var, self.template_var,
+            self.case_var, self.websafe_var, self.sidecar_var, self.auto_resolve_var, self.sort_var,
+            self.duplicates_var, self.group_similar_var
         ]
         
         for var in vars_to_trace:
@@ -286,38 +442,72 @@ class MainApp:
                 if ans is None: # Cancel
                     return
                 elif ans is False: # No -> Replace
-                    self.current_files = []
+                    self.clear_list()
             
+            # 用户主动重新加载，丢弃旧的 facts 以读取磁盘上的最新状态
+            self.preview_worker.invalidate()
+            self._invalidate_thumbnails()
             self.add_files_from_folder(folder)
 
     def on_drop(self, event):
-        path = event.data
-        if path.startswith('{') and path.endswith('}'):
-            path = path[1:-1]
-        
-        if os.path.isdir(path):
-            self.add_files_from_folder(path)
-        elif os.path.isfile(path):
-            # 支持单个拖拽？暂时先支持追加到列表
-            if path not in self.current_files:
-                self.current_files.append(path)
-                self.update_preview()
+        # 拖入多个路径时由 Tcl 列表格式给出（含空格的路径带花括号）
+        paths = [p for p in self.root.tk.splitlist(event.data) if os.path.exists(p)]
+        if paths:
+            self.add_paths(paths)
 
     def add_files_from_folder(self, folder):
-        valid_exts = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif'}
-        count = 0
-        for f in os.listdir(folder):
-            ext = os.path.splitext(f)[1].lower()
-            if ext in valid_exts:
-                full_path = os.path.normpath(os.path.join(folder, f))
-                if full_path not in self.current_files:
-                    self.current_files.append(full_path)
-                    count += 1
-        self.status_var.set(f"已添加 {count} 个文件")
-        self.update_preview()
+        self.add_paths([folder])
+
+    def add_paths(self, paths):
+        """
+        在后台线程中扫描文件夹/文件，结果分块送回 UI 线程，
+        这样深层目录仍在扫描时就能先显示已找到的文件。
+        """
+        epoch = self._scan_epoch
+        recursive = self.recursive_var.get()
+
+        def scan():
+            try:
+                with self.profiler.operation("scan"), self.profiler.span("scan") as span:
+                    for chunk in scan_paths(paths, recursive=recursive):
+                        if epoch != self._scan_epoch: # 列表已被清空，停止扫描
+                            return
+                        span.add("files", len(chunk))
+                        self._scan_queue.put((epoch, chunk))
+            except Exception as e:
+                self._scan_queue.put((epoch, e))
+            finally:
+                self._scan_queue.put((epoch, None))
+
+        self._scans_running += 1
+        self.status_var.set("正在扫描...")
+        threading.Thread(target=scan, daemon=True).start()
+
+    def _poll_scan_results(self):
+        try:
+            while True:
+                epoch, chunk = self._scan_queue.get_nowait()
+                if chunk is None:
+                    self._scans_running -= 1
+                    if self._scans_running == 0:
+                        self.status_var.set(f"已添加 {self._scan_added} 个文件")
+                        self._scan_added = 0
+                elif epoch != self._scan_epoch:
+                    continue # 过期的扫描结果
+                elif isinstance(chunk, Exception):
+                    messagebox.showerror("扫描失败", str(chunk))
+                else:
+                    self._scan_added += self.current_files.update(chunk)
+                    self.status_var.set(f"正在扫描... 已添加 {self._scan_added} 个文件")
+                    self.update_preview()
+        except queue.Empty:
+            pass
+        self.root.after(self.PREVIEW_POLL_MS, self._poll_scan_results)
 
     def clear_list(self):
-        self.current_files = []
+        self._scan_epoch += 1 # 丢弃正在进行的扫描
+        self._scan_added = 0
+        self.current_files.clear()
         self.update_preview()
 
     def get_current_rules(self):
@@ -333,7 +523,9 @@ class MainApp:
         # 如果 meta_mode 不是 'none'，则使用 metadata_xxx 逻辑
         # 否则使用 序列化逻辑 ('sequence')
         meta_val = self.meta_mode_var.get()
-        if meta_val and meta_val != 'none':
+        if meta_val == 'template':
+            mode = 'template'
+        elif meta_val and meta_val != 'none':
             mode = f"metadata_{meta_val}"
         else:
             mode = 'sequence'
@@ -345,54 +537,247 @@ class MainApp:
             'prefix': self.prefix_var.get(),
             'suffix': self.suffix_var.get(),
             'start_index': int(self.start_idx_var.get()) if self.start_idx_var.get().isdigit() else 1,
-            'padding': int(self.padding_var.get())
+            'padding': int(self.padding_var.get()),
+            'sync_sidecar': self.sidecar_var.get(),
+            'template': self.template_var.get(),
+            'auto_resolve': self.auto_resolve_var.get(),
+            'sort': dict(SORT_OPTIONS).get(self.sort_var.get(), 'path'),
+            'find_duplicates': self.duplicates_var.get(),
+            'group_similar': self.group_similar_var.get(),
         }
         
         return rules
 
     def update_preview(self):
-        # Clear tree
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
+        """请求刷新预览。带防抖：停止输入约 150ms 后才真正提交给后台线程"""
+        if self._preview_after_id is not None:
+            self.root.after_cancel(self._preview_after_id)
+        self._preview_after_id = self.root.after(self.PREVIEW_DEBOUNCE_MS, self._start_preview)
+
+    def _start_preview(self):
+        self._preview_after_id = None
         if not self.current_files:
+            # 丢弃仍在计算中的旧结果
+            self.preview_worker.cancel()
+            self._show_preview(self.preview_worker.generation, [])
             return
 
         rules = self.get_current_rules()
-        self.renamer.set_rules(rules)
-        
-        self.preview_data = self.renamer.generate_preview(self.current_files)
-        
-        for item in self.preview_data:
-            values = (item['original'], item['new'], item['status'])
-            tag = 'error' if 'Error' in item['status'] else 'ok'
-            self.tree.insert('', 'end', values=values, tags=(tag,))
-        
-        self.tree.tag_configure('error', foreground='red')
+        self.preview_worker.submit(self.current_files.snapshot(), rules)
+
+    def _poll_preview_results(self):
+        """定时从后台线程的结果队列中取出消息，只处理最新 generation 的结果"""
+        try:
+            while True:
+                msg = self.preview_worker.results.get_nowait()
+                kind, generation = msg[0], msg[1]
+                if generation != self.preview_worker.generation:
+                    continue # 过期结果
+
+                if kind == 'progress':
+                    done, total = msg[2], msg[3]
+                    self._preview_progress_shown = True
+                    self.status_var.set(f"正在生成预览... {done}/{total}")
+                elif kind == 'done':
+                    self._show_preview(generation, msg[2])
+                elif kind == 'error':
+                    self._preview_generation_shown = generation
+                    self.status_var.set(f"预览失败: {msg[2]}")
+        except queue.Empty:
+            pass
+        self.root.after(self.PREVIEW_POLL_MS, self._poll_preview_results)
+
+    def _show_preview(self, generation, preview_data):
+        self.preview_data = preview_data
+        self._preview_generation_shown = generation
+
+        start = time.perf_counter()
+        self.preview_list.set_items(preview_data)
+        operation = self.profiler.last
+        if operation is not None and operation.name == "preview":
+            self.profiler.record("render", time.perf_counter() - start, files=len(preview_data))
+
+        # 扫描进行中时保留扫描进度；阶段耗时、吞吐量与缓存命中见 Operation.status_text
+        if self._preview_progress_shown or (preview_data and not self._scans_running):
+            self._preview_progress_shown = False
+            if operation is not None and operation.name == "preview":
+                self.status_var.set(f"预览完成 ({len(preview_data)} 个文件) | {operation.status_text()}")
+            else:
+                self.status_var.set(f"预览完成 ({len(preview_data)} 个文件)")
+
+    def _preview_pending(self):
+        return (self._preview_after_id is not None
+                or self._preview_generation_shown != self.preview_worker.generation)
 
     def run_rename(self):
-        if not hasattr(self, 'preview_data') or not self.preview_data:
+        if self.rename_worker is not None:
+            return
+        if self._preview_pending():
+            messagebox.showinfo("提示", "预览正在更新，请稍候再执行")
+            return
+
+        if not self.preview_data:
             messagebox.showinfo("提示", "请先加载文件并刷新预览")
             return
             
-        if messagebox.askyesno("确认", "确定要执行重命名吗？此操作将修改文件名。"):
-            count, error = self.processor.execute_rename(self.preview_data, sync_sidecar=self.sidecar_var.get())
+        conflicts = sum(1 for item in self.preview_data if item['status'] == "冲突")
+        prompt = "确定要执行重命名吗？此操作将修改文件名。"
+        if conflicts:
+            prompt += f"\n\n有 {conflicts} 个文件的新名称重名或目标已存在，这些文件将被跳过。"
+        duplicates = sum(1 for item in self.preview_data if item['status'] == "重复")
+        if duplicates:
+            prompt += f"\n\n有 {duplicates} 个文件与其他文件内容完全相同，这些文件将被跳过。"
+        if not messagebox.askyesno("确认", prompt):
+            return
+
+        # 在后台线程执行，执行期间按钮变为“取消执行”
+        self.rename_worker = RenameWorker(self.processor, self.profiler)
+        self.rename_worker.start(self.preview_data, sync_sidecar=self.sidecar_var.get())
+        self.rename_btn.config(text="取消执行", command=self.cancel_rename)
+        self.undo_btn.config(state=tk.DISABLED)
+        self.status_var.set("正在重命名...")
+        self._poll_rename_results()
+
+    def cancel_rename(self):
+        if self.rename_worker is not None:
+            self.rename_worker.cancel()
+            self.rename_btn.config(state=tk.DISABLED)
+            self.status_var.set("正在取消，等待当前文件组完成...")
+
+    def _poll_rename_results(self):
+        worker = self.rename_worker
+        while True:
+            try:
+                msg = worker.results.get_nowait()
+            except queue.Empty:
+                break
+            if msg[0] == 'progress':
+                _, done, total, eta = msg
+                text = f"正在重命名... {done}/{total}"
+                if eta is not None:
+                    text += f" 剩余约 {eta:.0f}s"
+                self.status_var.set(text)
+            elif msg[0] == 'done':
+                self._finish_rename(*msg[1:])
+                return
+        self.root.after(self.PREVIEW_POLL_MS, self._poll_rename_results)
+
+    def _finish_rename(self, count, error, cancelled):
+        operation = self.rename_worker.operation
+        self.rename_worker = None
+        self.rename_btn.config(text="执行重命名", command=self.run_rename, state=tk.NORMAL)
+        if self.processor.history_stack:
+            self.undo_btn.config(state=tk.NORMAL)
+
+        if cancelled:
+            messagebox.showinfo("已取消", f"已取消，完成了 {count} 个文件，可以撤回")
+        elif error:
+            messagebox.showerror("部分错误", f"完成 {count} 个文件，但遇到错误: {error}")
+        else:
+            messagebox.showinfo("成功", f"成功重命名 {count} 个文件！")
+
+        # Refresh list with new names
+        # Logic: We can't easily guess new names if they were complex. 
+        # Simplest way: Clear list and ask user to reload, or try to map.
+        # Here: Clear list
+        self.current_files.clear() # Reset
+        self.preview_worker.invalidate()
+        self._invalidate_thumbnails()
+        self.update_preview() 
+        status = "重命名已取消" if cancelled else "重命名完成"
+        self.status_var.set(f"{status}，列表已清空 | {operation.status_text()}" if operation else status)
+
+    def _check_incomplete_batches(self):
+        """启动时检查上次是否有中途中断的重命名批次"""
+        for path in self.processor.incomplete_batches():
+            ans = messagebox.askyesnocancel(
+                "发现未完成的重命名",
+                f"上次的重命名操作未完成：\n{os.path.basename(path)}\n\n"
+                "选择【是】继续完成剩余的重命名\n选择【否】回滚到重命名之前\n选择【取消】暂不处理"
+            )
+            if ans is None:
+                continue
+            try:
+                if ans:
+                    count, error = self.processor.resume_batch(path)
+                else:
+                    count, error = self.processor.rollback_batch(path)
+            except Exception as e:
+                count, error = 0, str(e)
             if error:
-                messagebox.showerror("部分错误", f"完成 {count} 个文件，但遇到错误: {error}")
+                messagebox.showerror("恢复失败", f"处理 {count} 个文件后遇到错误: {error}")
             else:
-                messagebox.showinfo("成功", f"成功重命名 {count} 个文件！")
-                self.undo_btn.config(state=tk.NORMAL)
-            
-            # Refresh list with new names
-            # Logic: We can't easily guess new names if they were complex. 
-            # Simplest way: Clear list and ask user to reload, or try to map.
-            # Here: Clear list
-            self.current_files = [] # Reset
-            self.update_preview() 
-            self.status_var.set("重命名完成，列表已清空")
+                self.status_var.set(f"已{'完成' if ans else '回滚'} {count} 个文件的重命名")
+                if ans:
+                    self.undo_btn.config(state=tk.NORMAL)
+
+    def start_watch(self):
+        """监视一个文件夹：新到达的文件按当前规则自动重命名，序号接着上一次监视继续"""
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        worker = WatchWorker(folder, self.get_current_rules(), recursive=self.recursive_var.get(),
+                             journal_dir=RenameJournal.default_dir(), profiler=self.profiler)
+        try:
+            worker.start()
+        except Exception as e:
+            messagebox.showerror("无法开始监视", str(e))
+            return
+        self.watch_worker = worker
+        self.watch_btn.config(text="停止监视", command=self.stop_watch)
+        self.status_var.set(f"正在监视 {folder}，下一个序号 {worker.watcher.next_index}")
+        self._poll_watch_results()
+
+    def stop_watch(self):
+        if self.watch_worker is not None:
+            self.watch_worker.stop()
+            self.watch_btn.config(state=tk.DISABLED)
+
+    def _poll_watch_results(self):
+        worker = self.watch_worker
+        while True:
+            try:
+                msg = worker.results.get_nowait()
+            except queue.Empty:
+                break
+            if msg[0] == 'batch':
+                result = msg[1]
+                text = f"监视中：重命名 {result['renamed']}/{result['files']} 个新文件，下一个序号 {result['next_index']}"
+                if result['error']:
+                    text += f" | 错误: {result['error']}"
+                self.status_var.set(text)
+            elif msg[0] == 'stopped':
+                self.watch_worker = None
+                self.watch_btn.config(text="监视文件夹", command=self.start_watch, state=tk.NORMAL)
+                if msg[1]:
+                    messagebox.showerror("监视已停止", msg[1])
+                else:
+                    self.status_var.set("已停止监视")
+                return
+        self.root.after(self.PREVIEW_POLL_MS * 10, self._poll_watch_results)
+
+    def export_trace(self):
+        """把最近的操作（扫描、预览、重命名、撤回）的耗时与计数导出为 JSON 跟踪文件"""
+        if not self.profiler.history:
+            messagebox.showinfo("提示", "还没有可导出的性能数据")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="trace.json",
+                                            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            written = self.profiler.export(path)
+        except OSError as e:
+            messagebox.showerror("导出失败", str(e))
+            return
+        messagebox.showinfo("导出完成", "\n".join(written))
 
     def undo_action(self):
-        count, error = self.processor.undo_last_operation()
+        with self.profiler.operation("undo") as operation:
+            count, error = self.processor.undo_last_operation()
+        self.status_var.set(operation.status_text())
+        self.preview_worker.invalidate()
+        self._invalidate_thumbnails()
         if error:
             messagebox.showerror("撤回失败", error)
         else:
@@ -0,0 +1,103 @@
+import time
+import queue
+import threading
+
+
+class PreviewCancelled(Exception):
+    """有更新的预览请求到达时，用于中止当前的预览计算"""
+    pass
+
+
+class PreviewWorker:
+    """
+    在后台线程中生成预览。
+    每个请求带有递增的 generation 编号，过期的请求会被合并或中途取消，
+    结果通过 results 队列返回，由 UI 线程使用 root.after 轮询读取。
+
+    results 中的消息格式：
+        ('progress', generation, done, total)
+        ('done', generation, preview_data)
+        ('error', generation, message)
+    """
+    # 进度消息的最小间隔（秒）
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.results = queue.Queue()
+        self.generation = 0
+
+        self._requests = queue.Queue()
+        self._invalidate = threading.Event()
+        self._last_progress = 0.0
+        self._current = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, files, rules):
+        """
+        提交一个预览请求（应在 UI 线程调用）。
+        files 会被转换为元组（已是元组时不复制，如 FileCollection.snapshot()），
+        调用方之后可以自由修改原集合。
+        returns: 本次请求的 generation
+        """
+        self.generation += 1
+        self._requests.put((self.generation, tuple(files), dict(rules)))
+        return self.generation
+
+    def cancel(self):
+        """作废所有已提交的请求，正在计算的预览会在下一次进度回调时中止"""
+        self.generation += 1
+
+    def invalidate(self):
+        """要求在下一次预览前丢弃引擎缓存的 facts"""
+        self._invalidate.set()
+
+    def stop(self):
+        self._requests.put(None)
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            # 合并积压的请求，只处理最新的一个
+            while True:
+                try:
+                    request = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    break
+            if request is None:
+                return
+
+            generation, files, rules = request
+            self._current = generation
+            try:
+                if self._invalidate.is_set():
+                    self._invalidate.clear()
+                    self.engine.invalidate_facts()
+                self.engine.set_rules(rules)
+                self.engine.progress_callback = self._on_progress
+                with self.engine.profiler.operation("preview"):
+                    preview_data = self.engine.generate_preview(files)
+            except PreviewCancelled:
+                continue
+            except Exception as e:
+                self.results.put(('error', generation, str(e)))
+                continue
+            finally:
+                self.engine.progress_callback = None
+            self.results.put(('done', generation, preview_data))
+
+    def _on_progress(self, done, total):
+        # 已有更新的请求，放弃当前计算
+        if self.generation != self._current:
+            raise PreviewCancelled()
+        now = time.monotonic()
+        if done == total or now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.results.put(('progress', self._current, done, total))
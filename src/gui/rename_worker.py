@@ -0,0 +1,70 @@
+import time
+import queue
+import threading
+
+from src.core.file_ops import CANCELLED
+
+
+class RenameWorker:
+    """
+    在后台线程中执行一次重命名，UI 线程用 root.after 轮询 results。
+    进度消息按 PROGRESS_INTERVAL 节流，界面不会因每个文件的回调而卡顿。
+
+    results 中的消息格式：
+        ('progress', done, total, eta_seconds)   eta_seconds 在无法估计时为 None
+        ('done', success_count, error_msg, cancelled)
+    """
+    # 进度消息的最小间隔（秒）
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, processor, profiler=None):
+        self.processor = processor
+        self.profiler = profiler or processor.profiler
+        self.results = queue.Queue()
+        self.operation = None # 执行完成后为本次的 profiling Operation
+        self._thread = None
+        self._start = 0.0
+        self._last_progress = 0.0
+
+    def start(self, preview_data, sync_sidecar=False):
+        """开始执行。preview_data 在执行期间不应被修改"""
+        self._start = time.monotonic()
+        self._last_progress = 0.0
+        # 在启动线程之前清除，start() 之后立即发出的取消不会被覆盖
+        self.processor.reset_cancel()
+        self._thread = threading.Thread(target=self._run, args=(preview_data, sync_sidecar), daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """请求取消：当前的链或环路完成后停止，已完成的部分可以撤回"""
+        self.processor.cancel()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, preview_data, sync_sidecar):
+        self.processor.progress_callback = self._on_progress
+        try:
+            with self.profiler.operation("rename") as operation:
+                count, error = self.processor.execute_rename(preview_data, sync_sidecar=sync_sidecar)
+        except Exception as e:
+            count, error = 0, str(e)
+        finally:
+            self.processor.progress_callback = None
+        self.operation = operation
+        self.results.put(('done', count, error, error == CANCELLED))
+
+    def _on_progress(self, done, total):
+        now = time.monotonic()
+        if done != total and now - self._last_progress < self.PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        elapsed = now - self._start
+        eta = None
+        if done and elapsed > 0:
+            eta = (total - done) * elapsed / done
+        self.results.put(('progress', done, total, eta))
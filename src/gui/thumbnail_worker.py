@@ -0,0 +1,82 @@
+import queue
+import threading
+
+
+class ThumbnailWorker:
+    """
+    在后台线程中加载缩略图（见 ThumbnailStore），UI 线程用 root.after 轮询 results。
+    request() 用新的路径列表替换尚未开始的请求：滚动离开可见区域的行不再解码。
+    invalidate() 使之前的请求作废（文件被重命名后同一路径可能已是另一个文件），
+    已在加载或已放入 results 的旧结果带有旧的 generation，由调用方丢弃。
+
+    results 中的消息格式：
+        (generation, path, thumb)   thumb 为 (mode, (宽, 高), bytes)，无法读取时为 None
+    """
+    def __init__(self, store, max_workers=2):
+        self.store = store
+        self.max_workers = max_workers
+        self.results = queue.Queue()
+        # 每次 invalidate() 加一，结果中带有开始加载时的值
+        self.generation = 0
+        self._pending = []
+        self._inflight = {} # path -> generation
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = []
+
+    def request(self, paths):
+        """请求加载 paths（按顺序），替换之前尚未开始的请求"""
+        with self._cond:
+            self._pending = [p for p in dict.fromkeys(paths) if self._inflight.get(p) != self.generation]
+            self._pending.reverse() # 从末尾弹出，保持从上到下的顺序
+            if self._pending:
+                self._ensure_threads()
+                self._cond.notify_all()
+
+    def invalidate(self):
+        """丢弃尚未开始的请求，之后到达的旧结果 generation 不再匹配"""
+        with self._cond:
+            self.generation += 1
+            self._pending = []
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending) + len(self._inflight)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._pending = []
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _ensure_threads(self):
+        if not self._threads:
+            # 启动时清理一次超出预算的磁盘缓存
+            threading.Thread(target=self.store.prune, daemon=True).start()
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                path = self._pending.pop()
+                generation = self.generation
+                self._inflight[path] = generation
+            try:
+                thumb = self.store.load(path)
+            except Exception:
+                thumb = None
+            with self._cond:
+                if self._inflight.get(path) == generation:
+                    del self._inflight[path]
+            self.results.put((generation, path, thumb))
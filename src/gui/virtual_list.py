@@ -0,0 +1,155 @@
+import math
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    虚拟化的列表控件。
+    Treeview 中只保留填满可见区域所需的少量行，滚动时改写这些行的内容，
+    因此数据量（即使是几十万行）不影响刷新和滚动速度。
+    每一行缓存了当前显示的内容，刷新时只改写发生变化的行。
+
+    row_builder(item) -> (values, tag) 或 (values, tag, image)，用于把数据项转换为行内容。
+    image_width 不为 None 时显示图片列（Treeview 的 #0 列），image 为 PhotoImage 或 None。
+    """
+    def __init__(self, parent, columns, row_builder, rowheight=30, image_width=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.row_builder = row_builder
+        self.rowheight = rowheight
+
+        self.items = []
+        self.offset = 0 # 第一行可见数据的索引
+        self._rows = [] # [(iid, rendered)]，rendered 为该行当前显示的 (values, tag, image)
+        self._range_callbacks = []
+
+        show = 'headings' if image_width is None else 'tree headings'
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in columns], show=show, selectmode='browse')
+        if image_width is not None:
+            self.tree.column('#0', width=image_width, minwidth=image_width, stretch=False)
+        for name, width in columns:
+            self.tree.heading(name, text=name)
+            self.tree.column(name, width=width)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind('<Configure>', lambda e: self._resize_pool())
+        for seq in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.tree.bind(seq, self._on_wheel)
+        for seq, (n, unit) in {
+            '<Up>': (-1, 'units'), '<Down>': (1, 'units'),
+            '<Prior>': (-1, 'pages'), '<Next>': (1, 'pages'),
+        }.items():
+            self.tree.bind(seq, lambda e, n=n, unit=unit: self._scroll_and_break(n, unit))
+        self.tree.bind('<Home>', lambda e: self._scroll_to_and_break(0))
+        self.tree.bind('<End>', lambda e: self._scroll_to_and_break(len(self.items)))
+
+    def tag_configure(self, tag, **kwargs):
+        self.tree.tag_configure(tag, **kwargs)
+
+    def set_items(self, items):
+        """替换全部数据。只有可见行中内容变化的部分会被改写"""
+        self.items = items
+        self._clamp_offset()
+        self.refresh()
+
+    def visible_range(self):
+        """returns: (start, end) 当前可见的数据索引区间"""
+        return self.offset, min(len(self.items), self.offset + len(self._rows))
+
+    def on_range_changed(self, callback):
+        """注册可见区间变化的回调 callback(start, end)"""
+        self._range_callbacks.append(callback)
+
+    def yview(self, *args):
+        """Scrollbar 的 command 回调"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.items)))
+        elif args[0] == 'scroll':
+            self.scroll(int(args[1]), args[2])
+
+    def scroll(self, n, unit='units'):
+        step = max(1, len(self._rows) - 1) if unit == 'pages' else 1
+        self.scroll_to(self.offset + n * step)
+
+    def scroll_to(self, index):
+        old = self.offset
+        self.offset = index
+        self._clamp_offset()
+        if self.offset != old:
+            self.refresh()
+
+    def refresh(self):
+        """把 items[offset:offset+行数] 写入行池"""
+        total = len(self.items)
+        for i, (iid, rendered) in enumerate(self._rows):
+            idx = self.offset + i
+            if idx < total:
+                row = self.row_builder(self.items[idx])
+                new = (tuple(row[0]), row[1], row[2] if len(row) > 2 else None)
+            else:
+                new = None
+            if new == rendered:
+                continue
+            if new is None:
+                self.tree.item(iid, values=(), tags=(), image='')
+            else:
+                self.tree.item(iid, values=new[0], tags=(new[1],), image=new[2] or '')
+            self._rows[i] = (iid, new)
+
+        # 行池总是从顶部显示，防止 Treeview 自身发生滚动
+        self.tree.yview_moveto(0)
+        if total:
+            start, end = self.visible_range()
+            self.scrollbar.set(start / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+        for callback in self._range_callbacks:
+            callback(*self.visible_range())
+
+    def _visible_row_count(self):
+        height = self.tree.winfo_height()
+        header = self.rowheight
+        if self._rows:
+            bbox = self.tree.bbox(self._rows[0][0])
+            if bbox:
+                header = bbox[1]
+        return max(1, math.ceil((height - header) / self.rowheight))
+
+    def _resize_pool(self):
+        count = self._visible_row_count()
+        while len(self._rows) < count:
+            self._rows.append((self.tree.insert('', 'end', values=()), None))
+        while len(self._rows) > count:
+            iid, _ = self._rows.pop()
+            self.tree.delete(iid)
+        self._clamp_offset()
+        self.refresh()
+
+    def _clamp_offset(self):
+        max_offset = max(0, len(self.items) - max(1, len(self._rows) - 1))
+        self.offset = max(0, min(self.offset, max_offset))
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            n = -3
+        elif event.num == 5:
+            n = 3
+        else:
+            n = -3 if event.delta > 0 else 3
+        self.scroll(n)
+        return "break"
+
+    def _scroll_and_break(self, n, unit):
+        self.scroll(n, unit)
+        return "break"
+
+    def _scroll_to_and_break(self, index):
+        self.scroll_to(index)
+        return "break"
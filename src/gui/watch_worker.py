@@ -0,0 +1,52 @@
+import queue
+import threading
+
+from src.core.renamer import RenamerEngine
+from src.core.file_ops import FileProcessor
+from src.core.watcher import FolderWatcher, run_watch
+
+
+class WatchWorker:
+    """
+    在后台线程中监视文件夹，新到达的文件按启动时的规则重命名，UI 线程用 root.after 轮询 results。
+    使用独立的 RenamerEngine 与 FileProcessor，不影响界面中的预览与撤回。
+
+    results 中的消息格式：
+        ('batch', result)      result 见 watcher.run_watch
+        ('stopped', error)     error 为 None 或错误信息
+    """
+    def __init__(self, folder, rules, recursive=False, journal_dir=None, profiler=None, interval=2.0):
+        self.rules = dict(rules)
+        self.watcher = FolderWatcher([folder], recursive=recursive, start_index=self.rules.get('start_index', 1))
+        self.engine = RenamerEngine(profiler=profiler)
+        self.processor = FileProcessor(journal_dir=journal_dir, profiler=profiler)
+        self.interval = interval
+        self.results = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # 规则无效时在 UI 线程中立即报错
+        self.engine.set_rules(self.rules)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """请求停止：当前批次完成后退出"""
+        self._stop.set()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        error = None
+        try:
+            run_watch(self.watcher, self.engine, self.processor, self.rules, self._stop,
+                      interval=self.interval, on_batch=lambda result: self.results.put(('batch', result)))
+        except Exception as e:
+            error = str(e)
+        self.results.put(('stopped', error))
@@ -0,0 +1,150 @@
+import os
+import hashlib
+import threading
+
+# 每次读取的块大小。每个线程复用同一个缓冲区，内存占用与文件大小无关
+BUFFER_SIZE = 1024 * 1024
+
+DEFAULT_ALGORITHM = 'sha1'
+
+# 本进程累计哈希的字节数，供性能统计使用（见 bytes_hashed）
+_bytes_hashed = 0
+_bytes_lock = threading.Lock()
+_local = threading.local()
+
+
+def bytes_hashed():
+    """returns: 本进程中 hash_file 累计读取的字节数"""
+    return _bytes_hashed
+
+
+def _add_bytes_hashed(n):
+    global _bytes_hashed
+    with _bytes_lock:
+        _bytes_hashed += n
+
+
+def hash_file(path, algorithm=DEFAULT_ALGORITHM, buffer_size=BUFFER_SIZE):
+    """
+    流式计算文件内容的哈希：用固定大小的缓冲区 readinto，不把整个文件读入内存。
+    hashlib 处理大块数据时会释放 GIL，多个线程可以并行计算。
+    returns: 十六进制摘要
+    """
+    buf = getattr(_local, 'buffer', None)
+    if buf is None or len(buf) != buffer_size:
+        buf = _local.buffer = bytearray(buffer_size)
+    view = memoryview(buf)
+    digest = hashlib.new(algorithm)
+    total = 0
+    try:
+        with open(path, 'rb', buffering=0) as fh:
+            while True:
+                n = fh.readinto(buf)
+                if not n:
+                    break
+                digest.update(view[:n])
+                total += n
+    finally:
+        view.release()
+        _add_bytes_hashed(total)
+    return digest.hexdigest()
+
+
+class FileHasher:
+    """
+    并行计算一组文件的内容哈希，并查找内容完全相同的文件。
+    cache: 可选的 MetadataCache。哈希按 (设备, inode, 大小, mtime) 缓存，
+           文件被重命名后仍然命中，内容变化后自动失效。
+    """
+    def __init__(self, cache=None, max_workers=4, algorithm=DEFAULT_ALGORITHM):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.algorithm = algorithm
+        # 统计计数器（本对象计算或查到的文件数）
+        self.hashed = 0
+        self.cache_hits = 0
+
+    def hash_files(self, paths, progress_callback=None, stats=None):
+        """
+        计算每个文件的哈希。已缓存且未变化的文件不再读取。
+        progress_callback(done, total) 每完成一个文件调用一次；抛出的异常会中止计算（用于取消）。
+        stats: 可选的 path -> os.stat_result，避免重复 stat
+        returns: dict, path -> 十六进制摘要（无法读取的文件为 None）
+        """
+        paths = list(paths)
+        total = len(paths)
+        digests = {}
+        pending = []
+        cache = self.cache
+        for path in paths:
+            st = stats.get(path) if stats is not None else None
+            try:
+                if st is None:
+                    st = os.stat(path)
+            except OSError:
+                digests[path] = None
+                continue
+            digest = cache.get_hash(st, self.algorithm) if cache is not None else None
+            if digest is not None:
+                digests[path] = digest
+                self.cache_hits += 1
+            else:
+                pending.append((path, st))
+        if progress_callback is not None:
+            progress_callback(len(digests), total)
+
+        def work(path):
+            try:
+                return hash_file(path, self.algorithm)
+            except OSError:
+                return None
+
+        if self.max_workers <= 1 or len(pending) < 2:
+            results = map(work, [path for path, _ in pending])
+            pool = None
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            results = pool.map(work, [path for path, _ in pending])
+        try:
+            for (path, st), digest in zip(pending, results):
+                digests[path] = digest
+                self.hashed += 1
+                if digest is not None and cache is not None:
+                    cache.put_hash(st, digest, self.algorithm)
+                if progress_callback is not None:
+                    progress_callback(len(digests), total)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+            if cache is not None:
+                cache.flush()
+        return digests
+
+    def find_duplicates(self, paths, progress_callback=None, digests=None):
+        """
+        查找内容完全相同的文件。大小唯一的文件不可能重复，不计算哈希。
+        digests: 已知的 path -> 摘要（例如命名时已计算），提供时直接使用
+        returns: list of list，每组为内容相同的路径（按 paths 中的顺序，至少两个）
+        """
+        paths = list(paths)
+        stats = {}
+        by_size = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = st
+            by_size.setdefault(st.st_size, []).append(path)
+
+        candidates = [path for path in paths if path in stats and len(by_size[stats[path].st_size]) > 1]
+        if digests is None:
+            digests = self.hash_files(candidates, progress_callback, stats)
+
+        groups = {}
+        for path in candidates:
+            digest = digests.get(path)
+            if digest is not None:
+                groups.setdefault((stats[path].st_size, digest), []).append(path)
+        return [group for group in groups.values() if len(group) > 1]
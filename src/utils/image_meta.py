@@ -0,0 +1,255 @@
+
+import struct
+import threading
+
+# 一次性读取的文件头大小。绝大多数图片的宽高和 EXIF 都在这个范围内，
+# 超出时才按需对指定偏移做额外读取。
+HEADER_READ_SIZE = 64 * 1024
+
+# 需要的 EXIF 标签：DateTimeOriginal / DateTime / Model
+TAG_DATETIME_ORIGINAL = 36867
+TAG_DATETIME = 306
+TAG_MODEL = 272
+TAG_EXIF_IFD = 34665
+DEFAULT_TAGS = (TAG_DATETIME_ORIGINAL, TAG_DATETIME, TAG_MODEL)
+
+# 本进程累计读取的文件头字节数，供性能统计使用（见 bytes_read）
+_bytes_read = 0
+_bytes_lock = threading.Lock()
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class _HeaderBuffer:
+    """持有文件头的缓冲区，超出缓冲区的数据按需 seek + read"""
+    def __init__(self, f, size):
+        self.f = f
+        self.data = f.read(size)
+        self.bytes_read = len(self.data)
+
+    def read_at(self, offset, n):
+        end = offset + n
+        if end <= len(self.data):
+            return self.data[offset:end]
+        self.f.seek(offset)
+        data = self.f.read(n)
+        self.bytes_read += len(data)
+        return data
+
+
+def bytes_read():
+    """returns: 本进程中 read_header_meta 累计读取的字节数（进程池中的读取不计入）"""
+    return _bytes_read
+
+
+def _add_bytes_read(n):
+    global _bytes_read
+    with _bytes_lock:
+        _bytes_read += n
+
+
+def read_header_meta(file_path, tags=DEFAULT_TAGS):
+    """
+    只解析文件头，读取图片宽高及指定的 EXIF 标签，不解码像素数据。
+    支持 JPEG / PNG / WebP / GIF / BMP。
+    returns: dict {'width', 'height', 'date', 'model', 'exif'}，exif 表示该格式能否带有 EXIF
+             （GIF / BMP 为 False，与 PIL 的 _getexif 一致）；
+             格式不支持或文件头无法解析时返回 None，由调用方回退到 PIL。
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            buf = _HeaderBuffer(f, HEADER_READ_SIZE)
+            head = buf.data
+            has_exif = True
+            if head[:3] == b'\xff\xd8\xff':
+                result = _read_jpeg(buf, tags)
+            elif head[:8] == b'\x89PNG\r\n\x1a\n':
+                result = _read_png(buf, tags)
+            elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                result = _read_webp(buf, tags)
+            elif head[:6] in (b'GIF87a', b'GIF89a'):
+                result = _read_gif(head)
+                has_exif = False
+            elif head[:2] == b'BM':
+                result = _read_bmp(head)
+                has_exif = False
+            else:
+                result = None
+            _add_bytes_read(buf.bytes_read)
+    except (OSError, struct.error, ValueError, IndexError):
+        return None
+
+    if result is None:
+        return None
+    width, height, exif = result
+    return {
+        'width': width,
+        'height': height,
+        'date': exif.get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME),
+        'model': exif.get(TAG_MODEL),
+        'exif': has_exif,
+    }
+
+
+def _read_jpeg(buf, tags):
+    exif = {}
+    pos = 2
+    while True:
+        marker = buf.read_at(pos, 4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            # 填充字节
+            pos += 1
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            pos += 2
+            continue
+        if code == 0xD9 or code == 0xDA:
+            # 到达 EOI / SOS 仍未找到 SOF
+            return None
+        seg_len = struct.unpack('>H', marker[2:4])[0]
+        if code == 0xE1 and not exif and tags:
+            payload = buf.read_at(pos + 4, seg_len - 2)
+            if payload[:6] == b'Exif\x00\x00':
+                exif = _parse_tiff(payload[6:], tags)
+        elif code in _JPEG_SOF_MARKERS:
+            sof = buf.read_at(pos + 4, 5)
+            height, width = struct.unpack('>HH', sof[1:5])
+            return width, height, exif
+        pos += 2 + seg_len
+
+
+def _read_png(buf, tags):
+    ihdr = buf.read_at(8, 25)
+    if ihdr[4:8] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', ihdr[8:16])
+    exif = {}
+    if tags:
+        pos = 8
+        while True:
+            header = buf.read_at(pos, 8)
+            if len(header) < 8:
+                break
+            length = struct.unpack('>I', header[:4])[0]
+            ctype = header[4:8]
+            if ctype in (b'IDAT', b'IEND'):
+                break
+            if ctype == b'eXIf':
+                exif = _parse_tiff(buf.read_at(pos + 8, length), tags)
+                break
+            pos += 12 + length
+    return width, height, exif
+
+
+def _read_webp(buf, tags):
+    width = height = None
+    exif = {}
+    riff_size = struct.unpack('<I', buf.read_at(4, 4))[0]
+    end = 8 + riff_size
+    pos = 12
+    while pos + 8 <= end:
+        header = buf.read_at(pos, 8)
+        if len(header) < 8:
+            break
+        ctype = header[:4]
+        length = struct.unpack('<I', header[4:8])[0]
+        if ctype == b'VP8X':
+            data = buf.read_at(pos + 8, 10)
+            width = int.from_bytes(data[4:7], 'little') + 1
+            height = int.from_bytes(data[7:10], 'little') + 1
+            if not tags or not (data[0] & 0x08):
+                # 未设置 EXIF 标志位，无需继续扫描
+                return width, height, exif
+        elif ctype == b'VP8 ' and width is None:
+            data = buf.read_at(pos + 8, 10)
+            if data[3:6] != b'\x9d\x01\x2a':
+                return None
+            w, h = struct.unpack('<HH', data[6:10])
+            return w & 0x3FFF, h & 0x3FFF, exif
+        elif ctype == b'VP8L' and width is None:
+            data = buf.read_at(pos + 8, 5)
+            if data[0] != 0x2F:
+                return None
+            bits = int.from_bytes(data[1:5], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, exif
+        elif ctype == b'EXIF':
+            payload = buf.read_at(pos + 8, length)
+            if payload[:6] == b'Exif\x00\x00':
+                payload = payload[6:]
+            exif = _parse_tiff(payload, tags)
+            if width is not None:
+                return width, height, exif
+        # RIFF 块按偶数字节对齐
+        pos += 8 + length + (length & 1)
+    if width is None:
+        return None
+    return width, height, exif
+
+
+def _read_gif(head):
+    width, height = struct.unpack('<HH', head[6:10])
+    return width, height, {}
+
+
+def _read_bmp(head):
+    dib_size = struct.unpack('<I', head[14:18])[0]
+    if dib_size == 12:
+        width, height = struct.unpack('<HH', head[18:22])
+    else:
+        width, height = struct.unpack('<ii', head[18:26])
+    return width, abs(height), {}
+
+
+def _parse_tiff(data, tags):
+    """
+    解析 TIFF 结构的 EXIF 数据，只提取 tags 中的 ASCII 标签。
+    遍历 IFD0，并在需要时跟随 ExifIFD 指针。
+    """
+    if len(data) < 8:
+        return {}
+    if data[:2] == b'II':
+        endian = '<'
+    elif data[:2] == b'MM':
+        endian = '>'
+    else:
+        return {}
+
+    wanted = set(tags)
+    found = {}
+    ifd_offset = struct.unpack(endian + 'I', data[4:8])[0]
+    exif_offset = _scan_ifd(data, ifd_offset, endian, wanted, found)
+    if exif_offset and wanted - found.keys():
+        _scan_ifd(data, exif_offset, endian, wanted, found)
+    return found
+
+
+def _scan_ifd(data, offset, endian, wanted, found):
+    """扫描单个 IFD，返回 ExifIFD 的偏移（如有）"""
+    if offset + 2 > len(data):
+        return None
+    count = struct.unpack(endian + 'H', data[offset:offset + 2])[0]
+    exif_offset = None
+    pos = offset + 2
+    for _ in range(count):
+        entry = data[pos:pos + 12]
+        if len(entry) < 12:
+            break
+        tag, typ, n = struct.unpack(endian + 'HHI', entry[:8])
+        if tag == TAG_EXIF_IFD:
+            exif_offset = struct.unpack(endian + 'I', entry[8:12])[0]
+        elif tag in wanted and typ == 2:
+            # ASCII 类型：不超过 4 字节时内联存储，否则为偏移
+            if n <= 4:
+                raw = entry[8:8 + n]
+            else:
+                value_offset = struct.unpack(endian + 'I', entry[8:12])[0]
+                raw = data[value_offset:value_offset + n]
+            # 与 PIL 一致按 latin-1 解码
+            value = raw.split(b'\x00', 1)[0].decode('latin-1')
+            if value:
+                found[tag] = value
+        pos += 12
+    return exif_offset
@@ -1,28 +1,141 @@
 
 import os
-from PIL import Image
+import time
+
+# 目标格式 -> (PIL 格式名, 扩展名, 可作为来源的扩展名)
+CONVERT_TARGETS = {
+    'jpg': ('JPEG', '.jpg', frozenset({'.webp', '.png', '.bmp'})),
+    'webp': ('WEBP', '.webp', frozenset({'.jpg', '.jpeg', '.png', '.bmp'})),
+}
+
 
 def convert_webp_to_jpg(file_path, quality=90, delete_original=False):
     """
     将 WebP 图片转换为 JPG。
-    returns: new_file_path or None if failed
+    returns: new_file_path，不是 WebP 文件时返回 None
+    raises: OSError 转换失败（错误信息同 convert_image），由调用方报告
     """
     if not file_path.lower().endswith('.webp'):
         return None
-        
+
+    dir_name = os.path.dirname(file_path)
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    new_path = os.path.join(dir_name, f"{name}.jpg")
+
+    result = convert_image(file_path, new_path, target='jpg', quality=quality, delete_original=delete_original)
+    if result['error']:
+        raise OSError(f"无法转换 {file_path}: {result['error']}")
+    return new_path
+
+
+def convert_image(src, dst, target='jpg', quality=90, delete_original=False):
+    """
+    转换单个文件。先写入同目录下的临时文件，再原子地替换为 dst，
+    中途失败不会留下不完整的目标文件。
+    定义为模块级函数，以便在进程池中调用。
+    returns: dict {src, dst, error, seconds, bytes_in, bytes_out}
+    """
+    import uuid
+    from PIL import Image
+
+    start = time.perf_counter()
+    result = {"src": src, "dst": dst, "error": None, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0}
+    pil_format = CONVERT_TARGETS[target][0]
+    tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.{uuid.uuid4().hex[:8]}.tmp")
     try:
-        dir_name = os.path.dirname(file_path)
-        name = os.path.splitext(os.path.basename(file_path))[0]
-        new_path = os.path.join(dir_name, f"{name}.jpg")
-        
-        with Image.open(file_path) as img:
-            rgb_im = img.convert('RGB')
-            rgb_im.save(new_path, quality=quality)
-            
-        if delete_original:
-            os.remove(file_path)
-            
-        return new_path
+        if os.path.exists(dst) and os.path.normcase(os.path.abspath(dst)) != os.path.normcase(os.path.abspath(src)):
+            raise FileExistsError(f"目标文件已存在: {dst}")
+        result["bytes_in"] = os.path.getsize(src)
+
+        with Image.open(src) as img:
+            if pil_format == 'JPEG' or img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGB')
+            img.save(tmp, format=pil_format, quality=quality)
+
+        os.replace(tmp, dst)
+        result["bytes_out"] = os.path.getsize(dst)
+        if delete_original and dst != src:
+            os.remove(src)
     except Exception as e:
-        print(f"Error converting {file_path}: {e}")
-        return None
+        result["error"] = str(e)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def staging_path(dst):
+    """转换结果在重命名之前的暂存位置：dst 所在目录下的隐藏文件"""
+    import uuid
+    return os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.{uuid.uuid4().hex[:8]}.staged")
+
+
+def _convert_job(job):
+    src, dst, target, quality, delete_original = job
+    return convert_image(src, dst, target, quality, delete_original)
+
+
+def convert_batch(jobs, target='jpg', quality=90, delete_original=False,
+                  workers=None, max_in_flight=None, progress_callback=None):
+    """
+    使用进程池批量转换。
+    jobs: list of (src, dst)
+    max_in_flight: 同时提交给进程池的任务上限（默认为 workers 的 2 倍），
+                   任务和结果不会一次性全部堆积在内存中
+    progress_callback(done, total, result): 每完成一个文件调用一次
+    returns: dict {results, seconds, files_per_sec, bytes_in, bytes_out, errors}
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    jobs = list(jobs)
+    total = len(jobs)
+    results = []
+
+    start = time.perf_counter()
+    pending_jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for src, dst in pending_jobs:
+            in_flight.add(pool.submit(_convert_job, (src, dst, target, quality, delete_original)))
+            if len(in_flight) >= max_in_flight:
+                break
+
+        while in_flight:
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                results.append(result)
+                if progress_callback is not None:
+                    progress_callback(len(results), total, result)
+            # 补充新任务，保持在上限以内
+            for src, dst in pending_jobs:
+                in_flight.add(pool.submit(_convert_job, (src, dst, target, quality, delete_original)))
+                if len(in_flight) >= max_in_flight:
+                    break
+
+    seconds = time.perf_counter() - start
+    return {
+        "results": results,
+        "seconds": seconds,
+        "files_per_sec": total / seconds if seconds > 0 else 0.0,
+        "bytes_in": sum(r["bytes_in"] for r in results),
+        "bytes_out": sum(r["bytes_out"] for r in results),
+        "errors": sum(1 for r in results if r["error"]),
+    }
+
+
+def conversion_jobs(preview_data):
+    """
+    从预览数据中取出转换任务。
+    RenamerEngine 在 rules['convert_to'] 下为需要转换的项设置 'convert' 字段，
+    其新文件名已使用目标扩展名。转换结果先写到 staging_path(dst)，
+    再由 FileProcessor.execute_rename 与其他重命名一起移到 dst。
+    returns: list of (src, dst)
+    """
+    jobs = []
+    for item in preview_data:
+        if item.get('convert') and item['status'] == "OK":
+            jobs.append((item['path'], os.path.join(os.path.dirname(item['path']), item['new'])))
+    return jobs
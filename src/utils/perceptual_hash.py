@@ -0,0 +1,348 @@
+"""
+感知哈希与近似重复分组。
+
+图片先用 PIL 的 draft()（JPEG 在解码时按 1/2、1/4、1/8 缩小）与 reduce（resize 的 reducing_gap）
+缩成很小的灰度图，再按批用 NumPy 计算 64 位的 dHash 或 pHash；
+分组使用多索引哈希（HammingIndex），不做两两比较；阈值较大、索引不再划算时改为分块两两比较。
+按批处理，内存占用只与 batch_size 有关，与图片数量无关（每张图片最终只保留一个整数）。
+"""
+import math
+
+# 算法 -> 缩略图尺寸 (宽, 高)
+ALGORITHMS = {
+    'dhash': (9, 8),
+    'phash': (32, 32),
+}
+DEFAULT_ALGORITHM = 'dhash'
+# 默认的相似阈值（64 位中不同的位数）
+DEFAULT_THRESHOLD = 6
+BATCH_SIZE = 512
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def load_gray(path, size):
+    """
+    把图片缩成 size (宽, 高) 的灰度图。
+    draft() 让 JPEG 直接以缩小的尺寸解码；其余格式由 resize 的 reducing_gap 先整数倍 reduce 再插值。
+    returns: bytes（宽 x 高 个像素），无法读取时返回 None
+    """
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            img.draft('L', (size[0] * 4, size[1] * 4))
+            img = img.convert('L')
+            return img.resize(size, Image.BOX, reducing_gap=2.0).tobytes()
+    except Exception:
+        return None
+
+
+def dhash_batch(pixels):
+    """
+    pixels: (N, 8, 9) 的 uint8 数组
+    returns: 长度为 N 的 uint64 数组，每位表示相邻像素是否变亮
+    """
+    np = _numpy()
+    bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    return _pack(np, bits.reshape(len(pixels), 64))
+
+
+_DCT_MATRIX = None
+
+
+def _dct_matrix(np, n=32):
+    global _DCT_MATRIX
+    if _DCT_MATRIX is None:
+        k = np.arange(n)[:, None]
+        i = np.arange(n)[None, :]
+        matrix = np.cos(math.pi * (2 * i + 1) * k / (2 * n)) * math.sqrt(2 / n)
+        matrix[0] /= math.sqrt(2)
+        _DCT_MATRIX = matrix.astype(np.float32)
+    return _DCT_MATRIX
+
+
+def phash_batch(pixels):
+    """
+    pixels: (N, 32, 32) 的 uint8 数组
+    returns: 长度为 N 的 uint64 数组。对整批做二维 DCT，取左上角 8x8 低频系数与其中位数（不含直流分量）比较
+    """
+    np = _numpy()
+    d = _dct_matrix(np)
+    coeffs = d @ pixels.astype(np.float32) @ d.T
+    low = coeffs[:, :8, :8].reshape(len(pixels), 64)
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    return _pack(np, low > median)
+
+
+def _pack(np, bits):
+    # (N, 64) 的布尔数组 -> (N,) 的 uint64，第一位为最高位
+    return np.packbits(bits, axis=1).view('>u8').reshape(len(bits)).astype(np.uint64)
+
+
+def _dhash_pure(data):
+    # 没有 NumPy 时的 dHash
+    value = 0
+    for row in range(8):
+        base = row * 9
+        for col in range(8):
+            value = (value << 1) | (data[base + col + 1] > data[base + col])
+    return value
+
+
+def perceptual_hashes(paths, algorithm=DEFAULT_ALGORITHM, max_workers=4, batch_size=BATCH_SIZE,
+                      progress_callback=None):
+    """
+    计算一组图片的 64 位感知哈希。解码在线程池中进行，哈希按批向量化计算。
+    progress_callback(done, total) 每批调用一次；抛出的异常会中止计算（用于取消）。
+    returns: dict, path -> int（无法读取的图片为 None）
+    raises: ValueError 未知的算法；RuntimeError pHash 需要 NumPy
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"未知的感知哈希算法: {algorithm}（可用: {', '.join(ALGORITHMS)}）")
+    size = ALGORITHMS[algorithm]
+    np = _numpy()
+    if np is None and algorithm != 'dhash':
+        raise RuntimeError("pHash 需要安装 numpy")
+
+    paths = list(paths)
+    total = len(paths)
+    result = {}
+    pool = None
+    if max_workers > 1 and total > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for start in range(0, total, batch_size):
+            batch = paths[start:start + batch_size]
+            if pool is not None:
+                decoded = list(pool.map(load_gray, batch, [size] * len(batch)))
+            else:
+                decoded = [load_gray(p, size) for p in batch]
+            ok = [i for i, data in enumerate(decoded) if data is not None]
+            for path in batch:
+                result[path] = None
+            if ok:
+                if np is None:
+                    values = [_dhash_pure(decoded[i]) for i in ok]
+                else:
+                    pixels = np.frombuffer(b"".join(decoded[i] for i in ok), dtype=np.uint8)
+                    pixels = pixels.reshape(len(ok), size[1], size[0])
+                    hasher = dhash_batch if algorithm == 'dhash' else phash_batch
+                    values = hasher(pixels).tolist()
+                for i, value in zip(ok, values):
+                    result[batch[i]] = int(value)
+            if progress_callback is not None:
+                progress_callback(min(start + batch_size, total), total)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    return result
+
+
+try:
+    _popcount = int.bit_count # Python 3.10+
+except AttributeError:
+    def _popcount(x):
+        return bin(x).count("1")
+
+
+class HammingIndex:
+    """
+    64 位哈希的多索引哈希 (multi-index hashing)。
+    把哈希分成 SEGMENTS 段，每段一个 dict。若两个哈希的距离不超过 r，
+    由抽屉原理至少有一段的距离不超过 r // SEGMENTS，因此只需查找每段附近的少量键，
+    再逐个核对候选的完整距离。
+    每段的掩码数随 r // SEGMENTS 组合增长，超过 MAX_RADIUS 时不再建索引，search 逐个比较。
+    """
+    SEGMENTS = 4
+    BITS = 16
+    # 每段查找半径的上限：半径 2 时每段 137 个掩码，半径 3 时已有 697 个，
+    # 阈值 32（半径 8）时约 4 万个，比逐个比较更慢
+    MAX_RADIUS = 2
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.hashes = []
+        self._tables = [{} for _ in range(self.SEGMENTS)]
+        radius = threshold // self.SEGMENTS
+        self._masks = None
+        if radius <= self.MAX_RADIUS:
+            # 每段中距离不超过 radius 的所有异或掩码
+            masks = [0]
+            for bits in range(1, radius + 1):
+                masks.extend(_masks_with_bits(self.BITS, bits))
+            self._masks = masks
+
+    def _segments(self, value):
+        mask = (1 << self.BITS) - 1
+        return [(value >> (self.BITS * k)) & mask for k in range(self.SEGMENTS)]
+
+    def add(self, value):
+        """returns: 新哈希的编号"""
+        index = len(self.hashes)
+        self.hashes.append(value)
+        if self._masks is None:
+            return index
+        for table, segment in zip(self._tables, self._segments(value)):
+            table.setdefault(segment, []).append(index)
+        return index
+
+    def search(self, value):
+        """returns: 距离不超过 threshold 的哈希编号集合"""
+        hashes = self.hashes
+        threshold = self.threshold
+        if self._masks is None:
+            return {i for i, other in enumerate(hashes) if _popcount(other ^ value) <= threshold}
+        found = set()
+        seen = set()
+        for table, segment in zip(self._tables, self._segments(value)):
+            for mask in self._masks:
+                for index in table.get(segment ^ mask, ()):
+                    if index in seen:
+                        continue
+                    seen.add(index)
+                    if _popcount(hashes[index] ^ value) <= threshold:
+                        found.add(index)
+        return found
+
+
+def _masks_with_bits(width, bits):
+    from itertools import combinations
+    for positions in combinations(range(width), bits):
+        mask = 0
+        for p in positions:
+            mask |= 1 << p
+        yield mask
+
+
+# 每块候选对的上限，限制向量化比较时的内存占用
+PAIR_CHUNK = 1 << 20
+
+
+def _popcount64(np, values):
+    if hasattr(np, 'bitwise_count'): # NumPy 2.0+
+        return np.bitwise_count(values)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8)].reshape(len(values), 8).sum(axis=1)
+
+
+def _similar_pairs(np, values, threshold):
+    """
+    HammingIndex 的向量化版本：对每一段与每个掩码，用排序后的分桶表一次找出所有候选对，
+    再批量计算完整距离。候选对按 PAIR_CHUNK 分块生成，内存占用有上限。
+    yields: (a, b) 两个编号数组，a < b 且距离不超过 threshold
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    n = len(values)
+    segments, bits = HammingIndex.SEGMENTS, HammingIndex.BITS
+    if threshold // segments > HammingIndex.MAX_RADIUS:
+        yield from _similar_pairs_brute(np, values, threshold)
+        return
+    masks = [0]
+    for count in range(1, threshold // segments + 1):
+        masks.extend(_masks_with_bits(bits, count))
+    for k in range(segments):
+        seg = ((values >> np.uint64(bits * k)) & np.uint64((1 << bits) - 1)).astype(np.int64)
+        order = np.argsort(seg, kind='stable')
+        # 每个段值在排序后数组中的起点与个数
+        bucket_counts = np.bincount(seg, minlength=1 << bits)
+        bucket_starts = np.cumsum(bucket_counts) - bucket_counts
+        for mask in masks:
+            query = seg ^ mask
+            left = bucket_starts[query]
+            counts = bucket_counts[query]
+            ends = np.cumsum(counts)
+            start = 0
+            while start < n:
+                # 本块包含的查询：候选对总数不超过 PAIR_CHUNK（单个查询超过时单独成块）
+                base = ends[start - 1] if start else 0
+                stop = max(int(np.searchsorted(ends, base + PAIR_CHUNK, 'right')), start + 1)
+                chunk_counts = counts[start:stop]
+                total = int(chunk_counts.sum())
+                if total:
+                    a = np.repeat(np.arange(start, stop), chunk_counts)
+                    offsets = np.arange(total) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+                    b = order[np.repeat(left[start:stop], chunk_counts) + offsets]
+                    keep = a < b
+                    a, b = a[keep], b[keep]
+                    keep = _popcount64(np, values[a] ^ values[b]) <= threshold
+                    if keep.any():
+                        yield a[keep], b[keep]
+                start = stop
+
+
+def _similar_pairs_brute(np, values, threshold):
+    """
+    分块两两比较，用于索引不划算的大阈值。每块比较 PAIR_CHUNK 对左右，内存占用有上限。
+    yields: 同 _similar_pairs
+    """
+    n = len(values)
+    start = 0
+    while start < n - 1:
+        # 本块的行 i 与其后的所有 j > i 比较
+        rows = max(1, PAIR_CHUNK // (n - start))
+        stop = min(n - 1, start + rows)
+        a = np.repeat(np.arange(start, stop), n - 1 - np.arange(start, stop))
+        b = np.concatenate([np.arange(i + 1, n) for i in range(start, stop)])
+        keep = _popcount64(np, values[a] ^ values[b]) <= threshold
+        if keep.any():
+            yield a[keep], b[keep]
+        start = stop
+
+
+def group_similar(hashes, threshold=DEFAULT_THRESHOLD):
+    """
+    按汉明距离分组（传递闭包：a~b 且 b~c 时三者同组）。
+    hashes: 哈希列表，None 表示无法计算，单独成组
+    returns: 与 hashes 一一对应的组号（从 1 开始，按首次出现的顺序编号）
+    """
+    # 完全相同的哈希只入索引一次
+    unique = {}
+    for value in hashes:
+        if value is not None and value not in unique:
+            unique[value] = len(unique)
+
+    parent = list(range(len(unique)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        a, b = find(i), find(j)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    np = _numpy()
+    if np is not None:
+        for a, b in _similar_pairs(np, list(unique), threshold):
+            for i, j in zip(a.tolist(), b.tolist()):
+                union(i, j)
+    else:
+        index = HammingIndex(threshold)
+        for value in unique:
+            i = index.add(value)
+            for j in index.search(value):
+                if j != i:
+                    union(i, j)
+
+    groups = []
+    numbers = {}
+    for value in hashes:
+        if value is None:
+            key = object()
+        else:
+            key = find(unique[value])
+        number = numbers.get(key)
+        if number is None:
+            number = numbers[key] = len(numbers) + 1
+        groups.append(number)
+    return groups
@@ -0,0 +1,202 @@
+"""
+预览列表的缩略图：生成、磁盘缓存与内存 LRU。
+
+生成时用 PIL 的 draft() 让 JPEG 直接以 1/2、1/4、1/8 的尺寸解码，再由 thumbnail() 缩到目标大小，
+不解码原尺寸的图片。结果以 JPEG 保存在磁盘缓存中，键为 (路径, mtime, 大小, inode, 缩略图尺寸)，
+文件变化后自动失效。界面中解码好的图片放在按字节预算淘汰的 LRUCache 中。
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+THUMB_SIZE = (40, 40)
+# 内存 LRU 的默认预算（字节）
+DEFAULT_MEMORY_BUDGET = 32 * 1024 * 1024
+# 磁盘缓存的默认上限（字节），超过时按修改时间删除最旧的文件
+DEFAULT_DISK_BUDGET = 256 * 1024 * 1024
+DISK_QUALITY = 85
+
+
+def make_thumbnail(path, size=THUMB_SIZE):
+    """
+    生成缩略图。
+    returns: (mode, (宽, 高), 像素 bytes)，无法读取时返回 None
+    """
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            img.draft('RGB', size)
+            img = img.convert('RGB')
+            img.thumbnail(size, Image.BILINEAR, reducing_gap=2.0)
+            return img.mode, img.size, img.tobytes()
+    except Exception:
+        return None
+
+
+def thumbnail_cost(thumb):
+    """缩略图在内存中大约占用的字节数（界面中的图片按每像素 4 字节计）"""
+    if thumb is None:
+        return 64
+    width, height = thumb[1]
+    return width * height * 4
+
+
+class LRUCache:
+    """
+    按字节预算淘汰的 LRU 缓存。每项的大小由 put 时给出的 cost 决定，
+    总和超过 budget 时淘汰最久未使用的项。只应在一个线程（界面线程）中使用。
+    """
+    def __init__(self, budget=DEFAULT_MEMORY_BUDGET):
+        self.budget = budget
+        self.used = 0
+        self.evictions = 0
+        self._items = OrderedDict() # key -> (value, cost)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        entry = self._items.get(key)
+        if entry is None:
+            return default
+        self._items.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, cost):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.used -= old[1]
+        self._items[key] = (value, cost)
+        self.used += cost
+        # 至少保留刚放入的一项
+        while self.used > self.budget and len(self._items) > 1:
+            _, (_, evicted_cost) = self._items.popitem(last=False)
+            self.used -= evicted_cost
+            self.evictions += 1
+
+    def clear(self):
+        self._items.clear()
+        self.used = 0
+
+
+class ThumbnailStore:
+    """
+    缩略图的磁盘缓存。load() 先查磁盘缓存，未命中时生成并写入。
+    可以在多个线程中同时调用。
+    cache_dir 为 None 时不使用磁盘缓存。
+    """
+    def __init__(self, cache_dir=None, size=THUMB_SIZE, disk_budget=DEFAULT_DISK_BUDGET):
+        self.cache_dir = cache_dir
+        self.size = tuple(size)
+        self.disk_budget = disk_budget
+        # 统计计数器
+        self.disk_hits = 0
+        self.generated = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_dir():
+        """默认缓存位置: ~/.batch_image_renamer/thumbnails"""
+        return os.path.join(os.path.expanduser("~"), ".batch_image_renamer", "thumbnails")
+
+    def key(self, path, st=None):
+        """
+        returns: (绝对路径, mtime_ns, 大小, inode, 宽, 高)，文件不存在时返回 None。
+        加入 inode 是为了区分互换名称的两个文件（重命名不改变 mtime 与大小）
+        """
+        try:
+            if st is None:
+                st = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size, st.st_ino) + self.size
+
+    def cache_path(self, key):
+        digest = hashlib.sha1("\0".join(map(str, key)).encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".jpg")
+
+    def load(self, path):
+        """returns: 同 make_thumbnail"""
+        key = self.key(path)
+        if key is None:
+            return None
+        if self.cache_dir is None:
+            return self._generate(path)
+        cache_path = self.cache_path(key)
+        thumb = self._read(cache_path)
+        if thumb is not None:
+            with self._lock:
+                self.disk_hits += 1
+            return thumb
+        thumb = self._generate(path)
+        if thumb is not None:
+            self._write(cache_path, thumb)
+        return thumb
+
+    def _generate(self, path):
+        thumb = make_thumbnail(path, self.size)
+        with self._lock:
+            self.generated += 1
+        return thumb
+
+    @staticmethod
+    def _read(cache_path):
+        from PIL import Image
+        try:
+            with Image.open(cache_path) as img:
+                img = img.convert('RGB')
+                return img.mode, img.size, img.tobytes()
+        except Exception:
+            return None
+
+    @staticmethod
+    def _write(cache_path, thumb):
+        from PIL import Image
+        mode, size, data = thumb
+        tmp = f"{cache_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            Image.frombytes(mode, size, data).save(tmp, format='JPEG', quality=DISK_QUALITY)
+            os.replace(tmp, cache_path)
+        except Exception:
+            # 缓存写入失败不影响显示
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def prune(self):
+        """
+        磁盘缓存超过 disk_budget 时，按修改时间删除最旧的文件。
+        returns: 删除的文件数
+        """
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return 0
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        if total > self.disk_budget:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.disk_budget:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+        return removed
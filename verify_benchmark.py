@@ -0,0 +1,40 @@
+import os
+import shutil
+import unittest
+import benchmark
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = os.path.abspath("test_benchmark")
+        if os.path.exists(self.work_dir):
+            shutil.rmtree(self.work_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.work_dir):
+            shutil.rmtree(self.work_dir)
+
+    def test_small_run_restores_corpus(self):
+        report = benchmark.run([40], self.work_dir, repeat=1)
+        expected = {'scan', 'preview.rules_only', 'execute', 'undo', 'execute.sidecar', 'undo.sidecar'}
+        expected.update(f'preview.{mode}' for mode in benchmark.PREVIEW_MODES)
+        self.assertEqual(set(report['results']), {f"40/{name}" for name in expected})
+        self.assertEqual(set(report['memory']), {"40/preview", "40/preview.sidecar"})
+        self.assertEqual(report['memory']["40/preview"]['entries'], 40)
+
+        # 撤回后语料恢复原状，可以直接复用
+        corpus = os.path.join(self.work_dir, "corpus-40")
+        names = sorted(os.listdir(corpus))
+        self.assertEqual(len(names), 40 + 10 + 1)
+        self.assertEqual(names[0], benchmark.MARKER)
+        self.assertEqual(benchmark.make_corpus(corpus, 40), corpus)
+        self.assertEqual(sorted(os.listdir(corpus)), names)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": {"1000/scan": 0.010, "1000/execute": 0.100, "1000/undo": 0.001}}
+        current = {"results": {"1000/scan": 0.011, "1000/execute": 0.150, "1000/undo": 0.004, "1000/new": 1.0}}
+        regressions = benchmark.compare(baseline, current, threshold=0.2)
+        # undo 两边都低于 5ms，视为噪声
+        self.assertEqual([r[0] for r in regressions], ["1000/execute"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+import unittest
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_cli"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+        for name in ["b.jpg", "a.png", "notes.txt"]:
+            with open(os.path.join(self.test_dir, name), 'w') as fh:
+                fh.write("datum")
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _run(self, *args, code=None):
+        code = code or "import sys; from src.cli import main; sys.exit(main(sys.argv[1:]))"
+        proc = subprocess.run([sys.executable, "-c", code, *args], capture_output=True, text=True)
+        return proc.returncode, [json.loads(line) for line in proc.stdout.splitlines()]
+
+    def test_dry_run_then_rename(self):
+        rc, events = self._run(self.test_dir, "--prefix", "Cron", "--padding", "2", "--dry-run")
+        self.assertEqual(rc, 0)
+        self.assertEqual(events[0], {"event": "scan", "files": 2})
+        self.assertEqual([e['new'] for e in events if e['event'] == "preview"], ["Cron_01.png", "Cron_02.jpg"])
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ["a.png", "b.jpg", "notes.txt"])
+
+        rc, events = self._run(self.test_dir, "--prefix", "Cron", "--padding", "2", "--no-journal")
+        self.assertEqual(rc, 0)
+        self.assertEqual(events[-1]['renamed'], 2)
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ["Cron_01.png", "Cron_02.jpg", "notes.txt"])
+
+    def test_sequence_mode_skips_heavy_imports(self):
+        code = ("import sys; from src.cli import main; main(sys.argv[1:]); "
+                "print(__import__('json').dumps({'event': 'modules', "
+                "'pil': 'PIL' in sys.modules, 'tk': 'tkinter' in sys.modules}))")
+        rc, events = self._run(self.test_dir, "--dry-run", code=code)
+        self.assertEqual(events[-1], {"event": "modules", "pil": False, "tk": False})
+
+    def test_startup_faster_than_gui(self):
+        rc, events = self._run("--startup-report")
+        report = events[0]
+        print("\nStartup:", report)
+        self.assertLess(report['cli_ms'], report['gui_ms'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import unittest
+from src.core.renamer import RenamerEngine
+from src.core.file_ops import FileProcessor
+
+class TestCollisions(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath("test_collisions")
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _touch(self, *names):
+        for name in names:
+            with open(os.path.join(self.test_dir, name), 'w') as fh:
+                fh.write(name)
+        return [os.path.join(self.test_dir, n) for n in names]
+
+    def _preview(self, files, **rules):
+        engine = RenamerEngine()
+        engine.set_rules(dict({'mode': 'regex'}, **rules))
+        return engine.generate_preview(files)
+
+    def test_duplicates_and_existing_targets_flagged(self):
+        files = self._touch("a1.jpg", "a2.jpg", "b1.jpg", "b2.jpg")
+        # 批次外的已有文件
+        self._touch("keep.jpg")
+
+        preview = self._preview(files, regex_pattern=r'^(a|b)\d', regex_replacement=r'\1')
+        by_name = {item['original']: item for item in preview}
+        self.assertEqual(by_name['a1.jpg']['status'], "OK")
+        self.assertEqual(by_name['a2.jpg']['status'], "冲突")
+        self.assertIn("a1.jpg", by_name['a2.jpg']['conflict'])
+        self.assertEqual(by_name['b2.jpg']['status'], "冲突")
+
+        preview = self._preview(files[:1], regex_pattern='a1', regex_replacement='keep')
+        self.assertEqual(preview[0]['status'], "冲突")
+        self.assertIn("keep.jpg", preview[0]['conflict'])
+
+        # 冲突项被跳过，其余正常执行，不会覆盖任何文件
+        count, error = FileProcessor().execute_rename(
+            self._preview(files, regex_pattern=r'^(a)\d', regex_replacement=r'\1'))
+        self.assertEqual((count, error), (1, None))
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ["a.jpg", "a2.jpg", "b1.jpg", "b2.jpg", "keep.jpg"])
+
+    def test_chain_and_swap_are_not_clashes(self):
+        files = self._touch("1.jpg", "2.jpg", "3.jpg")
+        preview = self._preview(files, mode='sequence', prefix='x', start_index=1)
+        self.assertTrue(all(item['status'] == "OK" for item in preview))
+
+        # 2 -> 3, 3 -> 4：目标 3.jpg 由另一个源文件空出
+        engine = RenamerEngine()
+        engine.set_rules({'mode': 'template', 'template': "{seq}{ext}", 'start_index': 2})
+        preview = engine.generate_preview(files[1:])
+        self.assertEqual([(i['new'], i['status']) for i in preview], [("2.jpg", "无变化"), ("3.jpg", "无变化")])
+        engine.set_rules({'mode': 'template', 'template': "{seq}{ext}", 'start_index': 3})
+        preview = engine.generate_preview(files[1:])
+        self.assertEqual([i['status'] for i in preview], ["OK", "OK"])
+
+        # 1 -> 2 但 2 保持不变：冲突
+        preview = self._preview(files[:2], regex_pattern=r'^1', regex_replacement='2')
+        self.assertEqual(preview[0]['status'], "冲突")
+
+    def test_auto_resolve_with_sidecars(self):
+        files = self._touch("a1.jpg", "a2.jpg", "b.jpg")
+        self._touch("a2.xmp", "a.xmp")
+        preview = self._preview(files, regex_pattern=r'^(a)\d', regex_replacement=r'\1',
+                                auto_resolve=True, sync_sidecar=True)
+        by_name = {item['original']: item for item in preview}
+        # a2 与 a1 重名，自动改为 a_1，附属文件跟随；a.xmp 不属于批次，保持不变
+        self.assertEqual(by_name['a1.jpg']['new'], "a.jpg")
+        self.assertEqual(by_name['a2.jpg']['new'], "a_1.jpg")
+        self.assertEqual(by_name['a2.jpg']['sidecars'], [("a2.xmp", "a_1.xmp")])
+
+        count, error = FileProcessor().execute_rename(preview, sync_sidecar=True)
+        self.assertIsNone(error)
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ["a.jpg", "a.xmp", "a_1.jpg", "a_1.xmp", "b.jpg"])
+
+    def test_execute_refuses_to_overwrite(self):
+        files = self._touch("a.jpg", "b.jpg")
+        preview = [{"original": "a.jpg", "new": "b.jpg", "path": files[0], "status": "OK"}]
+        count, error = FileProcessor().execute_rename(preview)
+        self.assertEqual(count, 0)
+        self.assertIn("b.jpg", error)
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ["a.jpg", "b.jpg"])
+
+if __name__ == '__main__':
+    unittest.main()
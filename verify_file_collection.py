@@ -0,0 +1,49 @@
+import os
+import unittest
+from src.core.file_collection import FileCollection
+from src.core.renamer import RenamerEngine
+
+class TestFileCollection(unittest.TestCase):
+    def setUp(self):
+        self.a = os.path.join("dir_a", "1.jpg")
+        self.b = os.path.join("dir_b", "2.jpg")
+        self.c = os.path.join("dir_a", "3.jpg")
+
+    def test_ordered_unique_and_grouped(self):
+        files = FileCollection([self.a, self.b])
+        self.assertTrue(files.add(self.c))
+        self.assertFalse(files.add(self.a))
+        self.assertEqual(list(files), [self.a, self.b, self.c])
+        self.assertIn(self.b, files)
+        self.assertEqual(files.by_directory(), {"dir_a": [self.a, self.c], "dir_b": [self.b]})
+
+    def test_bulk_operations(self):
+        files = FileCollection([self.a, self.b, self.c])
+        self.assertEqual(files.remove_directory("dir_a"), 2)
+        self.assertEqual(list(files), [self.b])
+
+        files.replace([self.c, self.a, self.c])
+        self.assertEqual(list(files), [self.c, self.a])
+        self.assertEqual(files.filter(lambda p: p.endswith("1.jpg")), 1)
+        self.assertEqual(files.directories(), ["dir_a"])
+
+    def test_snapshot_reused_until_modified(self):
+        files = FileCollection([self.a])
+        snap = files.snapshot()
+        self.assertIs(files.snapshot(), snap)
+        files.add(self.b)
+        self.assertEqual(files.snapshot(), (self.a, self.b))
+
+    def test_engine_accepts_collection(self):
+        engine = RenamerEngine()
+        engine.set_rules({'mode': 'sequence', 'prefix': 'X', 'padding': 1})
+        files = FileCollection([self.b, self.a])
+        preview = engine.generate_preview(files)
+        self.assertEqual([p['new'] for p in preview], ["X_1.jpg", "X_2.jpg"])
+
+        files.discard(self.a)
+        preview = engine.generate_preview(files)
+        self.assertEqual([p['path'] for p in preview], [self.b])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import hashlib
+import unittest
+from unittest.mock import patch
+from src.core.renamer import RenamerEngine
+from src.core.metadata_cache import MetadataCache
+from src.core.file_ops import FileProcessor
+from src.utils.file_hash import FileHasher, hash_file
+
+class TestFileHash(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_file_hash"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+        contents = {
+            "a.jpg": b"alpha" * 1000,
+            "b.jpg": b"beta" * 1000,
+            "copy_of_a.jpg": b"alpha" * 1000,
+            "same_size_as_a.jpg": b"ALPHA" * 1000,
+            "unique.jpg": b"x" * 7,
+        }
+        self.files = {}
+        for name, data in contents.items():
+            path = os.path.join(self.test_dir, name)
+            with open(path, 'wb') as fh:
+                fh.write(data)
+            self.files[name] = path
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_streaming_hash_and_unique_sizes_skipped(self):
+        path = self.files["a.jpg"]
+        self.assertEqual(hash_file(path, buffer_size=64), hashlib.sha1(b"alpha" * 1000).hexdigest())
+
+        hasher = FileHasher(max_workers=4)
+        groups = hasher.find_duplicates(sorted(self.files.values()))
+        self.assertEqual(groups, [[self.files["a.jpg"], self.files["copy_of_a.jpg"]]])
+        # b.jpg 与 unique.jpg 的大小唯一，不计算哈希
+        self.assertEqual(hasher.hashed, 3)
+
+    def test_hash_mode_flags_duplicates(self):
+        cache = MetadataCache(os.path.join(self.test_dir, "cache.sqlite"))
+        files = [p for p in self.files.values()]
+        engine = RenamerEngine(metadata_cache=cache)
+        engine.set_rules({'mode': 'metadata_hash', 'prefix': 'H_'})
+        preview = engine.generate_preview(files)
+        by_name = {item['original']: item for item in preview}
+
+        digest = hashlib.sha1(b"alpha" * 1000).hexdigest()
+        self.assertEqual(by_name["a.jpg"]['new'], f"H_{digest[:10]}.jpg")
+        self.assertEqual(by_name["a.jpg"]['status'], "OK")
+        self.assertEqual(by_name["copy_of_a.jpg"]['status'], "重复")
+        self.assertEqual(by_name["copy_of_a.jpg"]['duplicate'], "a.jpg")
+        self.assertEqual(cache.stats()['hash_entries'], 5)
+
+        count, error = FileProcessor().execute_rename(preview)
+        self.assertEqual((count, error), (4, None))
+        self.assertIn("copy_of_a.jpg", os.listdir(self.test_dir))
+
+        # 重命名后再次检查：按 (设备, inode, 大小, mtime) 缓存，不再读取文件内容
+        renamed = [os.path.join(self.test_dir, n) for n in os.listdir(self.test_dir) if n.endswith(".jpg")]
+        engine = RenamerEngine(metadata_cache=cache)
+        engine.set_rules({'mode': 'template', 'template': "{hash:4}_{seq}{ext}"})
+        with patch('src.utils.file_hash.hash_file', side_effect=AssertionError("hashed")):
+            preview = engine.generate_preview(renamed)
+        self.assertEqual(sum(1 for item in preview if item['status'] == "重复"), 1)
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
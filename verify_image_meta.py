@@ -0,0 +1,51 @@
+import os
+import shutil
+import unittest
+from PIL import Image
+from src.utils.image_meta import read_header_meta
+
+class TestHeaderMeta(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_image_meta"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.exif = Image.Exif()
+        self.exif[272] = "Test Camera"
+        self.exif[306] = "2021:01:02 03:04:05"
+        self.exif.get_ifd(0x8769)[36867] = "2020:05:20 10:11:12"
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _save(self, name, size, **kwargs):
+        path = os.path.join(self.test_dir, name)
+        Image.new('RGB', size, 'green').save(path, **kwargs)
+        return path
+
+    def test_formats_with_exif(self):
+        for name, kwargs in [("a.jpg", {}), ("b.png", {}), ("c.webp", {}), ("d.webp", {'lossless': True})]:
+            path = self._save(name, (37, 21), exif=self.exif.tobytes(), **kwargs)
+            meta = read_header_meta(path)
+            self.assertEqual((meta['width'], meta['height']), (37, 21), name)
+            self.assertEqual(meta['date'], "2020:05:20 10:11:12", name)
+            self.assertEqual(meta['model'], "Test Camera", name)
+
+    def test_formats_without_exif(self):
+        for name in ["a.jpg", "b.png", "c.webp", "d.gif", "e.bmp"]:
+            path = self._save(name, (50, 7))
+            meta = read_header_meta(path)
+            self.assertEqual((meta['width'], meta['height']), (50, 7), name)
+            self.assertIsNone(meta['date'], name)
+            self.assertIsNone(meta['model'], name)
+
+    def test_unknown_format(self):
+        path = os.path.join(self.test_dir, "x.jpg")
+        with open(path, 'w') as fh:
+            fh.write("not an image")
+        self.assertIsNone(read_header_meta(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+import unittest
+from PIL import Image
+from src.utils.image_tools import convert_image, convert_batch, conversion_jobs, convert_webp_to_jpg, staging_path
+from src.core.renamer import RenamerEngine
+from src.core.file_ops import FileProcessor
+from src.core.journal import RenameJournal
+from src.core.rename_plan import plan_renames, apply_conversions
+
+class TestImageTools(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_image_tools"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _make(self, name, fmt, size=(16, 12)):
+        path = os.path.join(self.test_dir, name)
+        Image.new('RGB', size, 'red').save(path, format=fmt)
+        return path
+
+    def test_convert_is_atomic_and_refuses_overwrite(self):
+        src = self._make("a.webp", "WEBP")
+        dst = os.path.join(self.test_dir, "a.jpg")
+        result = convert_image(src, dst, delete_original=True)
+        self.assertIsNone(result['error'])
+        self.assertFalse(os.path.exists(src))
+        with Image.open(dst) as img:
+            self.assertEqual(img.format, "JPEG")
+
+        # 目标已存在时不覆盖，原文件保留，不留下临时文件
+        src = self._make("b.png", "PNG")
+        result = convert_image(src, dst, delete_original=True)
+        self.assertIsNotNone(result['error'])
+        self.assertTrue(os.path.exists(src))
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ["a.jpg", "b.png"])
+
+        # 旧接口保持不变
+        legacy = self._make("c.webp", "WEBP")
+        self.assertEqual(convert_webp_to_jpg(legacy), os.path.join(self.test_dir, "c.jpg"))
+        self.assertTrue(os.path.exists(legacy))
+        # 失败时抛出异常而不是打印
+        with self.assertRaises(OSError):
+            convert_webp_to_jpg(legacy)
+
+    def test_batch_bounded_in_flight(self):
+        jobs = []
+        for i in range(12):
+            src = self._make(f"img{i}.webp", "WEBP")
+            jobs.append((src, os.path.join(self.test_dir, f"img{i}.jpg")))
+        jobs.append((os.path.join(self.test_dir, "missing.webp"), os.path.join(self.test_dir, "missing.jpg")))
+
+        seen = []
+        report = convert_batch(jobs, workers=2, max_in_flight=3, delete_original=True,
+                               progress_callback=lambda done, total, r: seen.append((done, total)))
+        print(f"\nConvert: {report['files_per_sec']:.1f} files/s, {report['bytes_in']} -> {report['bytes_out']} bytes")
+        self.assertEqual(len(report['results']), 13)
+        self.assertEqual(report['errors'], 1)
+        self.assertEqual(seen[-1], (13, 13))
+        self.assertEqual(len([n for n in os.listdir(self.test_dir) if n.endswith(".jpg")]), 12)
+        self.assertFalse([n for n in os.listdir(self.test_dir) if n.endswith(".tmp")])
+
+    def test_rename_and_convert_in_one_pass(self):
+        self._make("x.webp", "WEBP")
+        self._make("y.jpg", "JPEG")
+        files = sorted(os.path.join(self.test_dir, n) for n in os.listdir(self.test_dir))
+
+        engine = RenamerEngine()
+        engine.set_rules({'mode': 'sequence', 'prefix': 'Trip', 'convert_to': 'jpg'})
+        preview = engine.generate_preview(files)
+        self.assertEqual([item['new'] for item in preview], ["Trip_1.jpg", "Trip_2.jpg"])
+        self.assertEqual([item.get('convert') for item in preview], ["jpg", None])
+        self.assertEqual(conversion_jobs(preview), [(files[0], os.path.join(self.test_dir, "Trip_1.jpg"))])
+
+    def test_cli_convert(self):
+        self._make("x.webp", "WEBP")
+        self._make("x.txt", "PNG")
+        self._make("y.jpg", "JPEG")
+        code = "import sys; from src.cli import main; sys.exit(main(sys.argv[1:]))"
+        proc = subprocess.run([sys.executable, "-c", code, self.test_dir, "--prefix", "Trip", "--convert", "jpg",
+                               "--sync-sidecar", "--no-journal", "--convert-workers", "2"],
+                              capture_output=True, text=True)
+        events = [json.loads(line) for line in proc.stdout.splitlines()]
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual([e['event'] for e in events if e['event'].startswith("convert")], ["convert", "convert_summary"])
+        self.assertEqual(events[-1]['converted'], 1)
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ["Trip_1.jpg", "Trip_1.txt", "Trip_2.jpg"])
+
+    def _staged_preview(self, renames):
+        # renames: (原名称, 新名称, 是否转换)。需要转换的项先转换到暂存文件（同 cli.run_conversions）
+        preview = []
+        for old, new, convert in renames:
+            path = os.path.join(self.test_dir, old)
+            item = {'original': old, 'new': new, 'path': path, 'status': "OK"}
+            if convert:
+                item['convert'] = 'jpg'
+                item['staged'] = staging_path(os.path.join(self.test_dir, new))
+                self.assertIsNone(convert_image(path, item['staged'])['error'])
+            preview.append(item)
+        return preview
+
+    def _snapshot(self):
+        result = {}
+        for name in os.listdir(self.test_dir):
+            with open(os.path.join(self.test_dir, name), 'rb') as fh:
+                result[name] = fh.read()
+        return result
+
+    def test_convert_into_chain_and_swap(self):
+        # 转换结果的目标是批次中另一个文件当前的名称：链 a.png -> b.jpg -> c.jpg，环路 x.png <-> y.jpg
+        self._make("a.png", "PNG", size=(10, 10))
+        self._make("b.jpg", "JPEG", size=(20, 20))
+        self._make("x.png", "PNG", size=(30, 30))
+        self._make("y.jpg", "JPEG", size=(40, 40))
+        before = self._snapshot()
+        preview = self._staged_preview([("a.png", "b.jpg", True), ("b.jpg", "c.jpg", False),
+                                        ("x.png", "y.jpg", True), ("y.jpg", "x.png", False)])
+
+        processor = FileProcessor(journal_dir=os.path.join(self.test_dir, "journal"))
+        count, err = processor.execute_rename(preview)
+        self.assertIsNone(err)
+        self.assertEqual(count, 4)
+        self.assertEqual(processor.last_plan.summary()["files"], 4)
+        os.rmdir(os.path.join(self.test_dir, "journal"))
+        self.assertEqual(sorted(n for n in os.listdir(self.test_dir) if not n.startswith(".")),
+                         ["b.jpg", "c.jpg", "x.png", "y.jpg"])
+        for name, fmt, size in [("b.jpg", "JPEG", (10, 10)), ("c.jpg", "JPEG", (20, 20)),
+                                ("y.jpg", "JPEG", (30, 30)), ("x.png", "JPEG", (40, 40))]:
+            with Image.open(os.path.join(self.test_dir, name)) as img:
+                self.assertEqual((img.format, img.size), (fmt, size))
+
+        # 撤回时原文件从备份恢复，转换结果被删除
+        count, err = processor.undo_last_operation()
+        self.assertEqual((count, err), (4, None))
+        self.assertEqual(self._snapshot(), before)
+
+    def test_rollback_restores_converted_originals(self):
+        self._make("a.png", "PNG", size=(10, 10))
+        self._make("b.jpg", "JPEG", size=(20, 20))
+        before = self._snapshot()
+        preview = self._staged_preview([("a.png", "b.jpg", True), ("b.jpg", "c.jpg", False)])
+        conversions = {item['path']: (item['staged'], item['path'] + ".orig") for item in preview if 'staged' in item}
+        plan = apply_conversions(plan_renames([(item['path'], os.path.join(self.test_dir, item['new']))
+                                               for item in preview]), conversions)
+        self.assertEqual(len(plan.steps), 3)
+        journal_dir = os.path.join(self.test_dir, "journal")
+        journal = RenameJournal.create(journal_dir, plan.steps, groups=plan.group_ids(), conversions=conversions)
+        # 原文件已移到备份后崩溃
+        for i, (src, dst, _) in enumerate(plan.steps[:2]):
+            os.rename(src, dst)
+            journal.mark_done(i)
+        journal._fh.close()
+
+        processor = FileProcessor(journal_dir=journal_dir)
+        count, err = processor.rollback_batch(processor.incomplete_batches()[0])
+        self.assertIsNone(err)
+        os.rmdir(journal_dir)
+        self.assertEqual(self._snapshot(), before)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import unittest
+from src.core.journal import RenameJournal
+from src.core.rename_plan import plan_renames
+from src.core.file_ops import FileProcessor
+
+class TestRenameJournal(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_journal"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        self.data_dir = os.path.join(self.test_dir, "photos")
+        self.journal_dir = os.path.join(self.test_dir, "journal")
+        os.makedirs(self.data_dir)
+
+        # 0->1->...->49 的链，外加一个交换环路
+        self.names = [f"{i}.jpg" for i in range(50)] + ["x.jpg", "y.jpg"]
+        for name in self.names:
+            with open(os.path.join(self.data_dir, name), 'w') as fh:
+                fh.write(name)
+        p = lambda n: os.path.join(self.data_dir, n)
+        self.pairs = [(p(f"{i}.jpg"), p(f"{i + 1}.jpg")) for i in range(49)] + [
+            (p("49.jpg"), p("50.jpg")), (p("x.jpg"), p("y.jpg")), (p("y.jpg"), p("x.jpg"))
+        ]
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _contents(self):
+        result = {}
+        for name in os.listdir(self.data_dir):
+            with open(os.path.join(self.data_dir, name)) as fh:
+                result[name] = fh.read()
+        return result
+
+    def _crash_after(self, n):
+        plan = plan_renames(self.pairs)
+        journal = RenameJournal.create(self.journal_dir, plan.steps, sync_every=10)
+        for i, (src, dst, _) in enumerate(plan.steps[:n]):
+            os.rename(src, dst)
+            journal.mark_done(i)
+        # 模拟崩溃：不调用 close/commit，未同步的记录丢失
+        journal._fh.close()
+        return plan
+
+    def test_resume_completes_batch(self):
+        before = self._contents()
+        plan = self._crash_after(35)
+        processor = FileProcessor(journal_dir=self.journal_dir)
+        paths = processor.incomplete_batches()
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(len(RenameJournal.load(paths[0]).remaining()), plan.syscalls - 35)
+
+        count, err = processor.resume_batch(paths[0])
+        self.assertIsNone(err)
+        self.assertEqual(processor.incomplete_batches(), [])
+        after = self._contents()
+        self.assertEqual(after["50.jpg"], before["49.jpg"])
+        self.assertEqual(after["x.jpg"], before["y.jpg"])
+        self.assertEqual(after["y.jpg"], before["x.jpg"])
+
+        processor.undo_last_operation()
+        self.assertEqual(self._contents(), before)
+
+    def test_rollback_restores_original_names(self):
+        before = self._contents()
+        self._crash_after(51) # 停在环路的临时中转之后
+        processor = FileProcessor(journal_dir=self.journal_dir)
+        path = processor.incomplete_batches()[0]
+        count, err = processor.rollback_batch(path)
+        self.assertIsNone(err)
+        self.assertEqual(count, 51)
+        self.assertEqual(self._contents(), before)
+        self.assertEqual(processor.incomplete_batches(), [])
+
+    def test_successful_batch_leaves_no_journal(self):
+        processor = FileProcessor(journal_dir=self.journal_dir)
+        preview = [{'original': os.path.basename(s), 'new': os.path.basename(d), 'path': s, 'status': "OK"}
+                   for s, d in self.pairs]
+        count, err = processor.execute_rename(preview)
+        self.assertIsNone(err)
+        self.assertEqual(count, len(self.pairs))
+        self.assertEqual(processor.incomplete_batches(), [])
+
+if __name__ == '__main__':
+    unittest.main()
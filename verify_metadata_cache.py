@@ -0,0 +1,164 @@
+import os
+import shutil
+import sqlite3
+import unittest
+from unittest.mock import patch
+from PIL import Image
+from src.core.renamer import RenamerEngine
+from src.core.metadata_cache import MetadataCache
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_meta_cache"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.files = []
+        for i, size in enumerate([(16, 8), (32, 24)]):
+            path = os.path.join(self.test_dir, f"img{i}.jpg")
+            Image.new('RGB', size, 'blue').save(path)
+            self.files.append(path)
+
+        self.db_path = os.path.join(self.test_dir, "cache.sqlite")
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_warm_preview_skips_decoding(self):
+        cache = MetadataCache(self.db_path)
+        engine = RenamerEngine(metadata_cache=cache)
+        engine.set_rules({'mode': 'metadata_resolution', 'prefix': 'P_', 'padding': 2})
+
+        cold = engine.generate_preview(self.files)
+        self.assertEqual(cold[0]['new'], "P_16x8_01.jpg")
+        self.assertEqual(cache.misses, 2)
+
+        # 模拟重新加载文件集合：facts 重建，但元数据走缓存
+        engine.invalidate_facts()
+        with patch('PIL.Image.open', side_effect=AssertionError("decoded")):
+            warm = engine.generate_preview(self.files)
+        self.assertEqual([p['new'] for p in warm], [p['new'] for p in cold])
+        self.assertEqual(cache.hits, 2)
+        cache.close()
+
+        # 持久化：重新打开后仍然命中
+        cache = MetadataCache(self.db_path)
+        self.assertIsNotNone(cache.get(self.files[0]))
+        cache.close()
+
+    def test_preview_commits_without_close(self):
+        # 界面中缓存长期打开：每次读取元数据后提交，其他连接可见
+        cache = MetadataCache(self.db_path)
+        engine = RenamerEngine(metadata_cache=cache)
+        engine.set_rules({'mode': 'metadata_resolution', 'prefix': 'P_'})
+        engine.generate_preview(self.files)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0], 2)
+        finally:
+            conn.close()
+        cache.close()
+
+    def test_rule_change_skips_filesystem(self):
+        engine = RenamerEngine()
+        engine.set_rules({'mode': 'metadata_resolution', 'prefix': 'A_', 'padding': 2})
+        engine.generate_preview(self.files)
+
+        engine.set_rules({'mode': 'metadata_resolution', 'prefix': 'B_', 'padding': 2})
+        with patch('src.core.renamer.os.stat', side_effect=AssertionError("stat")), \
+             patch('src.core.renamer.read_header_meta', side_effect=AssertionError("read")):
+            preview = engine.generate_preview(self.files)
+        self.assertEqual(preview[1]['new'], "B_32x24_02.jpg")
+
+    def test_invalidated_on_change(self):
+        cache = MetadataCache(self.db_path)
+        engine = RenamerEngine(metadata_cache=cache)
+        engine.read_metadata(self.files[0])
+
+        Image.new('RGB', (64, 48), 'red').save(self.files[0])
+        st = os.stat(self.files[0])
+        os.utime(self.files[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        meta = engine.read_metadata(self.files[0])
+        self.assertEqual((meta['width'], meta['height']), (64, 48))
+        self.assertEqual(cache.hits, 0)
+        cache.close()
+
+    def test_parallel_matches_serial(self):
+        # 追加一个无法解析的文件，验证错误行也保持一致
+        bad = os.path.join(self.test_dir, "broken.jpg")
+        with open(bad, 'w') as fh:
+            fh.write("datum")
+        files = self.files + [bad]
+
+        results = {}
+        for executor in ('serial', 'thread', 'process'):
+            engine = RenamerEngine(executor=executor, max_workers=4)
+            engine.set_rules({'mode': 'metadata_date', 'prefix': 'D_', 'padding': 3})
+            results[executor] = engine.generate_preview(files)
+
+        self.assertEqual(results['thread'], results['serial'])
+        self.assertEqual(results['process'], results['serial'])
+        self.assertEqual(results['serial'][0]['new'], "[无法读取图片].jpg")
+
+    def test_stale_records_rejected_by_every_executor(self):
+        # 旧版本写入的记录没有 exif 键：所有执行方式都重新读取
+        path = os.path.join(self.test_dir, "a.gif")
+        Image.new('RGB', (4, 4), 'red').save(path)
+        files = self.files + [path]
+        cache = MetadataCache(self.db_path)
+        results = {}
+        for executor in ('serial', 'thread', 'process'):
+            st = os.stat(path)
+            cache.put(path, {'width': 4, 'height': 4, 'mtime': st.st_mtime}, st)
+            engine = RenamerEngine(metadata_cache=cache, executor=executor, max_workers=2)
+            engine.set_rules({'mode': 'metadata_date', 'prefix': 'D_', 'padding': 3})
+            results[executor] = [item['new'] for item in engine.generate_preview(files)]
+        cache.close()
+        self.assertEqual(results['process'], results['serial'])
+        self.assertEqual(results['thread'], results['serial'])
+        self.assertEqual(results['serial'][0], "[无法读取图片].gif")
+
+    def test_formats_without_exif_not_numbered(self):
+        # GIF / BMP 没有 EXIF：日期、型号模式中标记为无法读取且不占用序号（与加入缓存之前一致）
+        files = []
+        for name in ("a.gif", "b.bmp", "c.jpg"):
+            path = os.path.join(self.test_dir, name)
+            Image.new('RGB', (4, 4), 'red').save(path)
+            files.append(path)
+        cache = MetadataCache(self.db_path)
+        for mode, expected in (('metadata_model', "M_UnknownCamera_01.jpg"), ('metadata_date', None)):
+            for header in (True, False):
+                engine = RenamerEngine(metadata_cache=cache if header else None)
+                engine.set_rules({'mode': mode, 'prefix': 'M_', 'padding': 2})
+                if header:
+                    preview = engine.generate_preview(files)
+                else:
+                    # 文件头解析失败时回退到 PIL，结果相同
+                    with patch('src.core.renamer.read_header_meta', return_value=None):
+                        preview = engine.generate_preview(files)
+                names = [p['new'] for p in preview]
+                self.assertEqual(names[:2], ["[无法读取图片].gif", "[无法读取图片].bmp"], (mode, header))
+                self.assertTrue(names[2].endswith("_01.jpg"), (mode, header))
+                if expected:
+                    self.assertEqual(names[2], expected)
+        # 分辨率模式不需要 EXIF
+        engine = RenamerEngine()
+        engine.set_rules({'mode': 'metadata_resolution', 'prefix': 'R_', 'padding': 2})
+        self.assertEqual([p['new'] for p in engine.generate_preview(files)],
+                         ["R_4x4_01.gif", "R_4x4_02.bmp", "R_4x4_03.jpg"])
+        cache.close()
+
+    def test_eviction_bounds_size(self):
+        cache = MetadataCache(max_entries=10)
+        st = os.stat(self.files[0])
+        for i in range(25):
+            cache.put(f"/virtual/{i}.jpg", {'width': i}, st)
+        self.assertLessEqual(cache.stats()['entries'], 10)
+        self.assertGreater(cache.evictions, 0)
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
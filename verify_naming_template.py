@@ -0,0 +1,74 @@
+import time
+import unittest
+from unittest.mock import patch
+from src.core.naming_template import compile_template, TemplateError
+from src.core.renamer import RenamerEngine
+
+def fact(original, meta=None, folder="Trip"):
+    ext = original[original.rfind('.'):].lower()
+    return {"path": f"/photos/{folder}/{original}", "original": original, "folder": folder, "ext": ext, "meta": meta}
+
+class TestNamingTemplate(unittest.TestCase):
+    def test_template_tokens(self):
+        meta = {'width': 4000, 'height': 3000, 'date': '2023:07:01 09:30:00', 'model': 'Canon EOS R5', 'mtime': 0}
+        template = compile_template("{prefix}{date:%Y%m%d}{suffix}_{seq:03}{ext}", {'prefix': 'A{b}_', 'suffix': '-x'})
+        self.assertTrue(template.needs_meta)
+        self.assertEqual(template.render(fact("IMG.JPG", meta), 7, ".jpg"), "A{b}_20230701-x_007.jpg")
+        # 相邻字面量合并为一个 token
+        self.assertEqual(len(compile_template("a{{b}}c").tokens), 1)
+
+        template = compile_template("{folder}_{name}_{resolution}_{model}{ext}")
+        self.assertEqual(template.render(fact("IMG.JPG", meta), 1, ".jpg"), "Trip_IMG_4000x3000_Canon_EOS_R5.jpg")
+        self.assertFalse(compile_template("{prefix}_{seq}{ext}").needs_meta)
+
+    def test_invalid_template_reported_once(self):
+        for bad in ("{nope}", "{seq:zz}", "a{b", "{ext:5}"):
+            with self.assertRaises(TemplateError):
+                compile_template(bad)
+
+        engine = RenamerEngine()
+        with self.assertRaises(TemplateError):
+            engine.set_rules({'mode': 'regex', 'regex_pattern': '([a-z'})
+        engine.set_rules({'mode': 'regex', 'regex_pattern': 'img', 'regex_replacement': r'\9'})
+        with self.assertRaises(TemplateError):
+            engine.apply_rules([fact("img1.jpg"), fact("img2.jpg")])
+
+    def test_metadata_fetched_only_when_referenced(self):
+        engine = RenamerEngine(executor='serial')
+        files = ["/photos/Trip/a.jpg", "/photos/Trip/b.jpg"]
+        with patch.object(engine, 'collect_metadata') as collect:
+            engine.set_rules({'mode': 'template', 'template': "{folder}_{seq:02}{ext}"})
+            preview = engine.generate_preview(files)
+            collect.assert_not_called()
+        self.assertEqual([item['new'] for item in preview], ["Trip_01.jpg", "Trip_02.jpg"])
+
+        metas = {p: {'width': 10, 'height': 20, 'mtime': 0} for p in files}
+        metas[files[1]] = {'error': "broken"}
+        with patch.object(engine, 'collect_metadata', return_value=metas) as collect:
+            engine.set_rules({'mode': 'template', 'template': "{width}w_{seq}{ext}"})
+            preview = engine.generate_preview(files)
+            collect.assert_called_once()
+        self.assertEqual([item['new'] for item in preview], ["10w_1.jpg", "[无法读取图片].jpg"])
+
+    def test_builtin_modes_unchanged(self):
+        engine = RenamerEngine()
+        facts = [fact("b c.png"), fact("a.JPG")]
+        engine.set_rules({'mode': 'sequence', 'padding': 3, 'suffix': ' s', 'case': 'lower', 'web_safe': True})
+        self.assertEqual([i['new'] for i in engine.apply_rules(facts)], ["trip_s_001.png", "trip_s_002.jpg"])
+
+        meta = {'width': 1, 'height': 2, 'date': None, 'model': None, 'mtime': 0}
+        engine.set_rules({'mode': 'metadata_model', 'prefix': 'P_'})
+        self.assertEqual(engine.apply_rules([fact("a.jpg", meta)])[0]['new'], "P_UnknownCamera_1.jpg")
+
+    def test_naming_throughput(self):
+        facts = [fact(f"IMG_{i:05}.jpg") for i in range(50000)]
+        engine = RenamerEngine()
+        engine.set_rules({'mode': 'sequence', 'prefix': 'Trip', 'padding': 5, 'case': 'upper', 'web_safe': True})
+        start = time.perf_counter()
+        preview = engine.apply_rules(facts)
+        elapsed = time.perf_counter() - start
+        print(f"\nNaming 50k files: {elapsed * 1000:.0f} ms")
+        self.assertEqual(preview[-1]['new'], "TRIP_50000.JPG")
+
+if __name__ == '__main__':
+    unittest.main()
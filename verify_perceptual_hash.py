@@ -0,0 +1,94 @@
+import os
+import random
+import shutil
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageDraw
+from src.core.renamer import RenamerEngine
+from src.utils import perceptual_hash
+from src.utils.perceptual_hash import group_similar, perceptual_hashes
+
+class TestPerceptualHash(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_perceptual_hash"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        # 同一张照片的原图、缩小重新导出、调亮；另有两张内容不同的图片
+        shot = Image.new('L', (320, 240))
+        draw = ImageDraw.Draw(shot)
+        for x in range(0, 320, 40):
+            draw.ellipse((x, x // 2, x + 90, x // 2 + 70), fill=(x * 3) % 256)
+        shot = shot.convert('RGB')
+        shot.save(self._path("burst_1.jpg"), quality=95)
+        shot.resize((160, 120)).save(self._path("burst_2.jpg"), quality=60)
+        shot.point(lambda v: min(255, v + 12)).save(self._path("burst_3.png"))
+
+        other = Image.new('RGB', (320, 240))
+        draw = ImageDraw.Draw(other)
+        for y in range(0, 240, 30):
+            draw.rectangle((0, y, 320, y + 15), fill=(255, 255, 255))
+        other.save(self._path("other.jpg"))
+        Image.radial_gradient('L').resize((320, 240)).save(self._path("gradient.webp"))
+        self.files = sorted(self._path(n) for n in os.listdir(self.test_dir))
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _path(self, name):
+        return os.path.join(self.test_dir, name)
+
+    def test_grouping_matches_brute_force(self):
+        rng = random.Random(7)
+        hashes = [rng.getrandbits(64) for _ in range(400)]
+        hashes += [h ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for h in hashes[:150]]
+        hashes += [None, hashes[0]]
+
+        def brute(threshold):
+            groups = []
+            for i, h in enumerate(hashes):
+                found = None
+                for j in range(i):
+                    if h is not None and hashes[j] is not None and bin(h ^ hashes[j]).count("1") <= threshold:
+                        found = groups[j] if found is None else found
+                        # 合并两个已有的组
+                        groups = [found if g == groups[j] else g for g in groups]
+                groups.append(found if found is not None else ("new", i))
+            numbers = {}
+            return [numbers.setdefault(g, len(numbers) + 1) for g in groups]
+
+        # 12 以上每段半径超过 HammingIndex.MAX_RADIUS，改为分块两两比较
+        for threshold in (0, 3, 6, 9, 12, 32):
+            expected = brute(threshold)
+            self.assertEqual(group_similar(hashes, threshold), expected)
+            # 没有 NumPy 时的纯 Python 索引给出同样的结果
+            with patch.object(perceptual_hash, '_numpy', return_value=None):
+                self.assertEqual(group_similar(hashes, threshold), expected)
+
+    def test_near_duplicates_grouped_in_preview(self):
+        for algorithm in ('dhash', 'phash'):
+            hashes = perceptual_hashes(self.files, algorithm, batch_size=2)
+            groups = dict(zip(self.files, group_similar([hashes[p] for p in self.files])))
+            self.assertEqual(len({groups[self._path(n)] for n in ("burst_1.jpg", "burst_2.jpg", "burst_3.png")}), 1,
+                             algorithm)
+            self.assertEqual(len(set(groups.values())), 3, algorithm)
+
+        engine = RenamerEngine()
+        engine.set_rules({'mode': 'template', 'template': "{group:02}_{seq:02}{ext}", 'sort': 'natural'})
+        preview = engine.generate_preview(self.files)
+        self.assertEqual([(item['original'], item['new']) for item in preview], [
+            ("burst_1.jpg", "01_01.jpg"), ("burst_2.jpg", "01_02.jpg"), ("burst_3.png", "01_03.png"),
+            ("gradient.webp", "02_04.webp"), ("other.jpg", "03_05.jpg"),
+        ])
+        self.assertEqual([item.get('similar') for item in preview], [1, 1, 1, None, None])
+
+        # 只修改阈值：重新分组，不再解码图片
+        with patch('src.utils.perceptual_hash.load_gray', side_effect=AssertionError("decoded")):
+            engine.set_rules({'mode': 'sequence', 'group_similar': True, 'similar_threshold': 0})
+            preview = engine.generate_preview(self.files)
+        self.assertLess(sum(1 for item in preview if 'similar' in item), 3)
+
+if __name__ == '__main__':
+    unittest.main()
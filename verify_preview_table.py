@@ -0,0 +1,47 @@
+import os
+import unittest
+from src.core.preview_table import PreviewTable, PreviewRecord, memory_per_entry
+
+class TestPreviewTable(unittest.TestCase):
+    def test_records_behave_like_dicts(self):
+        table = PreviewTable()
+        path = os.path.join("photos", "trip", "a.jpg")
+        item = table.add(path, "a.jpg", "b.jpg", "OK", convert="jpg")
+        table.add(os.path.join("photos", "trip", "c.jpg"), "c.jpg", "c.jpg", "无变化")
+        table.add("d.jpg", "d.jpg", "e.jpg", "OK")
+
+        self.assertIsInstance(item, PreviewRecord)
+        self.assertEqual(item['path'], path)
+        self.assertEqual(table[2]['path'], "d.jpg")
+        # 同一目录的记录共享同一个 head 字符串
+        self.assertIs(table[0].head, table[1].head)
+        self.assertEqual(table.directories(), 2)
+
+        self.assertEqual(item.get('convert'), "jpg")
+        self.assertNotIn('conflict', item)
+        self.assertNotIn('sidecars', item)
+        self.assertEqual(item.get('sidecars', ()), ())
+        item['status'] = "冲突"
+        item['conflict'] = "目标已存在: b.jpg"
+        item['sidecars'] = [("a.xmp", "b.xmp")]
+        self.assertEqual(item['sidecars'], [("a.xmp", "b.xmp")])
+        with self.assertRaises(KeyError):
+            table[1]['conflict']
+
+        self.assertEqual(table.as_dicts()[0], {
+            "original": "a.jpg", "new": "b.jpg", "path": path, "status": "冲突",
+            "sidecars": [("a.xmp", "b.xmp")], "convert": "jpg", "conflict": "目标已存在: b.jpg",
+        })
+        self.assertEqual(table[1], {"original": "c.jpg", "new": "c.jpg", "path": table[1]['path'], "status": "无变化"})
+
+    def test_memory_per_entry(self):
+        table = PreviewTable()
+        for i in range(2000):
+            item = table.add(os.path.join("dir", f"img{i}.jpg"), f"img{i}.jpg", f"new{i}.jpg", "OK")
+            item['sidecars'] = []
+        memory = memory_per_entry(table)
+        self.assertEqual(memory['entries'], 2000)
+        self.assertLess(memory['records'], memory['dicts'] / 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import queue
+import shutil
+import unittest
+from src.core.renamer import RenamerEngine
+from src.gui.preview_worker import PreviewWorker
+
+class TestPreviewWorker(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_preview_worker"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+        self.files = []
+        for i in range(20):
+            path = os.path.join(self.test_dir, f"img{i:02d}.jpg")
+            with open(path, 'w') as fh:
+                fh.write("datum")
+            self.files.append(path)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _wait_done(self, worker, generation):
+        while True:
+            msg = worker.results.get(timeout=5)
+            if msg[0] == 'done' and msg[1] == generation:
+                return msg[2]
+
+    def test_only_latest_generation_matters(self):
+        worker = PreviewWorker(RenamerEngine())
+        for prefix in ("A", "B", "C"):
+            generation = worker.submit(self.files, {'mode': 'sequence', 'prefix': prefix, 'padding': 2})
+
+        preview = self._wait_done(worker, generation)
+        self.assertEqual(generation, 3)
+        self.assertEqual(preview[0]['new'], "C_01.jpg")
+        worker.stop()
+
+    def test_cancel_during_metadata(self):
+        engine = RenamerEngine(executor='serial')
+        worker = PreviewWorker(engine)
+
+        def cancel_midway(path, _orig=engine.read_metadata):
+            # 第一个文件读取时就作废本次请求
+            worker.cancel()
+            return _orig(path)
+        engine.read_metadata = cancel_midway
+
+        worker.submit(self.files, {'mode': 'metadata_resolution'})
+        with self.assertRaises(queue.Empty):
+            while True:
+                msg = worker.results.get(timeout=0.5)
+                self.assertNotEqual(msg[0], 'done')
+        worker.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import json
+import shutil
+import threading
+import unittest
+from src.core.profiling import Profiler
+from src.core.renamer import RenamerEngine
+from src.core.file_ops import FileProcessor
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_profiling"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_spans_only_inside_operation(self):
+        profiler = Profiler()
+        with profiler.span("ignored") as span:
+            span.add("files", 3)
+        self.assertIsNone(profiler.last)
+
+        with profiler.operation("preview") as operation:
+            with profiler.span("naming", files=2):
+                pass
+            with profiler.span("naming", files=3) as span:
+                span.add("bytes_read", 100)
+            # 其他线程没有进行中的操作，不会记入
+            t = threading.Thread(target=lambda: profiler.span("other").__enter__())
+            t.start()
+            t.join()
+        profiler.record("render", 0.01, files=5)
+
+        summary = operation.summary()
+        self.assertEqual(set(summary), {"naming", "render"})
+        self.assertEqual(summary["naming"]["files"], 5)
+        self.assertEqual(summary["naming"]["bytes_read"], 100)
+        self.assertIn("files_per_sec", summary["render"])
+        self.assertTrue(operation.status_text().startswith("preview "))
+
+    def test_engine_and_processor_phases_exported(self):
+        files = []
+        for name in ["b.jpg", "a.png"]:
+            path = os.path.join(self.test_dir, name)
+            with open(path, 'w') as fh:
+                fh.write("x")
+            files.append(path)
+
+        profiler = Profiler(cprofile=True)
+        engine = RenamerEngine(profiler=profiler)
+        engine.set_rules({'mode': 'sequence', 'prefix': 'P'})
+        with profiler.operation("preview"):
+            preview = engine.generate_preview(files)
+        self.assertEqual(set(profiler.last.summary()), {"facts", "sort", "naming", "collisions"})
+
+        processor = FileProcessor(profiler=profiler)
+        with profiler.operation("rename"):
+            processor.execute_rename(preview)
+        with profiler.operation("undo"):
+            processor.undo_last_operation()
+        self.assertEqual(profiler.last.summary()["undo"]["syscalls"], 2)
+
+        path = os.path.join(self.test_dir, "trace.json")
+        written = profiler.export(path)
+        self.assertEqual(written, [path, os.path.join(self.test_dir, "trace.prof")])
+        with open(path, encoding='utf-8') as fh:
+            trace = json.load(fh)
+        self.assertEqual([op['operation'] for op in trace['operations']], ["preview", "rename", "undo"])
+        self.assertEqual(trace['operations'][1]['summary']['rename']['syscalls'], 2)
+        self.assertIn("cprofile", trace['operations'][0])
+        names = {event['name'] for event in trace['traceEvents']}
+        self.assertTrue({"preview", "rename", "plan", "undo"} <= names)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import time
+import shutil
+import unittest
+from unittest.mock import patch
+from src.core.rename_plan import plan_renames, RenamePlanError
+from src.core.file_ops import FileProcessor
+
+class TestRenamePlan(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_rename_plan"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _p(self, name):
+        return os.path.join(self.test_dir, name)
+
+    def _write(self, name, content):
+        with open(self._p(name), 'w') as fh:
+            fh.write(content)
+
+    def _read(self, name):
+        with open(self._p(name)) as fh:
+            return fh.read()
+
+    def test_no_conflicts_is_one_syscall_per_file(self):
+        pairs = [(self._p(f"{i}.jpg"), self._p(f"new_{i}.jpg")) for i in range(10)]
+        plan = plan_renames(pairs)
+        self.assertEqual(plan.syscalls, 10)
+        self.assertEqual(plan.temp_hops, 0)
+
+    def test_chain_is_ordered_without_temp(self):
+        p = self._p
+        plan = plan_renames([(p("a"), p("b")), (p("b"), p("c")), (p("c"), p("d"))])
+        self.assertEqual([s[:2] for s in plan.steps], [(p("c"), p("d")), (p("b"), p("c")), (p("a"), p("b"))])
+        self.assertEqual(plan.cycles, [])
+
+    def test_cycle_uses_single_temp_hop(self):
+        p = self._p
+        plan = plan_renames([(p("a"), p("b")), (p("b"), p("c")), (p("c"), p("a")), (p("x"), p("y"))])
+        self.assertEqual(plan.temp_hops, 1)
+        self.assertEqual(plan.syscalls, 5)
+        self.assertEqual(sorted(plan.cycles[0]), [p("a"), p("b"), p("c")])
+
+    def test_duplicate_targets_rejected(self):
+        p = self._p
+        with self.assertRaises(RenamePlanError):
+            plan_renames([(p("a"), p("z")), (p("b"), p("z"))])
+
+    def test_execute_and_undo_swap(self):
+        self._write("1.jpg", "one")
+        self._write("2.jpg", "two")
+        preview = [
+            {'original': "1.jpg", 'new': "2.jpg", 'path': self._p("1.jpg"), 'status': "OK"},
+            {'original': "2.jpg", 'new': "1.jpg", 'path': self._p("2.jpg"), 'status': "OK"},
+        ]
+        processor = FileProcessor()
+        count, err = processor.execute_rename(preview)
+        self.assertIsNone(err)
+        self.assertEqual(count, 2)
+        self.assertEqual((self._read("1.jpg"), self._read("2.jpg")), ("two", "one"))
+        self.assertEqual(processor.last_plan.summary()['temp_hops'], 1)
+
+        count, err = processor.undo_last_operation()
+        self.assertIsNone(err)
+        self.assertEqual((self._read("1.jpg"), self._read("2.jpg")), ("one", "two"))
+
+    def _latency_run(self, max_workers, latency=0.005, n=60):
+        names = [f"{i:03d}.jpg" for i in range(n)]
+        for name in names:
+            self._write(name, name)
+        # 10.jpg -> 11.jpg -> ... 形成一条链，其余互不相关
+        preview = [{'original': name, 'new': f"{i + 1:03d}.jpg" if i < 10 else f"new_{name}",
+                    'path': self._p(name), 'status': "OK"} for i, name in enumerate(names)]
+
+        real_rename = os.rename
+        def slow_rename(src, dst):
+            time.sleep(latency) # 模拟网络文件系统的往返延迟
+            real_rename(src, dst)
+
+        processor = FileProcessor(max_workers=max_workers)
+        start = time.perf_counter()
+        with patch('os.rename', side_effect=slow_rename):
+            count, err = processor.execute_rename(preview)
+        elapsed = time.perf_counter() - start
+
+        self.assertIsNone(err)
+        self.assertEqual(count, n)
+        self.assertEqual(self._read("010.jpg"), "009.jpg")
+        self.assertEqual(self._read("new_059.jpg"), "059.jpg")
+        self.assertEqual([op['from'] for op in processor.history_stack[-1]],
+                         [src for src, _, origin in processor.last_plan.steps if origin])
+
+        processor.undo_last_operation()
+        self.assertEqual(sorted(os.listdir(self.test_dir)), names)
+        shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+        return elapsed
+
+    def test_concurrent_executor_speedup(self):
+        serial = self._latency_run(max_workers=1)
+        concurrent = self._latency_run(max_workers=8)
+        print(f"\nSerial: {serial:.3f}s, concurrent (8 workers): {concurrent:.3f}s")
+        self.assertLess(concurrent, serial / 2)
+
+if __name__ == '__main__':
+    unittest.main()
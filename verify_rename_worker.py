@@ -0,0 +1,113 @@
+import os
+import shutil
+import threading
+import unittest
+from src.core.file_ops import FileProcessor, CANCELLED
+from src.gui.rename_worker import RenameWorker
+
+class TestRenameWorker(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath("test_rename_worker")
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _preview(self, pairs):
+        preview = []
+        for old, new in pairs:
+            path = os.path.join(self.test_dir, old)
+            with open(path, 'w') as fh:
+                fh.write(old)
+            preview.append({"original": old, "new": new, "path": path, "status": "OK"})
+        return preview
+
+    def _messages(self, worker):
+        worker.join(5)
+        messages = []
+        while not worker.results.empty():
+            messages.append(worker.results.get_nowait())
+        return messages
+
+    def test_progress_is_throttled(self):
+        preview = self._preview([(f"{i}.jpg", f"n{i}.jpg") for i in range(50)])
+        worker = RenameWorker(FileProcessor())
+        worker.PROGRESS_INTERVAL = 60
+        worker.start(preview)
+        messages = self._messages(worker)
+
+        # 间隔内只发出第一条与最后一条进度
+        progress = [m for m in messages if m[0] == 'progress']
+        self.assertEqual([m[1:3] for m in progress], [(1, 50), (50, 50)])
+        self.assertIsNotNone(progress[-1][3])
+        self.assertEqual(messages[-1], ('done', 50, None, False))
+        self.assertEqual(worker.operation.name, "rename")
+
+    def test_cancel_stops_between_groups(self):
+        # 若干个交换环路，各经过一次临时文件中转
+        pairs = []
+        for a, b in (("a", "b"), ("c", "d"), ("e", "f"), ("g", "h")):
+            pairs += [(f"{a}.jpg", f"{b}.jpg"), (f"{b}.jpg", f"{a}.jpg")]
+        preview = self._preview(pairs)
+        processor = FileProcessor(journal_dir=os.path.join(self.test_dir, "journal"))
+        worker = RenameWorker(processor)
+
+        def cancel_after_first_step(done, total, _orig=worker._on_progress):
+            if done == 1:
+                worker.cancel()
+            _orig(done, total)
+        worker._on_progress = cancel_after_first_step
+        worker.start(preview)
+        messages = self._messages(worker)
+
+        _, count, error, cancelled = messages[-1]
+        self.assertTrue(cancelled)
+        self.assertEqual(error, CANCELLED)
+        # 在环路中途取消：该环路仍然完整执行，之后的环路不再开始，没有留下临时文件
+        self.assertEqual(count, 2)
+        names = sorted(n for n in os.listdir(self.test_dir) if n != "journal")
+        self.assertEqual(names, sorted(old for old, _ in pairs))
+        swapped = []
+        for old, _ in pairs:
+            with open(os.path.join(self.test_dir, old)) as fh:
+                if fh.read() != old:
+                    swapped.append(old)
+        self.assertEqual(len(swapped), 2)
+        # 日志已提交，不会被当作中断的批次
+        self.assertEqual(processor.incomplete_batches(), [])
+
+        # 已完成的部分可以撤回
+        count, error = processor.undo_last_operation()
+        self.assertEqual((count, error), (2, None))
+        for old in swapped:
+            with open(os.path.join(self.test_dir, old)) as fh:
+                self.assertEqual(fh.read(), old)
+
+    def test_cancel_right_after_start(self):
+        preview = self._preview([(f"{i}.jpg", f"n{i}.jpg") for i in range(20)])
+        processor = FileProcessor()
+        worker = RenameWorker(processor)
+        started = threading.Event()
+        original = processor.execute_rename
+
+        def delayed(*args, **kwargs):
+            # 线程已启动、尚未开始执行时取消
+            started.wait(5)
+            return original(*args, **kwargs)
+        processor.execute_rename = delayed
+        worker.start(preview)
+        worker.cancel()
+        started.set()
+        messages = self._messages(worker)
+
+        self.assertEqual(messages[-1], ('done', 0, CANCELLED, True))
+        self.assertEqual(sorted(os.listdir(self.test_dir)), sorted(f"{i}.jpg" for i in range(20)))
+        # 取消只作用于一次执行
+        worker.start(preview)
+        self.assertEqual(self._messages(worker)[-1], ('done', 20, None, False))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import unittest
+from src.core.scanner import scan_paths
+
+class TestScanner(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_scanner"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        layout = {
+            "": ["a.jpg", "b.PNG", "notes.txt", ".jpg"],
+            "sub": ["c.webp"],
+            os.path.join("sub", "deep"): ["d.gif"],
+        }
+        for folder, names in layout.items():
+            os.makedirs(os.path.join(self.test_dir, folder), exist_ok=True)
+            for name in names:
+                with open(os.path.join(self.test_dir, folder, name), 'w') as fh:
+                    fh.write("datum")
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _scan(self, paths, **kwargs):
+        return sorted(os.path.relpath(p, self.test_dir) for chunk in scan_paths(paths, **kwargs) for p in chunk)
+
+    def test_flat_scan_filters_extensions(self):
+        self.assertEqual(self._scan([self.test_dir]), ["a.jpg", "b.PNG"])
+
+    def test_recursive_with_depth_limit(self):
+        deep = os.path.join("sub", "deep", "d.gif")
+        self.assertEqual(self._scan([self.test_dir], recursive=True),
+                         sorted(["a.jpg", "b.PNG", deep, os.path.join("sub", "c.webp")]))
+        self.assertEqual(self._scan([self.test_dir], recursive=True, max_depth=1),
+                         ["a.jpg", "b.PNG", os.path.join("sub", "c.webp")])
+
+    def test_chunks_and_explicit_files(self):
+        notes = os.path.join(self.test_dir, "notes.txt")
+        chunks = list(scan_paths([notes, self.test_dir], recursive=True, chunk_size=2))
+        self.assertTrue(all(len(c) <= 2 for c in chunks))
+        self.assertEqual(chunks[0][0], os.path.normpath(notes))
+        self.assertEqual(sum(len(c) for c in chunks), 5)
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlink not supported")
+    def test_symlink_loop(self):
+        try:
+            os.symlink(os.path.abspath(self.test_dir), os.path.join(self.test_dir, "sub", "loop"))
+        except OSError:
+            self.skipTest("cannot create symlink")
+        self.assertEqual(len(self._scan([self.test_dir], recursive=True)), 4)
+        self.assertEqual(len(self._scan([self.test_dir], recursive=True, follow_symlinks=True)), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import shutil
+import unittest
+from unittest.mock import patch
+from src.core.renamer import RenamerEngine
+from src.core.file_ops import FileProcessor
+
+class TestSidecars(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_sidecar"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+        for name in ["a.jpg", "a.TXT", "a.jpg.xmp", "b.png", "B.aae", "b.json", "c.jpg", "c.pp3", "other.xmp"]:
+            with open(os.path.join(self.test_dir, name), 'w') as fh:
+                fh.write(name)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _preview(self, **rules):
+        engine = RenamerEngine()
+        engine.set_rules(dict({'mode': 'sequence', 'prefix': 'P', 'padding': 1, 'sync_sidecar': True}, **rules))
+        files = [os.path.join(self.test_dir, n) for n in ("a.jpg", "b.png", "c.jpg")]
+        return engine.generate_preview(files)
+
+    def test_preview_lists_sidecars(self):
+        preview = self._preview()
+        self.assertEqual(sorted(preview[0]['sidecars']), [("a.TXT", "P_1.TXT"), ("a.jpg.xmp", "P_1.jpg.xmp")])
+        self.assertEqual(sorted(preview[1]['sidecars']), [("B.aae", "P_2.aae"), ("b.json", "P_2.json")])
+        self.assertEqual(preview[2]['sidecars'], [("c.pp3", "P_3.pp3")])
+
+        preview = self._preview(sidecar_extensions=['.txt'])
+        self.assertEqual(preview[0]['sidecars'], [("a.TXT", "P_1.TXT")])
+        self.assertEqual(preview[2]['sidecars'], [])
+
+    def test_casefold_changing_length(self):
+        # casefold 后长度不同的名称：后缀仍为附属文件的扩展名
+        for name in ["Straße.jpg", "STRASSE.xmp"]:
+            with open(os.path.join(self.test_dir, name), 'w') as fh:
+                fh.write(name)
+        engine = RenamerEngine()
+        engine.set_rules({'mode': 'sequence', 'prefix': 'P', 'padding': 1, 'sync_sidecar': True})
+        preview = engine.generate_preview([os.path.join(self.test_dir, "Straße.jpg")])
+        self.assertEqual(preview[0]['sidecars'], [("STRASSE.xmp", "P_1.xmp")])
+
+    def test_execute_uses_preview_without_probing(self):
+        preview = self._preview()
+        processor = FileProcessor()
+        with patch('os.path.exists', side_effect=AssertionError("probe")):
+            count, err = processor.execute_rename(preview, sync_sidecar=True)
+        self.assertIsNone(err)
+        self.assertEqual(count, 8)
+        self.assertEqual(sorted(os.listdir(self.test_dir)), sorted([
+            "P_1.jpg", "P_1.TXT", "P_1.jpg.xmp", "P_2.png", "P_2.aae", "P_2.json", "P_3.jpg", "P_3.pp3", "other.xmp"
+        ]))
+
+if __name__ == '__main__':
+    unittest.main()
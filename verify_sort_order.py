@@ -0,0 +1,78 @@
+import os
+import shutil
+import unittest
+from unittest.mock import patch
+from PIL import Image
+from src.core.renamer import RenamerEngine
+from src.core.naming_template import TemplateError
+from src.core.sort_order import parse_sort, natural_key
+
+class TestSortOrder(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_sort_order"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        # 名称、拍摄时间、修改时间、大小各自给出不同的顺序
+        specs = [
+            ("img10.jpg", "2023:05:01 09:00:00", 300, 48),
+            ("img2.jpg", "2023:05:01 08:00:00", 100, 16),
+            ("IMG1.jpg", None, 200, 32),
+        ]
+        self.files = []
+        for name, date, mtime, size in specs:
+            path = os.path.join(self.test_dir, name)
+            exif = Image.Exif()
+            if date:
+                exif[306] = date
+            Image.new('RGB', (size, size), 'white').save(path, exif=exif.tobytes())
+            # JPEG 结束标记之后的填充，保证文件大小的顺序
+            with open(path, 'ab') as fh:
+                fh.write(b'\0' * size * 100)
+            os.utime(path, (mtime, mtime))
+            self.files.append(path)
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _order(self, engine, sort):
+        engine.set_rules({'mode': 'sequence', 'prefix': 'P', 'sort': sort})
+        preview = engine.generate_preview(self.files)
+        return [item['original'] for item in preview], preview
+
+    def test_orderings(self):
+        self.assertLess(natural_key("img2.jpg"), natural_key("IMG10.jpg"))
+        self.assertEqual(parse_sort("-size, natural"), (("size", True), ("natural", False)))
+        self.assertEqual(parse_sort(""), (("path", False),))
+
+        engine = RenamerEngine(executor='serial')
+        self.assertEqual(self._order(engine, 'path')[0], ["IMG1.jpg", "img10.jpg", "img2.jpg"])
+        self.assertEqual(self._order(engine, 'natural')[0], ["IMG1.jpg", "img2.jpg", "img10.jpg"])
+        self.assertEqual(self._order(engine, 'mtime')[0], ["img2.jpg", "IMG1.jpg", "img10.jpg"])
+        self.assertEqual(self._order(engine, '-size')[0], ["img10.jpg", "IMG1.jpg", "img2.jpg"])
+        # 没有拍摄时间的 IMG1 使用修改时间（1970 年），排在最前
+        names, preview = self._order(engine, 'date,natural')
+        self.assertEqual(names, ["IMG1.jpg", "img2.jpg", "img10.jpg"])
+        # 序号按排序后的顺序分配
+        self.assertEqual(preview[1]['new'], "P_2.jpg")
+
+        with self.assertRaises(TemplateError):
+            engine.set_rules({'mode': 'sequence', 'sort': 'colour'})
+
+    def test_switching_order_reuses_cached_keys(self):
+        engine = RenamerEngine(executor='serial')
+        for sort in ('date', 'mtime', 'size', 'natural'):
+            self._order(engine, sort)
+
+        # 只修改排序方式或前缀：不再 stat 文件，也不再读取元数据
+        with patch('os.stat', side_effect=AssertionError("stat")), \
+             patch.object(engine, 'read_metadata', side_effect=AssertionError("metadata")):
+            self.assertEqual(self._order(engine, '-date')[0], ["img10.jpg", "img2.jpg", "IMG1.jpg"])
+            self.assertEqual(self._order(engine, 'size,natural')[0], ["img2.jpg", "IMG1.jpg", "img10.jpg"])
+            engine.set_rules({'mode': 'sequence', 'prefix': 'Q', 'sort': 'mtime'})
+            self.assertEqual(engine.generate_preview(self.files)[0]['new'], "Q_1.jpg")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import shutil
+import threading
+import unittest
+from unittest import mock
+from PIL import Image
+from src.utils import thumbnails
+from src.utils.thumbnails import LRUCache, ThumbnailStore, make_thumbnail, thumbnail_cost
+from src.gui.thumbnail_worker import ThumbnailWorker
+
+
+class TestThumbnails(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath("test_thumbnails")
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+        self.cache_dir = os.path.join(self.test_dir, "cache")
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _image(self, name, size=(1600, 1200), color=(200, 30, 30)):
+        path = os.path.join(self.test_dir, name)
+        Image.new('RGB', size, color).save(path, quality=90)
+        return path
+
+    def test_make_thumbnail_uses_draft(self):
+        path = self._image("big.jpg")
+        with Image.open(path) as img:
+            # draft 让 JPEG 以 1/8 尺寸解码
+            img.draft('RGB', (40, 40))
+            self.assertEqual(img.size, (200, 150))
+        mode, size, data = make_thumbnail(path)
+        self.assertEqual((mode, size), ('RGB', (40, 30)))
+        self.assertEqual(len(data), 40 * 30 * 3)
+        self.assertIsNone(make_thumbnail(os.path.join(self.test_dir, "missing.jpg")))
+
+    def test_lru_respects_budget(self):
+        cache = LRUCache(budget=3000)
+        for key in "abc":
+            cache.put(key, key.upper(), 1000)
+        self.assertEqual(cache.get("a"), "A") # a 变为最近使用
+        cache.put("d", "D", 1000)
+        self.assertNotIn("b", cache)
+        self.assertEqual([k for k in "acd" if k in cache], ["a", "c", "d"])
+        self.assertEqual((cache.used, cache.evictions), (3000, 1))
+        self.assertEqual(thumbnail_cost(('RGB', (40, 30), b'')), 40 * 30 * 4)
+
+    def test_disk_cache_keyed_by_mtime_and_size(self):
+        path = self._image("a.jpg")
+        store = ThumbnailStore(self.cache_dir)
+        thumb = store.load(path)
+        self.assertEqual((store.generated, store.disk_hits), (1, 0))
+
+        # 新的实例（重新启动）直接读取磁盘缓存，不再解码原图
+        store = ThumbnailStore(self.cache_dir)
+        with mock.patch.object(thumbnails, "make_thumbnail", side_effect=AssertionError("decoded")):
+            cached = store.load(path)
+        self.assertEqual(cached[:2], thumb[:2])
+        self.assertEqual(store.disk_hits, 1)
+
+        # 文件变化后缓存失效
+        self._image("a.jpg", size=(800, 800), color=(0, 0, 255))
+        self.assertEqual(store.load(path)[1], (40, 40))
+        self.assertEqual(store.generated, 1)
+
+    def test_prune_removes_oldest(self):
+        store = ThumbnailStore(self.cache_dir, disk_budget=0)
+        for name in ("a.jpg", "b.jpg"):
+            store.load(self._image(name))
+        self.assertEqual(store.prune(), 2)
+        self.assertEqual(ThumbnailStore(None).prune(), 0)
+
+    def test_worker_replaces_pending_requests(self):
+        paths = [self._image(f"{i}.jpg", size=(64, 64)) for i in range(6)]
+        store = ThumbnailStore(None)
+        worker = ThumbnailWorker(store, max_workers=1)
+        started = []
+        gate = threading.Event()
+        original = store.load
+
+        def slow_load(path):
+            started.append(path)
+            gate.wait(5)
+            return original(path)
+
+        with mock.patch.object(store, "load", side_effect=slow_load):
+            worker.request(paths[:3])
+            # 第一个请求已开始；滚动后剩余的旧请求被新的可见行替换
+            while not started:
+                gate.wait(0.01)
+            worker.request(paths[3:])
+            gate.set()
+            results = [worker.results.get(timeout=5) for _ in range(4)]
+        worker.stop()
+        worker.join(5)
+        self.assertEqual([os.path.basename(p) for _, p, _ in results], ["0.jpg", "3.jpg", "4.jpg", "5.jpg"])
+        self.assertTrue(all(thumb is not None for _, _, thumb in results))
+        self.assertTrue(worker.results.empty())
+
+    def test_invalidate_marks_inflight_results_stale(self):
+        paths = [self._image(f"{i}.jpg", size=(64, 64)) for i in range(3)]
+        store = ThumbnailStore(None)
+        worker = ThumbnailWorker(store, max_workers=1)
+        started = []
+        gate = threading.Event()
+        original = store.load
+
+        def slow_load(path):
+            started.append(path)
+            gate.wait(5)
+            return original(path)
+
+        with mock.patch.object(store, "load", side_effect=slow_load):
+            worker.request(paths)
+            while not started:
+                gate.wait(0.01)
+            # 加载中的文件被重命名：旧请求作废，同一路径重新请求
+            worker.invalidate()
+            worker.request(paths[:1])
+            gate.set()
+            results = [worker.results.get(timeout=5) for _ in range(2)]
+        worker.stop()
+        worker.join(5)
+        self.assertEqual([(g, os.path.basename(p)) for g, p, _ in results], [(0, "0.jpg"), (1, "0.jpg")])
+        self.assertEqual(worker.generation, 1)
+        self.assertTrue(worker.results.empty())
+
+
+if __name__ == '__main__':
+    unittest.main()
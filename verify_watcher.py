@@ -0,0 +1,107 @@
+import os
+import time
+import shutil
+import unittest
+from unittest import mock
+from src.core.renamer import RenamerEngine
+from src.core.file_ops import FileProcessor
+from src.core.watcher import FolderWatcher, rename_batch
+
+RULES = {'mode': 'sequence', 'prefix': 'S', 'padding': 3, 'start_index': 1}
+
+
+class TestFolderWatcher(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.abspath("test_watcher")
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        self.inbox = os.path.join(self.test_dir, "inbox")
+        os.makedirs(self.inbox)
+        self.state = os.path.join(self.test_dir, "state.json")
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _add(self, *names):
+        # 文件与目录的修改时间都设为一分钟前：文件已稳定，目录 mtime 可信
+        old = time.time() - 60
+        for name in names:
+            path = os.path.join(self.inbox, name)
+            with open(path, 'w') as fh:
+                fh.write(name)
+            os.utime(path, (old, old))
+        os.utime(self.inbox, (old, old))
+
+    def _watcher(self, state_path=None, **kwargs):
+        return FolderWatcher([self.inbox], state_path=state_path or self.state, settle=0, **kwargs)
+
+    def _ready(self, watcher):
+        # 第一次 poll 记录大小与修改时间，第二次确认稳定后才返回
+        watcher.poll()
+        return [os.path.basename(p) for p in watcher.poll()]
+
+    def test_existing_files_are_baseline(self):
+        self._add("a.jpg", "b.jpg")
+        watcher = self._watcher()
+        self.assertEqual(self._ready(watcher), [])
+        self._add("c.jpg", "notes.txt")
+        self.assertEqual(self._ready(watcher), ["c.jpg"])
+
+        self.assertEqual(self._ready(self._watcher(state_path=self.state + "2", include_existing=True)),
+                         ["a.jpg", "b.jpg", "c.jpg"])
+
+    def test_unchanged_directory_is_not_listed(self):
+        self._add("a.jpg")
+        watcher = self._watcher()
+        watcher.poll()
+        with mock.patch("os.scandir", side_effect=AssertionError("re-listed")):
+            self.assertEqual(watcher.poll(), [])
+            self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.skipped, 2)
+        self.assertEqual(watcher.listed, 1)
+
+    def test_renames_only_new_files_and_continues_counter(self):
+        self._add("old.jpg")
+        watcher = self._watcher()
+        watcher.poll()
+        self._add("x.jpg", "y.jpg")
+        batch = watcher.poll() + watcher.poll()
+        result = rename_batch(watcher, RenamerEngine(), FileProcessor(), RULES, batch)
+        self.assertEqual((result['files'], result['renamed'], result['error']), (2, 2, None))
+        self.assertEqual(result['next_index'], 3)
+        self.assertEqual(sorted(os.listdir(self.inbox)), ["S_001.jpg", "S_002.jpg", "old.jpg"])
+        # 已重命名的文件不会被当作新文件
+        self.assertEqual(self._ready(watcher), [])
+        watcher.save()
+
+        # 重新启动：从状态文件继续，序号接着上一批
+        watcher = self._watcher()
+        self.assertEqual(watcher.next_index, 3)
+        self._add("z.jpg")
+        batch = watcher.poll() + watcher.poll()
+        self.assertEqual([os.path.basename(p) for p in batch], ["z.jpg"])
+        rename_batch(watcher, RenamerEngine(), FileProcessor(), RULES, batch)
+        self.assertEqual(sorted(os.listdir(self.inbox)), ["S_001.jpg", "S_002.jpg", "S_003.jpg", "old.jpg"])
+        self.assertEqual(watcher.next_index, 4)
+
+    def test_recursive_picks_up_new_subfolder(self):
+        self._add("a.jpg")
+        watcher = self._watcher(recursive=True)
+        watcher.poll()
+        sub = os.path.join(self.inbox, "day2")
+        os.makedirs(sub)
+        old = time.time() - 60
+        path = os.path.join(sub, "b.jpg")
+        with open(path, 'w') as fh:
+            fh.write("b")
+        os.utime(path, (old, old))
+        self.assertEqual(watcher.poll() + watcher.poll(), [path])
+
+        shutil.rmtree(sub)
+        watcher.poll()
+        self.assertNotIn(sub, watcher.state["dirs"])
+
+
+if __name__ == '__main__':
+    unittest.main()